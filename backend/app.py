@@ -2,6 +2,9 @@ from flask import Flask
 from flask_cors import CORS
 from routes.analytics import analytics_bp
 from routes.runs import runs_bp
+from utils.llm_dispatch import dispatch_metrics
+from services.supabase_pool import pool_metrics
+from services.ref_cache import cache_metrics
 import logging
 import sys
 import os
@@ -34,6 +37,21 @@ def health():
     app.logger.info("Health endpoint accessed")
     return {"status": "healthy", "service": "hoptix-backend"}
 
+@app.route("/metrics/llm")
+def llm_metrics():
+    """Adaptive concurrency state per model (limit, in-flight, throttles, latency)"""
+    return {"models": dispatch_metrics()}
+
+@app.route("/metrics/supabase")
+def supabase_metrics():
+    """Connection pool usage of this worker's Supabase client"""
+    return pool_metrics()
+
+@app.route("/metrics/cache")
+def reference_cache_metrics():
+    """Hit ratios and sizes of the Supa reference-lookup caches in this worker"""
+    return cache_metrics()
+
 if __name__ == "__main__":
     # Development server configuration
     # In production, use Gunicorn instead (see Dockerfile CMD)
@@ -9,6 +9,19 @@ load_dotenv()
 class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY", "")
+    # Per-process pooled client (services/supabase_pool.py); gunicorn multiplies these by its workers
+    SUPABASE_HTTP2: bool = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+    SUPABASE_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+    SUPABASE_MAX_KEEPALIVE: int = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+    SUPABASE_KEEPALIVE_SECONDS: float = float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "30"))
+    SUPABASE_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "120"))
+    # Read-through cache for reference lookups in Supa (services/ref_cache.py); TTLs in seconds
+    REF_CACHE_ENABLED: bool = os.getenv("REF_CACHE_ENABLED", "true").lower() == "true"
+    REF_CACHE_MAX_ENTRIES: int = int(os.getenv("REF_CACHE_MAX_ENTRIES", "2048"))  # per lookup
+    REF_CACHE_LOCATION_TTL: float = float(os.getenv("REF_CACHE_LOCATION_TTL", "3600"))
+    REF_CACHE_RUN_TTL: float = float(os.getenv("REF_CACHE_RUN_TTL", "86400"))  # a run never changes location
+    REF_CACHE_MENU_TTL: float = float(os.getenv("REF_CACHE_MENU_TTL", "300"))
+    REF_CACHE_OWNER_TTL: float = float(os.getenv("REF_CACHE_OWNER_TTL", "60"))
 
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     RAW_BUCKET: str = os.getenv("RAW_BUCKET", "hoptix-raw-devprod")
@@ -26,6 +39,90 @@ class Settings:
     STEP2_MODEL: str = os.getenv("STEP2_MODEL", "gpt-5-nano")
     AI_FEEDBACK_MODEL: str = os.getenv("AI_FEEDBACK_MODEL", "gpt-5-nano")
 
+    # ASR concurrency and rate limits (services/transcribe.py); a limit <= 0 disables it
+    ASR_MAX_IN_FLIGHT: int = int(os.getenv("ASR_MAX_IN_FLIGHT", "4"))
+    ASR_REQUESTS_PER_MINUTE: float = float(os.getenv("ASR_REQUESTS_PER_MINUTE", "500"))
+    ASR_AUDIO_MINUTES_PER_MINUTE: float = float(os.getenv("ASR_AUDIO_MINUTES_PER_MINUTE", "0"))
+    ASR_MAX_RETRIES: int = int(os.getenv("ASR_MAX_RETRIES", "5"))
+    ASR_RETRY_BASE_DELAY: float = float(os.getenv("ASR_RETRY_BASE_DELAY", "1.0"))
+    ASR_RETRY_MAX_DELAY: float = float(os.getenv("ASR_RETRY_MAX_DELAY", "30.0"))
+
+    # Clips are re-encoded to 16 kHz mono before upload; archive clips keep the source quality.
+    # mp3 (default), opus, vorbis, flac, wav, or "source" to upload the archive clip as-is
+    ASR_UPLOAD_FORMAT: str = os.getenv("ASR_UPLOAD_FORMAT", "mp3")
+    # Drop leading/trailing silence and shorten long pauses in the uploaded copy (billed minutes)
+    ASR_TRIM_SILENCE: bool = os.getenv("ASR_TRIM_SILENCE", "true").lower() in ("1", "true", "yes")
+    ASR_TRIM_RMS_THRESHOLD: float = float(os.getenv("ASR_TRIM_RMS_THRESHOLD", "0.002"))
+    ASR_TRIM_PAD_SECONDS: float = float(os.getenv("ASR_TRIM_PAD_SECONDS", "0.25"))
+    ASR_TRIM_MAX_GAP_SECONDS: float = float(os.getenv("ASR_TRIM_MAX_GAP_SECONDS", "1.0"))
+
+    # Transcript cache keyed by clip PCM + ASR_MODEL + prompt (services/asr_cache.py); "sqlite" or "none"
+    ASR_CACHE_BACKEND: str = os.getenv("ASR_CACHE_BACKEND", "sqlite")
+    ASR_CACHE_PATH: str = os.getenv("ASR_CACHE_PATH", "/tmp/hoptix_asr_cache/transcripts.sqlite3")
+    ASR_CACHE_TTL_DAYS: float = float(os.getenv("ASR_CACHE_TTL_DAYS", "90"))  # 0 = never expire
+    ASR_CACHE_MAX_MB: float = float(os.getenv("ASR_CACHE_MAX_MB", "512"))
+
+    # Step-1 answers keyed by transcript + STEP1_MODEL + prompt version (services/step1_cache.py)
+    STEP1_CACHE_BACKEND: str = os.getenv("STEP1_CACHE_BACKEND", "sqlite")  # sqlite | none
+    STEP1_CACHE_PATH: str = os.getenv("STEP1_CACHE_PATH", "/tmp/hoptix_step1_cache/step1.sqlite3")
+    STEP1_CACHE_TTL_DAYS: float = float(os.getenv("STEP1_CACHE_TTL_DAYS", "90"))  # 0 = never expire
+    STEP1_CACHE_MAX_MB: float = float(os.getenv("STEP1_CACHE_MAX_MB", "256"))
+
+    # Compiled Step-2 prompts per location (services/prompt_cache.py); "" keeps them in memory only
+    STEP2_PROMPT_CACHE_DIR: str = os.getenv("STEP2_PROMPT_CACHE_DIR", "/tmp/hoptix_prompt_cache")
+    STEP2_PROMPT_CACHE_CHECK_SECONDS: float = float(os.getenv("STEP2_PROMPT_CACHE_CHECK_SECONDS", "60"))
+    STEP2_PROMPT_CACHE_MAX_AGE: float = float(os.getenv("STEP2_PROMPT_CACHE_MAX_AGE", "3600"))
+    # Send only the menu rows a transcript mentions (plus their offer neighbours) instead of the
+    # whole catalog; check recall first with scripts/measure_menu_recall.py
+    STEP2_MENU_PRUNING: bool = os.getenv("STEP2_MENU_PRUNING", "false").lower() in ("1", "true", "yes")
+
+    # Packed Step-2 grading: several transcripts per request, sized to a token budget (services/grader.py)
+    STEP2_PACKED: bool = os.getenv("STEP2_PACKED", "false").lower() in ("1", "true", "yes")
+    STEP2_PACK_MAX_TX: int = int(os.getenv("STEP2_PACK_MAX_TX", "8"))
+    STEP2_PACK_TOKEN_BUDGET: int = int(os.getenv("STEP2_PACK_TOKEN_BUDGET", "12000"))  # transcripts + answers per request
+    STEP2_PACK_TOKENS_PER_TX: int = int(os.getenv("STEP2_PACK_TOKENS_PER_TX", "1200"))  # reserved for each answer
+
+    # Tiered Step-2: grade at low reasoning effort, regrade at high only when the answer breaks a
+    # hard rule (offers ≤ opportunities, items after = initial + upsell successes, known item ids)
+    STEP2_TIERED: bool = os.getenv("STEP2_TIERED", "false").lower() in ("1", "true", "yes")
+    # Skip the Step-2 call for wait-only, mobile-pickup and fragment transcripts (services/pregrade.py);
+    # check precision first with scripts/measure_preclassifier.py
+    STEP2_PRECLASSIFY: bool = os.getenv("STEP2_PRECLASSIFY", "false").lower() in ("1", "true", "yes")
+
+    # "online" grades with one request per transaction/pack; "batch" goes through the Batch API
+    STEP2_GRADING_MODE: str = os.getenv("STEP2_GRADING_MODE", "online")
+    STEP2_BATCH_STATE_DIR: str = os.getenv("STEP2_BATCH_STATE_DIR", "/tmp/hoptix_batch_state")
+    STEP2_BATCH_COMPLETION_WINDOW: str = os.getenv("STEP2_BATCH_COMPLETION_WINDOW", "24h")
+    STEP2_BATCH_POLL_BASE_SECONDS: float = float(os.getenv("STEP2_BATCH_POLL_BASE_SECONDS", "15"))
+    STEP2_BATCH_POLL_MAX_SECONDS: float = float(os.getenv("STEP2_BATCH_POLL_MAX_SECONDS", "600"))
+    STEP2_BATCH_TIMEOUT_SECONDS: float = float(os.getenv("STEP2_BATCH_TIMEOUT_SECONDS", str(26 * 3600)))
+    STEP2_BATCH_UPSERT_EVERY: int = int(os.getenv("STEP2_BATCH_UPSERT_EVERY", "50"))
+
+    # Online grades are written behind as they complete (services/grade_writer.py): a flush every
+    # N rows or S seconds, with at most GRADE_WRITE_BUFFER rows waiting before graders block
+    GRADE_FLUSH_EVERY: int = int(os.getenv("GRADE_FLUSH_EVERY", "25"))
+    GRADE_FLUSH_SECONDS: float = float(os.getenv("GRADE_FLUSH_SECONDS", "5"))
+    GRADE_WRITE_BUFFER: int = int(os.getenv("GRADE_WRITE_BUFFER", "200"))
+    GRADE_FLUSH_RETRIES: int = int(os.getenv("GRADE_FLUSH_RETRIES", "3"))
+
+    # Bulk upserts (services/bulk_writer.py): chunk size by rows and JSON bytes, chunks in flight
+    BULK_WRITE_MAX_ROWS: int = int(os.getenv("BULK_WRITE_MAX_ROWS", "500"))
+    BULK_WRITE_MAX_BYTES: int = int(os.getenv("BULK_WRITE_MAX_BYTES", str(1024 ** 2)))
+    BULK_WRITE_PARALLELISM: int = int(os.getenv("BULK_WRITE_PARALLELISM", "4"))
+    BULK_WRITE_RETRIES: int = int(os.getenv("BULK_WRITE_RETRIES", "2"))
+
+    # Adaptive (AIMD) concurrency per model, shared by Step-1, Step-2, ASR and feedback calls
+    # (utils/llm_dispatch.py). LLM_CONCURRENCY_BUDGETS overrides the max per model: "gpt-5-nano=24,gpt-4o-transcribe=8"
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_MIN_CONCURRENCY: int = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+    LLM_INITIAL_CONCURRENCY: int = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+    LLM_CONCURRENCY_BUDGETS: str = os.getenv("LLM_CONCURRENCY_BUDGETS", "")
+    LLM_LATENCY_SPIKE_FACTOR: float = float(os.getenv("LLM_LATENCY_SPIKE_FACTOR", "3.0"))
+    # Retries for Step-1/Step-2/feedback calls; the SDK's own retries are off so 429s reach the controller
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+
     # where to load menu/prompts jsons from (local files). All optional.
     PROMPTS_DIR: str = os.getenv("PROMPTS_DIR", "./prompts")
     ITEMS_JSON: str = os.getenv("ITEMS_JSON", "items.json")
@@ -34,6 +131,35 @@ class Settings:
     UPSIZING_JSON: str = os.getenv("UPSIZING_JSON", "upsizing.json")
     ADDONS_JSON: str = os.getenv("ADDONS_JSON", "addons.json")
 
+    # Silence detection used to cut the daily recording into transaction clips.
+    # "mean" treats a window as silent when its average is exactly 0.0 (original behaviour),
+    # "rms" treats it as silent when its RMS energy is <= SILENCE_RMS_THRESHOLD.
+    SILENCE_DETECTION_MODE: str = os.getenv("SILENCE_DETECTION_MODE", "mean")
+    SILENCE_RMS_THRESHOLD: float = float(os.getenv("SILENCE_RMS_THRESHOLD", "0.0"))
+    # Processes used for the silence scan; 1 = single streaming pass, >1 = sharded parallel scan
+    SILENCE_SCAN_WORKERS: int = int(os.getenv("SILENCE_SCAN_WORKERS", "1"))
+
+    # Decoded-PCM cache shared by segmentation and clipping (see services/pcm_cache.py). Off by default:
+    # a 24h mono 44.1kHz day is ~15 GB as float32 (~7.6 GB as int16), so point PCM_CACHE_DIR at a disk
+    # with room for PCM_CACHE_MAX_GB before enabling; least-recently-used days are evicted past that.
+    PCM_CACHE_ENABLED: bool = os.getenv("PCM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    PCM_CACHE_DIR: str = os.getenv("PCM_CACHE_DIR", "/tmp/hoptix_pcm_cache")
+    PCM_CACHE_MAX_GB: float = float(os.getenv("PCM_CACHE_MAX_GB", "20"))
+    PCM_CACHE_DTYPE: str = os.getenv("PCM_CACHE_DTYPE", "float32")  # float32 or int16
+
+    # Streaming mode overlaps segmentation → ASR → Step-1 through bounded queues (pipeline/streaming.py)
+    PIPELINE_STREAMING: bool = os.getenv("PIPELINE_STREAMING", "false").lower() in ("1", "true", "yes")
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+    # 0 = one ASR worker per ASR_MAX_IN_FLIGHT slot; the token buckets still pace the requests
+    PIPELINE_ASR_WORKERS: int = int(os.getenv("PIPELINE_ASR_WORKERS", "0"))
+    PIPELINE_STEP1_WORKERS: int = int(os.getenv("PIPELINE_STEP1_WORKERS", "10"))
+    # Per-run stage ledger + artifacts, so a rerun of full_pipeline resumes at the first unfinished stage
+    PIPELINE_LEDGER_DIR: str = os.getenv("PIPELINE_LEDGER_DIR", "/tmp/hoptix_pipeline_ledger")
+
+    # Scalar run analytics from one RPC to run_grade_summary (sql/run_grade_summary.sql); if the
+    # function isn't deployed, Analytics falls back to per-metric queries
+    ANALYTICS_SERVER_SUMMARY: bool = os.getenv("ANALYTICS_SERVER_SUMMARY", "true").lower() == "true"
+
 class Prompts:
     INITIAL_PROMPT = """
         **Response Guidelines**:
@@ -82,9 +208,6 @@ class Prompts:
         - **Scenario 1**: Customer orders a numbered item but not a meal initially, but upon being asked to upsell to a meal by an operator, agrees to get the numbered item meal. Initial item requested is the numbered item burger. Items ordered after upselling and upsizing is meal containing the numbered item burger, fries, and drink.
         - **Scenario 2**: Customer orders a sandwich and orders a drink with no size specified, but upon being asked to upsize to a large drink by an operator, agrees. Initial item requested is a sandwich and drink. Items ordered after upselling and upsizing is sandwich and large drink.
 
-        **Additional Topping Scenarios**:
-        <<ADDONS_JSON>>
-
         **Notes about Meals, Combos, and Numbered Items**:
         - A customer may say that they want a specific burger or numbered item with fries and a drink without saying the word meal or the word combo, but they are getting the appropriate meal. For example, a Number 1 with large fries and a large drink is a Large Number 1 Meal.
         - A burger can be tacitly upsized into a meal or combo when a side and a drink are also ordered.
@@ -213,6 +336,9 @@ class Prompts:
         - Below this line, a JSON file will be inserted containing all meals on the Dairy Queen menu along with relevant information like the ordered item count, item inclusions, opportunities for upselling, and oportunities for upsizing.
         - When creating the response, whenever a customer requests a meal or asks to upsize an item to a meal, reference this JSON and double check that all entered information is correct according to this JSON file
         <<MEALS_JSON>>
+
+        **Additional Topping Scenarios**:
+        <<ADDONS_JSON>>
         """
 
     AI_FEEDBACK_PROMPT = """
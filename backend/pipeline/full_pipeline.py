@@ -6,7 +6,7 @@ import gc
 from datetime import datetime
 
 from services.database import Supa
-from services.media import get_audio_from_location_and_date
+from services.media import get_audio_from_location_and_date, get_audio_from_gdrive, get_cached_pcm
 from services.audio import AudioTransactionProcessor
 from services.transcribe import transcribe_segments
 from services.grader import grade_transactions
@@ -14,90 +14,170 @@ from services.analytics import Analytics
 from services.clipper import clip_transactions
 from services.transactions import split_into_transactions
 from utils.helpers import get_memory_usage, log_memory_usage
+from pipeline.streaming import stream_clips_to_transactions
+from pipeline.ledger import StageLedger
+from config import Settings
 
 db = Supa() 
 
-def full_pipeline(location_id: str, date: str):
+def full_pipeline(location_id: str, date: str, from_stage: str = None, force_stages: list = None):
+    """
+    Run (or resume) the pipeline for one location and date.
+
+    Each stage is recorded in a StageLedger with its artifacts once it finishes, so a rerun after
+    a failure picks up at the first unfinished stage. from_stage reruns that stage and all later
+    ones; force_stages reruns just the named stages.
+    """
     TOTAL_STEPS = 9
     
     location_name = db.get_location_name(location_id)
     initial_memory = get_memory_usage()
+    ledger = StageLedger(location_id, date)
+    ledger.apply_overrides(from_stage, force_stages or ())
     
     print(f"🚀 Starting full pipeline for {location_name} on {date}")
     print(f"📊 Initial memory usage: {initial_memory:.1f} MB")
+    print(f"📒 Stages: {ledger.summary()}")
+    if ledger.first_incomplete() is None:
+        return f"Pipeline already completed for {location_name} on {date}"
 
     # 1) Check and pull audio from location and date, audio path is a temp file in your local storage
     log_memory_usage("Checking and pulling audio", 1, TOTAL_STEPS)
-    try: 
-        audio_path, gdrive_path = get_audio_from_location_and_date(location_id, date)
-    except Exception as e: 
-        print(f"❌ Error checking and pulling audio from {location_name} on {date}: {e}")
-        return 
-
-    # if we have an audio, begin the pipeline 
-    if audio_path: 
-        print(f"✅ Audio found: {audio_path}")
+    audio_path = ledger.artifacts("download").get("audio_path")
+    gdrive_path = ledger.artifacts("download").get("gdrive_path")
+    # Audio is only read again while segmentation/ASR or clipping are still to do
+    needs_audio = not (ledger.done("transcribe") and ledger.done("clip"))
+    if not ledger.done("download") or (needs_audio and not (audio_path and os.path.exists(audio_path))):
+        try: 
+            if ledger.done("init"):
+                # The run already marked this audio as processing, so fetch it straight from Drive
+                audio_path, gdrive_path = get_audio_from_gdrive(location_id, date)
+            else:
+                audio_path, gdrive_path = get_audio_from_location_and_date(location_id, date)
+        except Exception as e: 
+            print(f"❌ Error checking and pulling audio from {location_name} on {date}: {e}")
+            return 
+
+        # if we have an audio, begin the pipeline 
+        if not audio_path: 
+            return f"No audio found for {location_name} on {date}"
+        ledger.complete("download", audio_path=audio_path, gdrive_path=gdrive_path)
+    print(f"✅ Audio found: {audio_path}")
+
+    if ledger.done("init"):
+        run_id, audio_id = ledger.artifacts("init")["run_id"], ledger.artifacts("init")["audio_id"]
+        print(f"🔁 Resuming run {run_id}")
+    else:
         run_id, audio_id = initialize_pipeline(location_id, date, gdrive_path)
-    else: 
-        return f"No audio found for {location_name} on {date}"
+        ledger.complete("init", run_id=run_id, audio_id=audio_id)
         
     # 2) Create audio clips and transcribe
     log_memory_usage("Creating audio clips and transcribing", 2, TOTAL_STEPS)
     
-    # Create audio clips using silence detection
-    audio_processor = AudioTransactionProcessor()
-
-
-    # Extract original filename from gdrive_path for timestamp conversion
-    # gdrive_path is a URL, so we need to construct the filename from location_id and date
-    original_filename = f"audio_{date}_10-00-02.mp3" if gdrive_path else None
-    print(f'🔍 DEBUG: gdrive_path: {gdrive_path}')
-    print(f'🔍 DEBUG: original_filename: {original_filename}')
-    
-    clip_paths, begin_times, end_times, reg_begin_times, reg_end_times = audio_processor.create_audio_subclips(
-        audio_path, location_id, "extracted_audio", original_filename
-    )
-    
-    print(f"✅ Created {len([p for p in clip_paths if p])} audio clips")
-    
-    transcript_segments = transcribe_segments(clip_paths, begin_times, end_times)
-
-
-    print(f"✅ Transcribed {len(transcript_segments)} audio clips")
-    
-    # Force garbage collection after transcription
-    gc.collect()
-    log_memory_usage("Transcription completed, memory cleaned", 2, TOTAL_STEPS)
-
-    #3) Create transactions from transcript segments
-    log_memory_usage("Creating transactions from transcript segments", 3, TOTAL_STEPS)
-    transactions = split_into_transactions(transcript_segments, date, audio_id, run_id)
-    print(f"📝 Created {len(transactions)} transactions")
+    # Decode the recording once; segmentation and clipping both read views of it
+    pcm = get_cached_pcm(audio_path, gdrive_path) if needs_audio else None
+
+    if Settings.PIPELINE_STREAMING and not (ledger.done("transcribe") and ledger.done("split")):
+        # Extract original filename from gdrive_path for timestamp conversion
+        original_filename = f"audio_{date}_10-00-02.mp3" if gdrive_path else None
+        # 2+3) Cut, transcribe and split as overlapping stages
+        clips, transcript_segments, transactions = stream_clips_to_transactions(
+            AudioTransactionProcessor(), audio_path, location_id, date, audio_id, run_id,
+            "extracted_audio", original_filename, pcm=pcm
+        )
+        clip_paths = clips[0]
+        print(f"✅ Created {len([p for p in clip_paths if p])} audio clips")
+        print(f"✅ Transcribed {len(transcript_segments)} audio clips")
+        print(f"📝 Created {len(transactions)} transactions")
+        ledger.complete("transcribe", clips=ledger.save_artifact("clips", list(clips)),
+                        transcripts=ledger.save_artifact("transcripts", transcript_segments),
+                        segment_count=len(transcript_segments))
+        ledger.complete("split", transactions=ledger.save_artifact("transactions", transactions),
+                        transaction_count=len(transactions))
+        gc.collect()
+        log_memory_usage("Segmentation, transcription and splitting completed", 3, TOTAL_STEPS)
+    else:
+        if ledger.done("transcribe"):
+            transcript_segments = ledger.load_artifact("transcripts") if not ledger.done("split") else []
+            print(f"⏭️ Transcription already done ({ledger.artifacts('transcribe').get('segment_count')} segments)")
+        else:
+            # Create audio clips using silence detection
+            audio_processor = AudioTransactionProcessor()
+
+            # Extract original filename from gdrive_path for timestamp conversion
+            # gdrive_path is a URL, so we need to construct the filename from location_id and date
+            original_filename = f"audio_{date}_10-00-02.mp3" if gdrive_path else None
+            print(f'🔍 DEBUG: gdrive_path: {gdrive_path}')
+            print(f'🔍 DEBUG: original_filename: {original_filename}')
+
+            clips = audio_processor.create_audio_subclips(
+                audio_path, location_id, "extracted_audio", original_filename, pcm=pcm
+            )
+            clip_paths, begin_times, end_times, reg_begin_times, reg_end_times = clips
+            
+            print(f"✅ Created {len([p for p in clip_paths if p])} audio clips")
+            
+            transcript_segments = transcribe_segments(clip_paths, begin_times, end_times)
+
+
+            print(f"✅ Transcribed {len(transcript_segments)} audio clips")
+            ledger.complete("transcribe", clips=ledger.save_artifact("clips", list(clips)),
+                            transcripts=ledger.save_artifact("transcripts", transcript_segments),
+                            segment_count=len(transcript_segments))
+            
+            # Force garbage collection after transcription
+            gc.collect()
+            log_memory_usage("Transcription completed, memory cleaned", 2, TOTAL_STEPS)
+
+        #3) Create transactions from transcript segments
+        if ledger.done("split"):
+            transactions = ledger.load_artifact("transactions")
+            print(f"⏭️ Reusing {len(transactions)} transactions from the ledger")
+        else:
+            log_memory_usage("Creating transactions from transcript segments", 3, TOTAL_STEPS)
+            transactions = split_into_transactions(transcript_segments, date, audio_id, run_id)
+            print(f"📝 Created {len(transactions)} transactions")
+            ledger.complete("split", transactions=ledger.save_artifact("transactions", transactions),
+                            transaction_count=len(transactions))
 
     #4) Insert transactions into database 
-    log_memory_usage(f"Inserting {len(transactions)} transactions into database", 4, TOTAL_STEPS)
-    inserted_transactions = db.upsert_transactions(transactions)
+    if ledger.done("insert"):
+        inserted_transactions = ledger.load_artifact("inserted_transactions")
+        print(f"⏭️ {len(inserted_transactions)} transactions already inserted")
+    else:
+        log_memory_usage(f"Inserting {len(transactions)} transactions into database", 4, TOTAL_STEPS)
+        inserted_transactions = db.upsert_transactions(transactions)
+        ledger.complete("insert", inserted=ledger.save_artifact("inserted_transactions", inserted_transactions),
+                        transaction_ids=[tx.get("id") for tx in inserted_transactions])
 
     #5) Grade transactions 
-    log_memory_usage("Grading transactions", 5, TOTAL_STEPS)
-    grades = grade_transactions(inserted_transactions, location_id)
-
-    #6) Upsert grades into database 
-    log_memory_usage("Upserting grades into database", 6, TOTAL_STEPS)
-    db.upsert_grades(grades)
+    if not ledger.done("grade"):
+        log_memory_usage("Grading transactions", 5, TOTAL_STEPS)
+        #6) Grades are upserted in small batches as they complete (and skipped on a re-run if already stored)
+        # A forced grade stage (--force-stage grade / --from-stage grade or earlier) regrades
+        # everything; a plain resume only grades what has no row yet
+        grades = grade_transactions(inserted_transactions, location_id, mode=Settings.STEP2_GRADING_MODE,
+                                    persist=True, force="grade" in ledger.forced)
+        ledger.complete("grade", graded_this_run=len(grades))
 
     # Generate the report
-    log_memory_usage("Generating analytics report", 7, TOTAL_STEPS)
-    analytics = Analytics(run_id)
-    analytics.upload_to_db()
+    if not ledger.done("analytics"):
+        log_memory_usage("Generating analytics report", 7, TOTAL_STEPS)
+        analytics = Analytics(run_id)
+        analytics.upload_to_db()
+        ledger.complete("analytics")
 
     #7) Write clips to google drive 
-    log_memory_usage("Writing clips to google drive", 8, TOTAL_STEPS)
-    clip_transactions(run_id, audio_path, date)
+    if not ledger.done("clip"):
+        log_memory_usage("Writing clips to google drive", 8, TOTAL_STEPS)
+        clip_transactions(run_id, audio_path, date, pcm=pcm)
+        ledger.complete("clip")
 
     #8) Set pipeline to complete 
-    log_memory_usage("Completing pipeline", 9, TOTAL_STEPS)
-    complete_pipeline(run_id, audio_id)
+    if not ledger.done("complete"):
+        log_memory_usage("Completing pipeline", 9, TOTAL_STEPS)
+        complete_pipeline(run_id, audio_id)
+        ledger.complete("complete")
 
     final_memory = get_memory_usage()
     print(f"\n🎉 Successfully completed full pipeline!")
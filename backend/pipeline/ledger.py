@@ -0,0 +1,93 @@
+# Per-run stage ledger so a failed full_pipeline can resume where it stopped
+
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from config import Settings
+
+# full_pipeline stages, in order
+STAGES = ("download", "init", "transcribe", "split", "insert", "grade", "analytics", "clip", "complete")
+
+
+def check_stage(stage: str) -> str:
+    if stage not in STAGES:
+        raise ValueError(f"Unknown pipeline stage '{stage}', expected one of {', '.join(STAGES)}")
+    return stage
+
+
+class StageLedger:
+    """
+    Which stages of one location/date run have finished, and what each one produced.
+
+    Small artifacts (run id, local audio path, transaction ids) live in ledger.json next to
+    larger ones (clip manifest, transcript segments, transactions) written as separate JSON
+    files. Every write goes through a temp file + rename, so a crash never leaves a half
+    written ledger behind.
+    """
+
+    def __init__(self, location_id: str, date: str, ledger_dir: str = None):
+        root = ledger_dir or Settings.PIPELINE_LEDGER_DIR
+        self.dir = os.path.join(root, f"run_{location_id}_{date}")
+        os.makedirs(self.dir, exist_ok=True)
+        self.path = os.path.join(self.dir, "ledger.json")
+        self.data: Dict[str, Any] = {"location_id": location_id, "date": date, "stages": {}}
+        self.forced: set = set()  # stages this invocation was told to rerun
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+
+    def _write_json(self, path: str, obj: Any) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.dir, prefix=".tmp_")
+        with os.fdopen(fd, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+
+    def done(self, stage: str) -> bool:
+        return check_stage(stage) in self.data["stages"]
+
+    def artifacts(self, stage: str) -> Dict[str, Any]:
+        return (self.data["stages"].get(check_stage(stage)) or {}).get("artifacts", {})
+
+    def complete(self, stage: str, **artifacts) -> None:
+        self.data["stages"][check_stage(stage)] = {
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+            "artifacts": artifacts,
+        }
+        self._write_json(self.path, self.data)
+        print(f"📌 Stage '{stage}' recorded")
+
+    def save_artifact(self, name: str, obj: Any) -> str:
+        path = os.path.join(self.dir, f"{name}.json")
+        self._write_json(path, obj)
+        return path
+
+    def load_artifact(self, name: str) -> Any:
+        with open(os.path.join(self.dir, f"{name}.json"), "r") as f:
+            return json.load(f)
+
+    def reset(self, stages: Iterable[str]) -> None:
+        for stage in stages:
+            self.data["stages"].pop(check_stage(stage), None)
+        self._write_json(self.path, self.data)
+
+    def apply_overrides(self, from_stage: str = None, force_stages: Iterable[str] = ()) -> None:
+        """--from-stage reruns that stage and everything after it; --force-stage reruns just those"""
+        to_reset: List[str] = list(force_stages or ())
+        if from_stage:
+            to_reset += STAGES[STAGES.index(check_stage(from_stage)):]
+        if to_reset:
+            self.forced = set(to_reset)
+            self.reset(to_reset)
+            print(f"🔁 Will rerun stages: {', '.join(s for s in STAGES if s in to_reset)}")
+
+    def first_incomplete(self) -> Optional[str]:
+        return next((s for s in STAGES if not self.done(s)), None)
+
+    def summary(self) -> str:
+        return " → ".join(f"{s}{'✓' if self.done(s) else ''}" for s in STAGES)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
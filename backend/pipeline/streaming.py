@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from config import Settings
+from services.audio import AudioTransactionProcessor
+from services.pcm_cache import CachedPCM
+from services.transcribe import transcribe_audio_clip, log_asr_cache_stats, log_billed_minutes, segment_from_result
+from services.asr_cache import get_asr_cache
+from services.transactions import _process_segment
+from services.step1_cache import get_step1_cache, log_step1_cache_stats
+
+_DONE = object()  # end-of-stream marker passed down each queue
+
+
+class MeteredQueue(queue.Queue):
+    """Bounded queue that records its depth every time an item is added"""
+
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.name = name
+        self.items = 0
+        self.max_depth = 0
+        self._depth_total = 0
+        self.blocked_seconds = 0.0  # time producers spent waiting on a full queue
+
+    def put(self, item, block=True, timeout=None):
+        start = time.time()
+        super().put(item, block, timeout)
+        with self.mutex:
+            self.blocked_seconds += time.time() - start
+            if item is not _DONE:
+                depth = self._qsize()
+                self.items += 1
+                self._depth_total += depth
+                self.max_depth = max(self.max_depth, depth)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue": self.name,
+            "items": self.items,
+            "max_depth": self.max_depth,
+            "avg_depth": round(self._depth_total / self.items, 2) if self.items else 0.0,
+            "capacity": self.maxsize,
+            "producer_blocked_s": round(self.blocked_seconds, 2),
+        }
+
+
+class _Stage:
+    """A pool of threads draining one queue; the last thread to finish forwards the end marker"""
+
+    def __init__(self, name: str, workers: int, inbox: MeteredQueue, handle: Callable, outbox: MeteredQueue = None):
+        self.name = name
+        self.inbox = inbox
+        self.outbox = outbox
+        self.handle = handle
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.errors: List[BaseException] = []
+        self._lock = threading.Lock()
+        self._alive = workers
+        self.threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                self.inbox.put(_DONE)  # let sibling workers see it too
+                break
+            start = time.time()
+            try:
+                result = self.handle(item)
+                if self.outbox is not None and result is not None:
+                    self.outbox.put(result)
+            except BaseException as e:
+                with self._lock:
+                    self.errors.append(e)
+            finally:
+                with self._lock:
+                    self.processed += 1
+                    self.busy_seconds += time.time() - start
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.outbox is not None:
+            self.outbox.put(_DONE)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"stage": self.name, "processed": self.processed, "busy_s": round(self.busy_seconds, 2), "errors": len(self.errors)}
+
+
+def asr_workers() -> int:
+    """ASR stage width: PIPELINE_ASR_WORKERS, or ASR_MAX_IN_FLIGHT when that is 0"""
+    return max(1, Settings.PIPELINE_ASR_WORKERS or Settings.ASR_MAX_IN_FLIGHT)
+
+
+def stream_clips_to_transactions(audio_processor: AudioTransactionProcessor, audio_path: str, location_id: str,
+                                 date: str, audio_id: str, run_id: str, output_dir: str = "extracted_audio",
+                                 original_filename: str = None, pcm: CachedPCM = None,
+                                 audio_started_at_iso: str = "10:00:00Z") -> Tuple[tuple, List[Dict], List[Dict]]:
+    """
+    Run segmentation → ASR → Step-1 splitting as overlapping stages joined by bounded queues.
+
+    Clip i is transcribed while clip i+1 is still being cut, and Step-1 starts on each transcript
+    as soon as it is ready. Results are re-assembled by clip index, so the transcript segments and
+    transactions come back in the same order as the phase-by-phase pipeline produces them.
+
+    Returns:
+        Tuple of (create_audio_subclips result tuple, transcript_segments, transactions)
+    """
+    queue_size = max(1, Settings.PIPELINE_QUEUE_SIZE)
+    clip_q = MeteredQueue("clips→asr", queue_size)
+    transcript_q = MeteredQueue("transcripts→step1", queue_size)
+
+    segments_by_index: Dict[int, Dict] = {}
+    asr_results: List[Dict] = []
+    transactions_by_index: Dict[int, List[Dict]] = {}
+
+    def transcribe(item):
+        index, clip_path, begin_time, end_time = item
+        # Skip empty or failed clip paths
+        if not clip_path:
+            print(f"⚠️ Skipping empty clip path for clip {index}")
+            return None
+        result = transcribe_audio_clip(clip_path, begin_time, end_time, index)
+        asr_results.append(result)
+        if 'error' in result:
+            print(f"❌ Failed to transcribe clip {index}: {result['error']}")
+            return None
+        seg = segment_from_result(result, begin_time, end_time)
+        segments_by_index[index] = seg
+        return index, seg
+
+    def split(item):
+        index, seg = item
+        transactions_by_index[index] = _process_segment(seg, date, audio_id, run_id, audio_started_at_iso) or []
+
+    asr = _Stage("asr", asr_workers(), clip_q, transcribe, transcript_q)
+    step1 = _Stage("step1", max(1, Settings.PIPELINE_STEP1_WORKERS), transcript_q, split)
+    asr.start()
+    step1.start()
+
+    def report_depth():
+        while not done.wait(30):
+            print(f"📊 Queue depth: {clip_q.name}={clip_q.qsize()}/{queue_size}, "
+                  f"{transcript_q.name}={transcript_q.qsize()}/{queue_size}, "
+                  f"asr done={asr.processed}, step1 done={step1.processed}")
+
+    done = threading.Event()
+    threading.Thread(target=report_depth, name="queue-depth", daemon=True).start()
+
+    started = time.time()
+    cache_before = get_asr_cache().stats()
+    step1_before = get_step1_cache().stats()
+    try:
+        clips = audio_processor.create_audio_subclips(
+            audio_path, location_id, output_dir, original_filename, pcm=pcm,
+            on_clip=lambda index, path, begin, end: clip_q.put((index, path, begin, end))
+        )
+    finally:
+        # Always release the consumers, even if segmentation failed
+        clip_q.put(_DONE)
+        asr.join()
+        step1.join()
+        done.set()
+
+    for stage in (asr, step1):
+        if stage.errors:
+            raise stage.errors[0]
+
+    transcript_segments = [segments_by_index[i] for i in sorted(segments_by_index)]
+    transactions = []
+    for i in sorted(transactions_by_index):
+        transactions.extend(transactions_by_index[i])
+
+    print(f"⏱️ Streaming segmentation → ASR → Step-1 finished in {time.time() - started:.1f}s")
+    for stats in (clip_q.stats(), transcript_q.stats(), asr.stats(), step1.stats()):
+        print(f"📊 {stats}")
+    log_asr_cache_stats(cache_before)
+    log_step1_cache_stats(step1_before)
+    log_billed_minutes(asr_results)
+
+    return clips, transcript_segments, transactions
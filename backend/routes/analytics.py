@@ -46,7 +46,7 @@ def get_run_analytics(run_id, worker_id=None):
         run = db.client.table("runs").select("run_date, location_id, org_id").eq("id", result.data["run_id"]).single().execute()
         location_id = run.data["location_id"]
         location_name = db.get_location_name(location_id)
-        org_name = db.get_org_name(location_id)
+        org_name = db.get_org_name(location_id) or "Unknown Org"
         
         # Format the response (updated to new schema without per-category revenues)
         analytics_data = {
@@ -142,7 +142,7 @@ def get_run_worker_analytics(run_id):
             run = db.client.table("runs").select("run_date, location_id, org_id").eq("id", worker_data['run_id']).single().execute()
             location_id = run.data["location_id"]
             location_name = db.get_location_name(location_id)
-            org_name = db.get_org_name(location_id)
+            org_name = db.get_org_name(location_id) or "Unknown Org"
             
             worker_analytics.append({
                 "worker_id": worker_data['worker_id'],
@@ -5,6 +5,8 @@ from utils.helpers import convert_item_ids_to_names
 from services.items import ItemLookupService
 from services.auth_helpers import verify_run_ownership, verify_location_ownership, get_user_locations
 from services.ai_feedback import get_ai_feedback
+from config import Settings
+from utils.llm_dispatch import pool_size
 from middleware.auth import require_auth
 
 db = Supa()
@@ -464,10 +466,10 @@ def get_range_ai_feedback():
                     "error": str(e)
                 }
 
-        # Generate feedback in parallel for better performance
-        # Limit to 5 concurrent requests to avoid overwhelming the OpenAI API
+        # Generate feedback in parallel; the shared feedback-model controller limits
+        # how many requests are actually in flight across the whole process
         results = []
-        with ThreadPoolExecutor(max_workers=5) as executor:
+        with ThreadPoolExecutor(max_workers=pool_size(Settings.AI_FEEDBACK_MODEL)) as executor:
             future_to_run = {executor.submit(generate_feedback_for_run, run): run for run in runs}
 
             for future in as_completed(future_to_run):
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ASR upload encoding: bytes uploaded and per-clip latency for each format.
+
+Runs against existing clips (e.g. an extracted_audio/ folder) or, with no clips given, a
+synthetic stereo 44.1 kHz MP3 like the ones create_audio_subclips writes. By default only the
+local side is measured (encode time, upload size). With --transcribe each clip is also sent
+to ASR_MODEL once per format, which gives real end-to-end latency and costs real money.
+
+Usage:
+    python benchmark_asr_encoding.py [clips or directories ...] [--formats source,mp3,opus,flac]
+                                     [--transcribe] [--seconds 45 --count 5]
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import soundfile as sf
+from services.asr_encoding import encode_for_asr
+
+
+def synthetic_clips(directory, count, seconds, sr=44100):
+    """Voice-band harmonics with syllable-rate amplitude modulation and a little background noise"""
+    rng = np.random.default_rng(0)
+    paths = []
+    t = np.arange(int(sr * seconds)) / sr
+    for i in range(count):
+        f0 = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 8))
+        envelope = np.clip(np.sin(2 * np.pi * rng.uniform(2, 5) * t), 0, None)
+        mono = 0.15 * voice * envelope + 0.005 * rng.normal(size=t.size)
+        path = os.path.join(directory, f"synthetic_clip_{i:03d}.mp3")
+        sf.write(path, np.stack([mono, 0.8 * mono], axis=1), sr)
+        paths.append(path)
+    return paths
+
+
+def collect_clips(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(os.path.join(item, n) for n in os.listdir(item)
+                                if n.lower().endswith(('.mp3', '.wav', '.flac', '.ogg'))))
+        else:
+            paths.append(item)
+    return paths
+
+
+def transcribe_once(path):
+    from services.transcribe import client, ASR_MODEL, ASR_PROMPT
+    start = time.time()
+    with open(path, "rb") as f:
+        client.audio.transcriptions.create(model=ASR_MODEL, file=f, response_format="text",
+                                           temperature=0.001, prompt=ASR_PROMPT)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ASR upload encodings")
+    parser.add_argument('clips', nargs='*', help='Clip files or directories (default: synthetic clips)')
+    parser.add_argument('--formats', default='source,mp3,opus,flac', help='Comma-separated upload formats')
+    parser.add_argument('--transcribe', action='store_true', help='Also time real ASR requests (paid)')
+    parser.add_argument('--count', type=int, default=5, help='Synthetic clips to generate')
+    parser.add_argument('--seconds', type=float, default=45.0, help='Synthetic clip length')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = collect_clips(args.clips) if args.clips else synthetic_clips(tmp, args.count, args.seconds)
+        if not clips:
+            print("❌ No clips found")
+            return 1
+        audio_seconds = sum(sf.info(p).duration for p in clips)
+        print(f"🎧 {len(clips)} clips, {audio_seconds:.1f}s of audio")
+
+        results = {}
+        for fmt in [f.strip() for f in args.formats.split(',') if f.strip()]:
+            sizes, encode_times, asr_times = [], [], []
+            for clip in clips:
+                start = time.time()
+                path, is_temp, _ = encode_for_asr(clip, fmt)
+                encode_times.append(time.time() - start)
+                try:
+                    sizes.append(os.path.getsize(path))
+                    if args.transcribe:
+                        asr_times.append(transcribe_once(path))
+                finally:
+                    if is_temp:
+                        os.remove(path)
+            results[fmt] = (sizes, encode_times, asr_times)
+
+    baseline = sum(results["source"][0]) if "source" in results else None
+    print(f"\n{'format':<8} {'bytes/clip':>12} {'kbps':>8} {'vs source':>10} {'encode ms':>10} {'asr s/clip':>11}")
+    for fmt, (sizes, encode_times, asr_times) in results.items():
+        total = sum(sizes)
+        ratio = f"{baseline / total:.1f}x" if baseline and total else "-"
+        asr = f"{statistics.median(asr_times):.2f}" if asr_times else "-"
+        encode_ms = 1000 * statistics.mean(encode_times)
+        e2e = ""
+        if asr_times:
+            e2e = f"  (e2e {statistics.median([a + e for a, e in zip(asr_times, encode_times)]):.2f}s)"
+        print(f"{fmt:<8} {total / len(sizes):>12,.0f} {8 * total / audio_seconds / 1000:>8.1f} "
+              f"{ratio:>10} {encode_ms:>10.1f} {asr:>11}{e2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
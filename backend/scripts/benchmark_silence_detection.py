@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized silence detection against the original per-window loop.
+
+Builds a synthetic drive-thru day (silence with bursts of noise) chunk by chunk, the same
+way create_audio_subclips reads the real MP3, and times both detectors on every chunk.
+
+Usage:
+    python benchmark_silence_detection.py [--hours 12] [--sample-rate 44100] [--mode mean|rms]
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from services.audio import AudioTransactionProcessor
+
+
+def legacy_detect_silence(chunk_data, chunk_start_time, sr, prev_state, silence_interval):
+    """The original while loop from AudioTransactionProcessor._detect_silence_in_chunk"""
+    chunk_begin, chunk_end = [], []
+    interval_samples = int(silence_interval * sr)
+    if len(chunk_data) < interval_samples:
+        return chunk_begin, chunk_end, prev_state
+    index = 0
+    current_state = prev_state
+    while index + interval_samples < len(chunk_data):
+        interval_avg = float(np.average(chunk_data[index:index + interval_samples]))
+        current_time = chunk_start_time + (index / sr)
+        if interval_avg == 0.0:
+            if current_state == 1:
+                chunk_end.append(current_time)
+                current_state = 0
+        else:
+            if current_state == 0:
+                chunk_begin.append(current_time)
+                current_state = 1
+        index += interval_samples
+    return chunk_begin, chunk_end, current_state
+
+
+def synthetic_chunk(rng, sr, seconds):
+    """Mostly silence with a handful of 20-90s customer interactions"""
+    n = int(sr * seconds)
+    data = np.zeros(n, dtype=np.float64)
+    for _ in range(rng.integers(0, 4)):
+        start = rng.integers(0, n)
+        length = int(rng.integers(20, 90) * sr)
+        data[start:start + length] = rng.normal(0, 0.1, size=data[start:start + length].shape)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark silence detection on a synthetic recording")
+    parser.add_argument('--hours', type=float, default=12.0, help='Length of the synthetic recording')
+    parser.add_argument('--sample-rate', type=int, default=44100, help='Sample rate of the synthetic recording')
+    parser.add_argument('--mode', choices=['mean', 'rms'], default='mean', help='Silence test for the vectorized engine')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    processor = AudioTransactionProcessor(silence_mode=args.mode)
+    rng = np.random.default_rng(args.seed)
+    sr = args.sample_rate
+    duration = args.hours * 3600
+    chunk_duration = 300
+
+    legacy_time = vector_time = 0.0
+    legacy_state = vector_state = 0
+    legacy_bounds, vector_bounds = ([], []), ([], [])
+
+    print(f"🧪 Benchmarking silence detection on {args.hours:.1f}h of synthetic audio at {sr} Hz")
+    current_time = 0.0
+    while current_time < duration:
+        seconds = min(chunk_duration, duration - current_time)
+        chunk = synthetic_chunk(rng, sr, seconds)
+
+        t0 = time.perf_counter()
+        begin, end, legacy_state = legacy_detect_silence(chunk, current_time, sr, legacy_state, processor.SILENCE_INTERVAL)
+        legacy_time += time.perf_counter() - t0
+        legacy_bounds[0].extend(begin)
+        legacy_bounds[1].extend(end)
+
+        t0 = time.perf_counter()
+        begin, end, vector_state = processor._detect_silence_in_chunk(chunk, current_time, sr, vector_state)
+        vector_time += time.perf_counter() - t0
+        vector_bounds[0].extend(begin)
+        vector_bounds[1].extend(end)
+
+        current_time += chunk_duration
+
+    print(f"⏱️  Legacy loop:  {legacy_time:.3f}s")
+    print(f"⏱️  Vectorized:   {vector_time:.3f}s")
+    if vector_time > 0:
+        print(f"📈 Speedup:      {legacy_time / vector_time:.1f}x")
+    print(f"📝 Transactions: legacy={len(legacy_bounds[0])}, vectorized={len(vector_bounds[0])}")
+    if args.mode == 'mean':
+        identical = legacy_bounds == vector_bounds and legacy_state == vector_state
+        print(f"{'✅' if identical else '❌'} Boundaries identical: {identical}")
+        return 0 if identical else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
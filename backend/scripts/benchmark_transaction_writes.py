@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark the chunked parallel transaction writer against the previous write paths.
+
+Runs against the in-process PostgREST stand-in (tests/postgrest_stub.py) with a simulated
+per-request round trip and per-row insert cost, so it never touches the real database:
+
+    old-single   one upsert of the whole day, every column returned (Supa.upsert_transactions before)
+    old-batched  sequential batches of 30, every column returned (upload_transactions_to_database before)
+    bulk         Supa.upsert_transactions now: byte/row chunks, parallel, only ids returned
+
+Usage:
+    python benchmark_transaction_writes.py [--rows 2400] [--latency 0.08] [--per-row 0.0002]
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add the backend and tests directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+
+from services.database import Supa
+from postgrest_stub import serving
+
+
+def make_transactions(n):
+    text = "Operator: Welcome to Dairy Queen, what can I get for you? Customer: Can I get a medium blizzard " * 4
+    return [{
+        "run_id": "00000000-0000-0000-0000-000000000001",
+        "started_at": f"2025-10-10T{10 + i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+        "ended_at": f"2025-10-10T{10 + i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+        "kind": "order",
+        "meta": {"text": text, "complete_order": 1, "segment_index": i, "audio_id": "audio-1"},
+    } for i in range(n)]
+
+
+def old_single(db, rows):
+    return db.client.table("transactions").upsert(rows).execute().data
+
+
+def old_batched(db, rows, batch_size=30):
+    out = []
+    for i in range(0, len(rows), batch_size):
+        out.extend(db.client.table("transactions").upsert(rows[i:i + batch_size]).execute().data)
+    return out
+
+
+def bulk(db, rows):
+    return db.upsert_transactions(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction write paths against a PostgREST stand-in")
+    parser.add_argument('--rows', type=int, default=2400, help='Transactions to write')
+    parser.add_argument('--latency', type=float, default=0.08, help='Simulated round trip per request (s)')
+    parser.add_argument('--per-row', type=float, default=0.0002, help='Simulated insert cost per row (s)')
+    args = parser.parse_args()
+
+    rows = make_transactions(args.rows)
+    results = []
+    for name, fn in (("old-single", old_single), ("old-batched", old_batched), ("bulk", bulk)):
+        with serving(args.latency, args.per_row) as stub:
+            start = time.monotonic()
+            returned = fn(Supa(), [dict(r) for r in rows])
+            seconds = time.monotonic() - start
+            received = sum(w["response_bytes"] for w in stub.writes("transactions"))
+            results.append((name, seconds, len(stub.writes("transactions")), received))
+
+    print(f"\n📊 {args.rows} transactions, {args.latency * 1000:.0f} ms/request + {args.per_row * 1000:.2f} ms/row")
+    print(f"   {'path':<12} {'seconds':>8} {'rows/s':>9} {'requests':>9} {'returned':>10}")
+    for name, seconds, requests, size in results:
+        print(f"   {name:<12} {seconds:>8.2f} {args.rows / seconds:>9,.0f} {requests:>9} {size / 1024:>8,.0f}KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
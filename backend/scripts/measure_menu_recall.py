@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Measure how well the menu shortlist (STEP2_MENU_PRUNING) covers the items graders actually used.
+
+For the location's most recent runs, every stored grade is compared with the shortlist built
+from its transcript: an item counts as recalled when its Item ID is among the shortlisted rows.
+Also reports how much of the menu (and of the Step-2 prompt) is kept on average. Read-only.
+
+Usage:
+    python measure_menu_recall.py <location_id> [--runs 5] [--show-misses 10]
+"""
+
+import sys
+import os
+import argparse
+import statistics
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.grader import db, step2_prompts
+from services.menu_index import measure_recall, referenced_item_ids
+
+
+def load_samples(location_id, runs):
+    run_rows = (db.client.table("runs").select("id, run_date").eq("location_id", location_id)
+                .order("run_date", desc=True).limit(runs).execute().data or [])
+    samples = []
+    for run in run_rows:
+        tx_ids = [tx["id"] for tx in db.get_transactions(run["id"])]
+        for i in range(0, len(tx_ids), 200):
+            grades = (db.client.table("grades").select("*")
+                      .in_("transaction_id", tx_ids[i:i + 200]).execute().data or [])
+            for grade in grades:
+                transcript = grade.get("transcript") or ""
+                ids = referenced_item_ids(grade)
+                if transcript.strip() and ids:
+                    samples.append((transcript, ids))
+    print(f"📚 {len(samples)} graded transcripts with item ids from {len(run_rows)} runs")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline recall of the Step-2 menu shortlist")
+    parser.add_argument('location_id', help='Location ID (UUID format)')
+    parser.add_argument('--runs', type=int, default=5, help='Most recent runs to read grades from')
+    parser.add_argument('--show-misses', type=int, default=10, help='Print this many transcripts with missed items')
+    args = parser.parse_args()
+
+    index, _ = step2_prompts.menu_index(args.location_id)
+    samples = load_samples(args.location_id, args.runs)
+    if not samples:
+        print("❌ No graded transcripts found")
+        return 1
+
+    stats = measure_recall(index, samples)
+    full = len(step2_prompts.get(args.location_id))
+    sizes = [len(step2_prompts.pruned(args.location_id, t) or "") or full for t, _ in samples]
+    print(f"🎯 Item recall:        {stats['item_recall']:.1%}")
+    print(f"🎯 Transaction recall: {stats['transaction_recall']:.1%} (every referenced item shortlisted)")
+    print(f"↩️  Full-menu fallback: {stats['fallback_rate']:.1%}")
+    print(f"✂️  Menu rows kept:     {stats['avg_rows_kept']:.1%}")
+    print(f"✂️  Prompt chars:       {statistics.mean(sizes):,.0f} avg vs {full:,} full "
+          f"({1 - statistics.mean(sizes) / full:.1%} smaller)")
+
+    shown = 0
+    for transcript, ids in samples:
+        rows = index.shortlist(transcript)
+        if rows is None or shown >= args.show_misses:
+            continue
+        kept = {str(r.get("Item ID")) for kind in rows for r in rows[kind]}
+        if ids - kept:
+            shown += 1
+            print(f"\n❓ Missed {sorted(ids - kept)}: {transcript[:200]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
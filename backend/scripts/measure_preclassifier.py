@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Measure the Step-2 pre-classifier (STEP2_PRECLASSIFY) against stored Step-1 flags.
+
+For the location's most recent runs, every transaction's transcript is run through
+skip_reason(). A skip counts as correct when Step-1 marked the transaction complete_order=0.
+Precision is what matters: a false skip loses a real grade, a miss only costs one call. Read-only.
+
+Usage:
+    python measure_preclassifier.py <location_id> [--runs 5] [--show-false-skips 10]
+"""
+
+import sys
+import os
+import argparse
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.grader import db, step2_prompts
+from services.pregrade import evaluate, skip_reason
+
+
+def load_samples(location_id, runs):
+    run_rows = (db.client.table("runs").select("id, run_date").eq("location_id", location_id)
+                .order("run_date", desc=True).limit(runs).execute().data or [])
+    samples = []
+    for run in run_rows:
+        for tx in db.get_transactions(run["id"]):
+            meta = tx.get("meta") or {}
+            samples.append((meta.get("text", ""), meta.get("complete_order", 0)))
+    print(f"📚 {len(samples)} transactions from {len(run_rows)} runs")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precision/recall of the Step-2 pre-classifier")
+    parser.add_argument('location_id', help='Location ID (UUID format)')
+    parser.add_argument('--runs', type=int, default=5, help='Most recent runs to read transactions from')
+    parser.add_argument('--show-false-skips', type=int, default=10, help='Print this many wrongly skipped transcripts')
+    args = parser.parse_args()
+
+    try:
+        index, _ = step2_prompts.menu_index(args.location_id)
+        menu_tokens = set(index.postings)
+    except Exception as e:
+        print(f"⚠️ No menu index ({e}), using generic food words")
+        menu_tokens = None
+
+    samples = load_samples(args.location_id, args.runs)
+    if not samples:
+        print("❌ No transactions found")
+        return 1
+
+    stats = evaluate(samples, menu_tokens)
+    incomplete = sum(1 for _, flag in samples if not int(flag or 0))
+    print(f"⏩ Would skip:  {stats['skipped']}/{stats['samples']} ({stats['skipped'] / stats['samples']:.1%}) {stats['reasons']}")
+    print(f"🎯 Precision:   {stats['precision']:.1%} (skips Step-1 also called incomplete)")
+    print(f"🎯 Recall:      {stats['recall']:.1%} of {incomplete} incomplete transactions")
+
+    shown = 0
+    for transcript, flag in samples:
+        if shown >= args.show_false_skips:
+            break
+        reason = skip_reason(transcript, menu_tokens)
+        if reason and int(flag or 0):
+            shown += 1
+            print(f"\n❗ False skip ({reason}): {transcript[:300]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Inspect and prune the decoded-PCM cache used by the pipeline.
+
+Usage:
+    python pcm_cache.py list
+    python pcm_cache.py prune [--max-gb 10]
+    python pcm_cache.py remove <key>
+    python pcm_cache.py clear
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.pcm_cache import PCMCache
+
+
+def format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def cmd_list(cache: PCMCache, args) -> int:
+    entries = cache.entries()
+    print(f"📁 PCM cache: {cache.cache_dir}")
+    print(f"📊 {len(entries)} entries, {format_bytes(sum(e['bytes'] for e in entries))} "
+          f"(limit {format_bytes(cache.max_bytes)})")
+    for e in entries:
+        last_used = datetime.fromtimestamp(e["last_used"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"   - {e['key']}  {e.get('source_name', '')}  {e['duration'] / 3600:.2f}h  "
+              f"{e['samplerate']}Hz x{e['channels']} {e['dtype']}  {format_bytes(e['bytes'])}  last used {last_used}")
+    return 0
+
+
+def cmd_prune(cache: PCMCache, args) -> int:
+    max_bytes = int(args.max_gb * 1024 ** 3) if args.max_gb is not None else cache.max_bytes
+    removed = cache.evict(max_bytes=max_bytes)
+    print(f"✅ Removed {len(removed)} entries, {format_bytes(cache.total_bytes())} remaining")
+    return 0
+
+
+def cmd_remove(cache: PCMCache, args) -> int:
+    keys = {e["key"] for e in cache.entries()}
+    if args.key not in keys:
+        print(f"❌ No cache entry with key {args.key}")
+        return 1
+    cache.remove(args.key)
+    print(f"✅ Removed {args.key}")
+    return 0
+
+
+def cmd_clear(cache: PCMCache, args) -> int:
+    removed = cache.evict(max_bytes=0)
+    print(f"✅ Cleared {len(removed)} entries")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and prune the decoded-PCM cache")
+    parser.add_argument('--cache-dir', help='Cache directory (defaults to PCM_CACHE_DIR)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='List cached recordings, most recently used first')
+
+    prune = subparsers.add_parser('prune', help='Evict least-recently-used entries down to a size limit')
+    prune.add_argument('--max-gb', type=float, help='Size limit in GB (defaults to PCM_CACHE_MAX_GB)')
+
+    remove = subparsers.add_parser('remove', help='Remove a single entry')
+    remove.add_argument('key', help='Entry key (<drive file id>_<checksum>)')
+
+    subparsers.add_parser('clear', help='Remove every entry')
+
+    args = parser.parse_args()
+    cache = PCMCache(cache_dir=args.cache_dir)
+    commands = {'list': cmd_list, 'prune': cmd_prune, 'remove': cmd_remove, 'clear': cmd_clear}
+    return commands[args.command](cache, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,9 @@ Executable script to run the full Hoptix pipeline.
 Takes location_id and date as command line arguments.
 
 Usage:
-    python run_pipeline.py <location_id> <date>
+    python run_pipeline.py <location_id> <date> [--from-stage STAGE] [--force-stage STAGE ...]
+
+A rerun resumes at the first stage the previous run didn't finish (see pipeline/ledger.py).
     
 Example:
     python run_pipeline.py c3607cc3-0f0c-4725-9c42-eb2fdb5e016a 2025-10-08
@@ -19,6 +21,7 @@ from datetime import datetime
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from pipeline.full_pipeline import full_pipeline
+from pipeline.ledger import STAGES, StageLedger
 
 
 def validate_date(date_string):
@@ -46,6 +49,8 @@ def main():
 Examples:
   python run_pipeline.py c3607cc3-0f0c-4725-9c42-eb2fdb5e016a 2025-10-08
   python run_pipeline.py --location-id c3607cc3-0f0c-4725-9c42-eb2fdb5e016a --date 2025-10-08
+  python run_pipeline.py c3607cc3-0f0c-4725-9c42-eb2fdb5e016a 2025-10-08 --from-stage grade
+  python run_pipeline.py c3607cc3-0f0c-4725-9c42-eb2fdb5e016a 2025-10-08 --force-stage analytics
         """
     )
     
@@ -65,6 +70,20 @@ Examples:
         help='Enable verbose output'
     )
     
+    parser.add_argument(
+        '--from-stage',
+        choices=STAGES,
+        help='Rerun this stage and every stage after it, even if the ledger says they finished'
+    )
+    
+    parser.add_argument(
+        '--force-stage',
+        action='append',
+        choices=STAGES,
+        default=[],
+        help='Rerun just this stage (repeatable)'
+    )
+    
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -94,23 +113,22 @@ Examples:
     
     if args.dry_run:
         print("🔍 DRY RUN MODE - No actual processing will occur")
-        print("\nPipeline steps that would be executed:")
-        print("  1. Check and pull audio from location and date")
-        print("  2. Transcribe audio to text")
-        print("  3. Split audio into transactions")
-        print("  4. Insert transactions into database")
-        print("  5. Grade transactions")
-        print("  6. Upsert grades into database")
-        print("  7. Generate analytics report")
-        print("  8. Write clips to Google Drive")
-        print("  9. Complete pipeline")
+        ledger = StageLedger(args.location_id, args.date)
+        rerun = set(args.force_stage)
+        if args.from_stage:
+            rerun.update(STAGES[STAGES.index(args.from_stage):])
+        print("\nPipeline stages:")
+        for i, stage in enumerate(STAGES, 1):
+            state = "run" if stage in rerun or not ledger.done(stage) else "skip (done)"
+            print(f"  {i}. {stage:<10} {state}")
         print("\n✅ Dry run completed successfully")
         return 0
     
     # Run the pipeline
     try:
         print("🔄 Starting pipeline execution...")
-        result = full_pipeline(args.location_id, args.date)
+        result = full_pipeline(args.location_id, args.date, from_stage=args.from_stage,
+                               force_stages=args.force_stage)
         
         if result == "Successfully completed full pipeline":
             print("\n🎉 Pipeline completed successfully!")
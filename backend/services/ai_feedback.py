@@ -2,6 +2,7 @@ from services.database import Supa
 from config import Settings, Prompts
 from openai import OpenAI
 from utils.helpers import json_or_none
+from utils.llm_dispatch import llm_call_with_retry
 import json
 import re
 
@@ -73,7 +74,7 @@ def get_ai_feedback(run_id=None, operator_id=None):
     print(f"🤖 Calling AI model: {settings.AI_FEEDBACK_MODEL}")
 
     #use the operator feedback to generate a feedback report
-    resp = client.responses.create(
+    resp = llm_call_with_retry(settings.AI_FEEDBACK_MODEL, client.with_options(max_retries=0).responses.create,
         model=settings.AI_FEEDBACK_MODEL,
         input=[{"role": "user", "content": [{"type": "input_text", "text": prompts.AI_FEEDBACK_PROMPT.format(feedback_block=operator_feedback)}]}],
         store=False,
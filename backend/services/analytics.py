@@ -1,10 +1,15 @@
 from services.database import Supa
+from config import Settings
 from datetime import datetime, timedelta
 import json
 import time
 
 db = Supa()
 
+# Relationship-map columns _count_transaction_metrics reads; the scalar totals come from get_summary()
+ITEM_ANALYTICS_COLUMNS = tuple(f"{kind}_{stat}" for kind in ("upsell", "upsize", "addon")
+                               for stat in ("opportunities", "offers", "successes"))
+
 class Analytics:
 
     def __init__(self, run_id: str, worker_id=None):
@@ -17,19 +22,39 @@ class Analytics:
         self.upsell_revenue = 0
         self.upsize_revenue = 0
         self.addon_revenue = 0
+        self._summary = None
+
+    def get_summary(self):
+        """
+        Transaction count, completions and average item counts in one database call when
+        run_grade_summary is deployed, or the per-metric queries otherwise. Both return the same keys.
+        """
+        if self._summary is None and Settings.ANALYTICS_SERVER_SUMMARY:
+            self._summary = db.get_run_summary(self.run_id, self.worker_id)
+        if self._summary is None:
+            self._summary = self._summary_from_queries()
+        return self._summary
+
+    def _summary_from_queries(self):
+        return {
+            "total_transactions": self.get_total_transactions(),
+            "complete_transactions": self.get_complete_transactions(),
+            "avg_items_initial": self.avg_items_initial_order(),
+            "avg_items_after": self.avg_items_after_order(),
+        }
 
     def get_total_transactions(self):
         if self.worker_id:
-            result = db.view("graded_rows_filtered").select("*").eq("run_id", self.run_id).eq("worker_id", self.worker_id).execute()
+            result = db.view("graded_rows_filtered").select("transaction_id").eq("run_id", self.run_id).eq("worker_id", self.worker_id).execute()
         else:
-            result = db.view("graded_rows_filtered").select("*").eq("run_id", self.run_id).execute()
+            result = db.view("graded_rows_filtered").select("transaction_id").eq("run_id", self.run_id).execute()
         return len(result.data) if result.data else 0
     
     def get_complete_transactions(self):
         if self.worker_id:
-            result = db.view("graded_rows_filtered").select("*").eq("run_id", self.run_id).eq("complete_order", 1).eq("worker_id", self.worker_id).execute()
+            result = db.view("graded_rows_filtered").select("transaction_id").eq("run_id", self.run_id).eq("complete_order", 1).eq("worker_id", self.worker_id).execute()
         else:
-            result = db.view("graded_rows_filtered").select("*").eq("run_id", self.run_id).eq("complete_order", 1).execute()
+            result = db.view("graded_rows_filtered").select("transaction_id").eq("run_id", self.run_id).eq("complete_order", 1).execute()
         return len(result.data) if result.data else 0
 
     def get_completion_rate(self):
@@ -129,10 +154,11 @@ class Analytics:
         # Get transaction data
         print("🔍 DEBUG: Getting transaction data from database...")
         tx_start = time.time()
+        columns = ",".join(ITEM_ANALYTICS_COLUMNS)
         if self.worker_id:
-            transactions = db.view("graded_rows_filtered").select("*").eq("run_id", self.run_id).eq("worker_id", self.worker_id).execute()
+            transactions = db.view("graded_rows_filtered").select(columns).eq("run_id", self.run_id).eq("worker_id", self.worker_id).execute()
         else:
-            transactions = db.view("graded_rows_filtered").select("*").eq("run_id", self.run_id).execute()
+            transactions = db.view("graded_rows_filtered").select(columns).eq("run_id", self.run_id).execute()
         print(f"🔍 DEBUG: Got {len(transactions.data)} transactions in {time.time() - tx_start:.2f}s")
         
         # Get price data once for all transactions
@@ -377,12 +403,13 @@ class Analytics:
         # Calculate all metrics
         print("🔍 DEBUG: Getting basic metrics...")
         basic_start = time.time()
-        total_transactions = self.get_total_transactions()
-        complete_transactions = self.get_complete_transactions()
-        completion_rate = self.get_completion_rate() if total_transactions > 0 else 0
+        summary = self.get_summary()
+        total_transactions = summary["total_transactions"]
+        complete_transactions = summary["complete_transactions"]
+        completion_rate = complete_transactions / total_transactions if total_transactions > 0 else 0
         
-        avg_items_initial = self.avg_items_initial_order()
-        avg_items_final = self.avg_items_after_order()
+        avg_items_initial = summary["avg_items_initial"]
+        avg_items_final = summary["avg_items_after"]
         avg_item_increase = avg_items_final - avg_items_initial
         print(f"🔍 DEBUG: Got basic metrics in {time.time() - basic_start:.2f}s")
         
@@ -0,0 +1,219 @@
+# Content-addressed transcript cache so re-runs don't pay for ASR twice
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import soundfile as sf
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_FRAMES = 1 << 16
+
+
+def clip_cache_key(audio_clip_path: str, model: str, prompt: str) -> str:
+    """sha256 over the clip's decoded samples plus the model and prompt.
+
+    Hashing PCM rather than file bytes means the same audio re-cut into a new file (new name,
+    new header, same samples) still hits the cache.
+    """
+    h = hashlib.sha256()
+    with sf.SoundFile(audio_clip_path) as f:
+        h.update(f"{f.samplerate}:{f.channels}:".encode())
+        for block in f.blocks(blocksize=HASH_BLOCK_FRAMES, dtype="float32", always_2d=True):
+            h.update(block.tobytes())
+    h.update(b"\0model:" + model.encode())
+    h.update(b"\0prompt:" + prompt.encode())
+    return h.hexdigest()
+
+
+class ASRCache(ABC):
+    """Backend interface. Subclasses implement _get/_set; counters live here."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self._get(key)
+        except Exception as e:
+            logger.warning(f"ASR cache read failed: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, transcript: str) -> None:
+        try:
+            evicted = self._set(key, transcript)
+        except Exception as e:
+            logger.warning(f"ASR cache write failed: {e}")
+            return
+        with self._lock:
+            self.writes += 1
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """The stored transcript, or None on a miss"""
+
+    @abstractmethod
+    def _set(self, key: str, transcript: str) -> int:
+        """Store a transcript; returns how many entries were evicted to make room"""
+
+
+class NullASRCache(ASRCache):
+    """Caching disabled: every lookup is a miss and nothing is stored"""
+
+    def _get(self, key: str) -> Optional[str]:
+        return None
+
+    def _set(self, key: str, transcript: str) -> int:
+        return 0
+
+
+class SQLiteASRCache(ASRCache):
+    """Single-file SQLite store, safe to share between threads and worker processes.
+
+    Entries older than ttl_seconds are treated as misses and purged; once the stored
+    transcripts exceed max_bytes, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: float = None, max_bytes: int = None):
+        super().__init__()
+        self.path = path or Settings.ASR_CACHE_PATH
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None else Settings.ASR_CACHE_TTL_DAYS * 86400)
+        self.max_bytes = int(max_bytes if max_bytes is not None else Settings.ASR_CACHE_MAX_MB * 1024 ** 2)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                " key TEXT PRIMARY KEY,"
+                " transcript TEXT NOT NULL,"
+                " bytes INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts(last_used)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps this usable from any thread without sharing handles
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds > 0 else float("-inf")
+
+    def _get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT transcript, created_at FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < self._expired_before():
+                conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+        finally:
+            conn.close()
+
+    def _set(self, key: str, transcript: str) -> int:
+        now = time.time()
+        size = len(transcript.encode("utf-8"))
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (key, transcript, bytes, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, transcript, size, now, now),
+            )
+            evicted = conn.execute("DELETE FROM transcripts WHERE created_at < ?", (self._expired_before(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM transcripts").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, old_bytes in conn.execute(
+                        "SELECT key, bytes FROM transcripts WHERE key != ? ORDER BY last_used", (key,)).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM transcripts WHERE key = ?", (old_key,))
+                    total -= old_bytes
+                    evicted += 1
+            conn.execute("COMMIT")
+            return evicted
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def entry_count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        finally:
+            conn.close()
+
+
+_BACKENDS = {
+    "sqlite": SQLiteASRCache,
+    "none": NullASRCache,
+}
+
+_cache: Optional[ASRCache] = None
+_cache_lock = threading.Lock()
+
+
+def register_backend(name: str, factory) -> None:
+    """Make another backend selectable through ASR_CACHE_BACKEND"""
+    _BACKENDS[name] = factory
+
+
+def get_asr_cache() -> ASRCache:
+    """Process-wide cache instance, built from ASR_CACHE_BACKEND on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = Settings.ASR_CACHE_BACKEND.lower()
+            if backend not in _BACKENDS:
+                raise ValueError(f"Unknown ASR cache backend '{backend}', expected one of {sorted(_BACKENDS)}")
+            try:
+                _cache = _BACKENDS[backend]()
+            except Exception as e:
+                logger.warning(f"ASR cache unavailable ({e}), transcribing without it")
+                _cache = NullASRCache()
+        return _cache
+
+
+def set_asr_cache(cache: Optional[ASRCache]) -> None:
+    """Swap the process-wide cache (None rebuilds it from settings on next use)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,178 @@
+# Re-encode clips for upload to the transcription endpoint
+
+import os
+import math
+import bisect
+import tempfile
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+from typing import List, Optional, Tuple
+from config import Settings
+
+ASR_SAMPLE_RATE = 16000
+TRIM_FRAME_SECONDS = 0.02  # energy is measured on 20 ms frames
+
+# name → (container, subtype, extension); "source" uploads the archive clip untouched
+ASR_UPLOAD_FORMATS = {
+    "opus": ("OGG", "OPUS", ".ogg"),
+    "vorbis": ("OGG", "VORBIS", ".ogg"),
+    "mp3": ("MP3", "MPEG_LAYER_III", ".mp3"),
+    "flac": ("FLAC", "PCM_16", ".flac"),
+    "wav": ("WAV", "PCM_16", ".wav"),
+}
+
+
+def asr_upload_format(fmt: str = None) -> str:
+    fmt = (fmt or Settings.ASR_UPLOAD_FORMAT).lower()
+    if fmt != "source" and fmt not in ASR_UPLOAD_FORMATS:
+        raise ValueError(f"Unknown ASR upload format '{fmt}', expected source or one of {sorted(ASR_UPLOAD_FORMATS)}")
+    return fmt
+
+
+def asr_encoding_tag(fmt: str = None, trim: bool = None) -> str:
+    """Describes what the model actually hears, so cached transcripts are keyed on it too"""
+    fmt = asr_upload_format(fmt)
+    if fmt == "source":
+        return "source"
+    tag = f"{fmt}-{ASR_SAMPLE_RATE}-mono"
+    if Settings.ASR_TRIM_SILENCE if trim is None else trim:
+        tag += (f"-trim{Settings.ASR_TRIM_RMS_THRESHOLD:g}"
+                f"/{Settings.ASR_TRIM_PAD_SECONDS:g}/{Settings.ASR_TRIM_MAX_GAP_SECONDS:g}")
+    return tag
+
+
+class OffsetMap:
+    """Maps times in a compacted clip back to times in the clip it was cut from.
+
+    segments holds (compacted_start, source_start, length) in seconds, in order; everything
+    between two source ranges was silence that got dropped.
+    """
+
+    def __init__(self, segments: List[Tuple[float, float, float]], source_duration: float):
+        self.segments = segments
+        self.source_duration = source_duration
+        self._starts = [seg[0] for seg in segments]
+
+    @property
+    def duration(self) -> float:
+        if not self.segments:
+            return 0.0
+        start, _, length = self.segments[-1]
+        return start + length
+
+    @property
+    def removed(self) -> float:
+        return max(0.0, self.source_duration - self.duration)
+
+    def to_source(self, t: float) -> float:
+        """Compacted-clip seconds → source-clip seconds"""
+        if not self.segments:
+            return t
+        i = max(0, bisect.bisect_right(self._starts, t) - 1)
+        start, source_start, length = self.segments[i]
+        return source_start + min(max(t - start, 0.0), length)
+
+
+def compact_silence(mono: np.ndarray, sr: int, threshold: float = None, pad: float = None,
+                    max_gap: float = None) -> Tuple[np.ndarray, OffsetMap]:
+    """
+    Drop leading/trailing silence and shorten long pauses.
+
+    A 20 ms frame is speech when its RMS is above threshold; speech is padded by `pad` seconds
+    on both sides, and any pause longer than `max_gap` is cut down to `max_gap` so the model
+    still hears a turn boundary. A clip with no speech at all comes back unchanged.
+    """
+    threshold = Settings.ASR_TRIM_RMS_THRESHOLD if threshold is None else threshold
+    pad = Settings.ASR_TRIM_PAD_SECONDS if pad is None else pad
+    max_gap = Settings.ASR_TRIM_MAX_GAP_SECONDS if max_gap is None else max_gap
+    source_duration = len(mono) / sr
+
+    frame = max(1, int(TRIM_FRAME_SECONDS * sr))
+    n_frames = -(-len(mono) // frame)
+    padded = np.zeros(n_frames * frame, dtype=np.float32)
+    padded[:len(mono)] = mono
+    blocks = padded.reshape(n_frames, frame)
+    rms = np.sqrt(np.einsum("ij,ij->i", blocks, blocks) / frame)
+    active = rms > threshold
+    if not active.any():
+        return mono, OffsetMap([(0.0, 0.0, source_duration)], source_duration)
+
+    pad_frames = int(round(pad / TRIM_FRAME_SECONDS))
+    if pad_frames:
+        active = np.convolve(active, np.ones(2 * pad_frames + 1, dtype=int), mode="same") > 0
+
+    # Frame ranges [start, end) of speech, then merge across pauses no longer than max_gap
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    gap_frames = int(round(max_gap / TRIM_FRAME_SECONDS))
+    keep = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if keep and start - keep[-1][1] <= gap_frames:
+            keep[-1][1] = end
+            continue
+        if keep:
+            keep[-1][1] += gap_frames  # keep a short pause instead of the whole gap
+        keep.append([start, end])
+
+    pieces, segments, out_frames = [], [], 0
+    for start, end in keep:
+        lo, hi = start * frame, min(end * frame, len(mono))
+        pieces.append(mono[lo:hi])
+        segments.append((out_frames / sr, lo / sr, (hi - lo) / sr))
+        out_frames += hi - lo
+    return np.concatenate(pieces), OffsetMap(segments, source_duration)
+
+
+def downmix_resample(audio: np.ndarray, sr: int, target_sr: int = ASR_SAMPLE_RATE) -> np.ndarray:
+    """(frames, channels) → mono float32 at target_sr using a polyphase anti-aliasing filter"""
+    mono = audio.mean(axis=1) if audio.ndim == 2 else audio
+    if sr != target_sr:
+        g = math.gcd(int(sr), int(target_sr))
+        mono = resample_poly(mono, target_sr // g, int(sr) // g)
+    return np.clip(mono, -1.0, 1.0).astype(np.float32, copy=False)
+
+
+def encode_for_asr(audio_clip_path: str, fmt: str = None,
+                   trim: bool = None) -> Tuple[str, bool, Optional[OffsetMap]]:
+    """
+    Write a mono 16 kHz compact copy of the clip next to it for upload, with silence trimmed
+    and long pauses compacted when ASR_TRIM_SILENCE is on.
+
+    The archive clip is left as-is. Returns (path to upload, whether that path is a temporary
+    file the caller should delete, offset map or None if nothing was compacted); with format
+    "source" or on failure it's the original clip.
+    """
+    fmt = asr_upload_format(fmt)
+    trim = Settings.ASR_TRIM_SILENCE if trim is None else trim
+    if fmt == "source":
+        return audio_clip_path, False, None
+
+    container, subtype, ext = ASR_UPLOAD_FORMATS[fmt]
+    base = os.path.splitext(os.path.basename(audio_clip_path))[0]
+    fd, out_path = tempfile.mkstemp(suffix=ext, prefix=f"{base}.asr-", dir=os.path.dirname(audio_clip_path) or None)
+    os.close(fd)
+    try:
+        audio, sr = sf.read(audio_clip_path, dtype="float32", always_2d=True)
+        mono = downmix_resample(audio, sr)
+        offset_map = None
+        if trim:
+            mono, offset_map = compact_silence(mono, ASR_SAMPLE_RATE)
+        sf.write(out_path, mono, ASR_SAMPLE_RATE, format=container, subtype=subtype)
+        return out_path, True, offset_map
+    except Exception as e:
+        print(f"⚠️ Could not re-encode {os.path.basename(audio_clip_path)} for ASR ({e}), uploading original")
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return audio_clip_path, False, None
+
+
+def trim_offset_map(audio_clip_path: str) -> Optional[OffsetMap]:
+    """The offset map encode_for_asr would produce, without writing an upload (for cache hits)"""
+    if asr_upload_format() == "source" or not Settings.ASR_TRIM_SILENCE:
+        return None
+    try:
+        audio, sr = sf.read(audio_clip_path, dtype="float32", always_2d=True)
+        return compact_silence(downmix_resample(audio, sr), ASR_SAMPLE_RATE)[1]
+    except Exception:
+        return None
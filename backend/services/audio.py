@@ -1,21 +1,39 @@
 import os
+import bisect
 import numpy as np
 import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Tuple
+from typing import Callable, List, Tuple
 from moviepy.editor import AudioFileClip
+from config import Settings
+from services.pcm_cache import CachedPCM
+
+SILENCE_MODES = ("mean", "rms")
 
 class AudioTransactionProcessor:
     """Process audio files to extract individual transactions using silence detection"""
     
-    def __init__(self):
+    def __init__(self, silence_mode: str = None, rms_threshold: float = None, workers: int = None):
         # Audio processing constants
         self.AUDIO_SAMPLE_RATE = 44100
         self.SILENCE_INTERVAL = 7  # seconds - much shorter for drive-thru transactions
+        self.CHUNK_DURATION = 300  # seconds - 5 minutes read at a time
         self.TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+        # Number of processes for the silence scan; 1 keeps the single streaming pass
+        self.WORKERS = max(1, int(workers if workers is not None else Settings.SILENCE_SCAN_WORKERS))
+
+        # Silence test applied to each SILENCE_INTERVAL window
+        self.SILENCE_MODE = silence_mode or Settings.SILENCE_DETECTION_MODE
+        self.RMS_THRESHOLD = Settings.SILENCE_RMS_THRESHOLD if rms_threshold is None else float(rms_threshold)
+        if self.SILENCE_MODE not in SILENCE_MODES:
+            raise ValueError(f"Unknown silence mode '{self.SILENCE_MODE}', expected one of {SILENCE_MODES}")
     
     def create_audio_subclips(self, audio_path: str, location_id: str, 
-                            output_dir: str = "extracted_audio", original_filename: str = None) -> Tuple[List[str], List[float], List[float], List[str], List[str]]:
+                            output_dir: str = "extracted_audio", original_filename: str = None,
+                            pcm: CachedPCM = None,
+                            on_clip: Callable[[int, str, float, float], None] = None) -> Tuple[List[str], List[float], List[float], List[str], List[str]]:
         """
         Create audio subclips from audio file using silence detection (adapted from create_subclips)
         
@@ -24,6 +42,11 @@ class AudioTransactionProcessor:
             location_id: Location identifier
             output_dir: Directory to save audio clips
             original_filename: The original filename of the audio, used for timestamp parsing.
+            pcm: Decoded copy of audio_path from the PCM cache; when given, chunks are read as
+                 zero-copy views of it instead of decoding audio_path again.
+            on_clip: Called as on_clip(index, clip_path, begin_time, end_time) as soon as each
+                     clip is finished (clip_path is "" if it failed), so later stages can start
+                     on clip i while clip i+1 is still being cut.
             
         Returns:
             Tuple of (audio_clip_paths, begin_times, end_times, reg_begin_times, reg_end_times)
@@ -33,25 +56,29 @@ class AudioTransactionProcessor:
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
         
-        print('Loading Audio Info (Memory Safe)')
-        # Get audio info without loading entire file
-        with sf.SoundFile(audio_path) as f:
-            sr = f.samplerate
-            total_frames = f.frames
-            duration = total_frames / sr
+        # For timestamp conversion, use original filename if available, otherwise use audio_path
+        timestamp_audio_path = original_filename if original_filename else audio_path
+        
+        # Parallel mode scans shards in a process pool first, then the pass below only writes clips
+        boundaries = self.scan_silence_boundaries(audio_path, pcm=pcm) if self.WORKERS > 1 else None
         
-        print('Splicing Audio and Generating Relative Beginning and Ending Timestamps (Chunked)')
+        print('Splicing Audio and Writing Clips in a Single Streaming Pass')
         trans_begin = []
         trans_end = []
-        interval = self.AUDIO_SAMPLE_RATE * self.SILENCE_INTERVAL
+        audio_clip_paths = []
+        open_clip = None  # at most one clip is being written at any time
         current_time = 0.0
         prev_state = 0  # 0 = silence, 1 = active
         
         # Process in chunks to avoid memory issues
-        chunk_duration = 300  # 5 minutes at a time
-        print(f'Processing {duration:.1f}s audio in {chunk_duration}s chunks...')
+        chunk_duration = self.CHUNK_DURATION
         
-        with sf.SoundFile(audio_path) as f:
+        with _open_audio(audio_path, pcm) as f:
+            sr = f.samplerate
+            total_frames = f.frames
+            duration = total_frames / sr
+            print(f'Processing {duration:.1f}s audio in {chunk_duration}s chunks...')
+            
             while current_time < duration:
                 # Calculate chunk boundaries
                 chunk_start_frame = int(current_time * sr)
@@ -61,68 +88,202 @@ class AudioTransactionProcessor:
                 if frames_to_read <= 0:
                     break
                 
-                # Read chunk
-                f.seek(chunk_start_frame)
+                # Read chunk sequentially - the file is decoded exactly once, front to back
                 chunk_data = f.read(frames_to_read)
                 
                 # Process chunk for silence detection
-                chunk_begin, chunk_end, new_state = self._detect_silence_in_chunk(
-                    chunk_data, current_time, sr, prev_state
-                )
+                if boundaries is None:
+                    chunk_begin, chunk_end, new_state = self._detect_silence_in_chunk(
+                        chunk_data, current_time, sr, prev_state
+                    )
+                else:
+                    chunk_begin, chunk_end = self._boundaries_in_range(
+                        boundaries, current_time, current_time + chunk_duration
+                    )
+                    new_state = prev_state
+                
+                # Begins and ends alternate, so walking them in time order drives the clip writer
+                events = sorted([(t, True) for t in chunk_begin] + [(t, False) for t in chunk_end])
+                for event_time, is_begin in events:
+                    if is_begin:
+                        trans_begin.append(event_time)
+                        open_clip = self._open_clip_writer(
+                            output_dir, location_id, timestamp_audio_path, event_time,
+                            len(trans_begin) - 1, sr, f.channels
+                        )
+                    else:
+                        trans_end.append(event_time)
+                        if open_clip is not None:
+                            end_frame = open_clip["start_frame"] + int((event_time - open_clip["begin"]) * sr)
+                            self._write_clip_frames(open_clip, chunk_data, chunk_start_frame, end_frame)
+                            audio_clip_paths.append(self._close_clip_writer(open_clip))
+                            open_clip = None
+                            if on_clip:
+                                on_clip(len(audio_clip_paths) - 1, audio_clip_paths[-1], trans_begin[-1], trans_end[-1])
                 
-                # Update transaction boundaries
-                trans_begin.extend(chunk_begin)
-                trans_end.extend(chunk_end)
+                # A clip still open at the chunk border takes the rest of this chunk
+                if open_clip is not None:
+                    self._write_clip_frames(open_clip, chunk_data, chunk_start_frame, chunk_end_frame)
                 
                 # Update state for next chunk
                 prev_state = new_state
                 
                 current_time += chunk_duration
 
+        if len(trans_begin) != len(trans_end):
+            trans_end.append(duration)
+        if open_clip is not None:
+            audio_clip_paths.append(self._close_clip_writer(open_clip))
+            if on_clip:
+                on_clip(len(audio_clip_paths) - 1, audio_clip_paths[-1], trans_begin[-1], trans_end[-1])
+
         print(f"Found {len(trans_begin)} transactions")
         print(f"Begin times: {trans_begin}")
         print(f"End times: {trans_end}")
 
-        if len(trans_begin) != len(trans_end):
-            trans_end.append(duration)
-
         # Generate regularized timestamps
         print('Regularizing Beginning and Ending Timestamps')
-        # For timestamp conversion, use original filename if available, otherwise use audio_path
-        timestamp_audio_path = original_filename if original_filename else audio_path
         trans_reg_begin = [self._convert_timestamp_to_hhmmss(i, timestamp_audio_path) for i in trans_begin]
         trans_reg_end = [self._convert_timestamp_to_hhmmss(i, timestamp_audio_path) for i in trans_end]
-
-        # Create audio clips
-        print('Creating audio clips...')
-        audio_clip_paths = []
-        
-        for i in range(len(trans_begin)):
-            try:
-                # Generate unique filename
-                clip_filename = self._generate_clip_filename(
-                    location_id, timestamp_audio_path, trans_reg_begin[i], i
-                )
-                clip_path = os.path.join(output_dir, clip_filename)
-                
-                # Extract audio segment using soundfile
-                self._extract_audio_segment_soundfile(audio_path, clip_path, trans_begin[i], trans_end[i], sr)
-                
-                # Verify clip was created successfully
-                if os.path.exists(clip_path) and os.path.getsize(clip_path) > 0:
-                    audio_clip_paths.append(clip_path)
-                    print(f'✅ Created audio clip {i+1}/{len(trans_begin)}: {clip_filename}')
-                else:
-                    print(f'❌ Failed to create audio clip {i+1}: {clip_filename}')
-                    audio_clip_paths.append("")
-                    
-            except Exception as e:
-                print(f'❌ Error creating audio clip {i+1}: {e}')
-                audio_clip_paths.append("")
         
         print(f'🎉 Audio processing completed: {len([p for p in audio_clip_paths if p])} clips created')
         return audio_clip_paths, trans_begin, trans_end, trans_reg_begin, trans_reg_end
     
+    def _open_clip_writer(self, output_dir: str, location_id: str, timestamp_audio_path: str,
+                          begin_time: float, index: int, sr: int, channels: int) -> dict:
+        """
+        Start a new clip at begin_time. The returned dict tracks the open file and how many
+        frames it should receive; frames are appended as the source stream goes by.
+        """
+        clip = {
+            "index": index,
+            "begin": begin_time,
+            "start_frame": int(begin_time * sr),
+            "written_to": int(begin_time * sr),
+            "path": "",
+            "file": None,
+        }
+        try:
+            clip_filename = self._generate_clip_filename(
+                location_id, timestamp_audio_path,
+                self._convert_timestamp_to_hhmmss(begin_time, timestamp_audio_path), index
+            )
+            clip["path"] = os.path.join(output_dir, clip_filename)
+            clip["file"] = sf.SoundFile(clip["path"], mode="w", samplerate=sr, channels=channels)
+        except Exception as e:
+            print(f'❌ Error creating audio clip {index+1}: {e}')
+            clip["file"] = None
+        return clip
+    
+    def _write_clip_frames(self, clip: dict, chunk_data: np.ndarray, chunk_start_frame: int, end_frame: int):
+        """
+        Append the part of chunk_data between the clip's write position and end_frame
+        """
+        if clip["file"] is None:
+            return
+        lo = max(clip["written_to"], chunk_start_frame) - chunk_start_frame
+        hi = min(end_frame - chunk_start_frame, len(chunk_data))
+        if hi <= lo:
+            return
+        try:
+            clip["file"].write(chunk_data[lo:hi])
+            clip["written_to"] = chunk_start_frame + hi
+        except Exception as e:
+            print(f'❌ Error writing audio clip {clip["index"]+1}: {e}')
+            clip["file"].close()
+            clip["file"] = None
+    
+    def _close_clip_writer(self, clip: dict) -> str:
+        """
+        Finish a clip and return its path, or "" if it could not be written
+        """
+        if clip["file"] is None:
+            return ""
+        try:
+            clip["file"].close()
+        except Exception as e:
+            print(f'❌ Error finalizing audio clip {clip["index"]+1}: {e}')
+            return ""
+        
+        clip_filename = os.path.basename(clip["path"])
+        # Verify clip was created successfully
+        if os.path.exists(clip["path"]) and os.path.getsize(clip["path"]) > 0:
+            print(f'✅ Created audio clip {clip["index"]+1}: {clip_filename}')
+            return clip["path"]
+        print(f'❌ Failed to create audio clip {clip["index"]+1}: {clip_filename}')
+        return ""
+    
+    def scan_silence_boundaries(self, audio_path: str, workers: int = None,
+                                pcm: CachedPCM = None) -> Tuple[List[float], List[float]]:
+        """
+        Scan the whole file for transaction boundaries using a process pool.
+
+        The chunk range is split into contiguous shards aligned to CHUNK_DURATION, so every
+        window sits exactly where the serial scan puts it. Each shard is scanned as if it
+        started in the state of its own first window; the shards are then stitched in order,
+        adding a begin/end at a shard's first window only when the carried state disagrees.
+        The result matches the serial state machine exactly (the trailing end at EOF is
+        still added by the caller).
+
+        Returns:
+            Tuple of (begin_times, end_times)
+        """
+        workers = max(1, int(workers or self.WORKERS))
+        with _open_audio(audio_path, pcm) as f:
+            sr = f.samplerate
+            duration = f.frames / sr
+        
+        n_chunks = 0
+        while n_chunks * self.CHUNK_DURATION < duration:
+            n_chunks += 1
+        workers = min(workers, max(1, n_chunks))
+        
+        # Contiguous, balanced chunk ranges
+        shard_edges = [round(i * n_chunks / workers) for i in range(workers + 1)]
+        shards = [(shard_edges[i], shard_edges[i + 1]) for i in range(workers) if shard_edges[i] < shard_edges[i + 1]]
+        print(f'Scanning {duration:.1f}s audio for silence in {len(shards)} shards on {workers} workers...')
+        
+        # Workers re-open the memory map from its header rather than pickling samples
+        params = (self.SILENCE_MODE, self.RMS_THRESHOLD, self.SILENCE_INTERVAL, self.CHUNK_DURATION,
+                  pcm.header_path if pcm is not None else None)
+        if len(shards) <= 1:
+            results = [_scan_shard(audio_path, first, last, params) for first, last in shards]
+        else:
+            with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+                futures = [executor.submit(_scan_shard, audio_path, first, last, params) for first, last in shards]
+                results = [future.result() for future in futures]
+        
+        return self._stitch_shards(results)
+    
+    @staticmethod
+    def _stitch_shards(results: List[dict], prev_state: int = 0) -> Tuple[List[float], List[float]]:
+        """
+        Join per-shard scans (in order) into the begin/end lists of one serial scan
+        """
+        trans_begin = []
+        trans_end = []
+        for shard in results:
+            if shard["first_time"] is None:
+                continue  # no full windows, state passes through
+            if shard["first_state"] != prev_state:
+                if shard["first_state"] == 1:
+                    trans_begin.append(shard["first_time"])
+                else:
+                    trans_end.append(shard["first_time"])
+            trans_begin.extend(shard["begin"])
+            trans_end.extend(shard["end"])
+            prev_state = shard["last_state"]
+        return trans_begin, trans_end
+    
+    @staticmethod
+    def _boundaries_in_range(boundaries: Tuple[List[float], List[float]], start: float, end: float) -> Tuple[List[float], List[float]]:
+        """
+        Slice precomputed (sorted) begin/end lists to the times in [start, end)
+        """
+        begins, ends = boundaries
+        return (begins[bisect.bisect_left(begins, start):bisect.bisect_left(begins, end)],
+                ends[bisect.bisect_left(ends, start):bisect.bisect_left(ends, end)])
+    
     def _convert_timestamp_to_hhmmss(self, seconds: float, audio_path: str) -> str:
         """
         Convert seconds to HH:MM:SS format based on audio file timestamp
@@ -247,34 +408,51 @@ class AudioTransactionProcessor:
                                sr: int, prev_state: int) -> Tuple[List[float], List[float], int]:
         """
         Detect silence in a chunk of audio data (memory safe)
+
+        The chunk is reshaped into (n_windows, interval_samples) blocks and every window
+        statistic is computed in a single reduction. Windows are laid out exactly like the
+        original scan (index += interval while index + interval < len), so the trailing
+        partial window of each chunk is ignored and prev_state carries across chunks.
         """
-        chunk_begin = []
-        chunk_end = []
-        
         interval_samples = int(self.SILENCE_INTERVAL * sr)
         
         if len(chunk_data) < interval_samples:
-            return chunk_begin, chunk_end, prev_state
+            return [], [], prev_state
         
-        index = 0
-        current_state = prev_state
+        silent = self._silent_windows(chunk_data, interval_samples)
+        if silent.size == 0:
+            return [], [], prev_state
         
-        while index + interval_samples < len(chunk_data):
-            interval_avg = float(np.average(chunk_data[index:index + interval_samples]))
-            current_time = chunk_start_time + (index / sr)
-            
-            if interval_avg == 0.0:  # Silent period
-                if current_state == 1:  # Transition from active to silence
-                    chunk_end.append(current_time)
-                    current_state = 0
-            else:  # Active period
-                if current_state == 0:  # Transition from silence to active
-                    chunk_begin.append(current_time)
-                    current_state = 1
-            
-            index += interval_samples
+        # 1 = active, 0 = silence; prepend the carried state so the first window can transition
+        states = np.concatenate(([prev_state], (~silent).astype(np.int8)))
+        transitions = np.diff(states)
+        window_times = chunk_start_time + (np.arange(silent.size) * interval_samples) / sr
+        
+        chunk_begin = window_times[transitions == 1].tolist()
+        chunk_end = window_times[transitions == -1].tolist()
         
-        return chunk_begin, chunk_end, current_state
+        return chunk_begin, chunk_end, int(states[-1])
+    
+    def _silent_windows(self, chunk_data: np.ndarray, interval_samples: int) -> np.ndarray:
+        """
+        Return a boolean array with one entry per full window, True where the window is silent
+        """
+        n_windows = (len(chunk_data) - 1) // interval_samples
+        if n_windows <= 0:
+            return np.zeros(0, dtype=bool)
+        
+        # Flatten channels into each window so the reduction matches np.average(window)
+        windows = np.ascontiguousarray(chunk_data[:n_windows * interval_samples]).reshape(n_windows, -1)
+        
+        if self.SILENCE_MODE == "rms":
+            rms = np.sqrt(np.einsum('ij,ij->i', windows, windows, dtype=np.float64) / windows.shape[1])
+            if np.issubdtype(windows.dtype, np.integer):
+                # int16 PCM cache: rescale to [-1, 1] like soundfile's float reads so the threshold means the same
+                rms /= -float(np.iinfo(windows.dtype).min)
+            return rms <= self.RMS_THRESHOLD
+        
+        # Accumulate in float64 so float32 input (e.g. the PCM cache) scores like a float64 read
+        return windows.mean(axis=1, dtype=np.float64) == 0.0
     
     def _extract_audio_segment_soundfile(self, input_path: str, output_path: str, 
                                        start_time: float, end_time: float, sample_rate: int):
@@ -291,4 +469,53 @@ class AudioTransactionProcessor:
             
         except Exception as e:
             print(f'❌ Error extracting audio segment with soundfile: {e}')
-            raise e
\ No newline at end of file
+            raise e
+
+
+def _open_audio(audio_path: str, pcm: CachedPCM = None):
+    """SoundFile for audio_path, or a reader over its cached PCM when one is available"""
+    return pcm.reader() if pcm is not None else sf.SoundFile(audio_path)
+
+
+def _scan_shard(audio_path: str, first_chunk: int, last_chunk: int, params: tuple) -> dict:
+    """
+    Process-pool worker: scan chunks [first_chunk, last_chunk) of audio_path.
+
+    The shard starts in the state of its own first full window, so it never reports a
+    transition there; AudioTransactionProcessor._stitch_shards decides that from the
+    state carried over from the previous shard.
+    """
+    silence_mode, rms_threshold, silence_interval, chunk_duration, pcm_header_path = params
+    processor = AudioTransactionProcessor(silence_mode=silence_mode, rms_threshold=rms_threshold, workers=1)
+    processor.SILENCE_INTERVAL = silence_interval
+    
+    shard = {"begin": [], "end": [], "first_time": None, "first_state": None, "last_state": None}
+    state = None
+    pcm = CachedPCM(pcm_header_path) if pcm_header_path else None
+    with _open_audio(audio_path, pcm) as f:
+        sr = f.samplerate
+        total_frames = f.frames
+        interval_samples = int(silence_interval * sr)
+        for k in range(first_chunk, last_chunk):
+            current_time = float(k * chunk_duration)
+            chunk_start_frame = int(current_time * sr)
+            chunk_end_frame = min(int((current_time + chunk_duration) * sr), total_frames)
+            if chunk_end_frame - chunk_start_frame <= 0:
+                break
+            f.seek(chunk_start_frame)
+            chunk_data = f.read(chunk_end_frame - chunk_start_frame)
+            
+            if state is None:
+                silent = processor._silent_windows(chunk_data, interval_samples) if len(chunk_data) >= interval_samples else []
+                if len(silent) == 0:
+                    continue
+                state = 0 if silent[0] else 1
+                shard["first_time"] = current_time
+                shard["first_state"] = state
+            
+            chunk_begin, chunk_end, state = processor._detect_silence_in_chunk(chunk_data, current_time, sr, state)
+            shard["begin"].extend(chunk_begin)
+            shard["end"].extend(chunk_end)
+    
+    shard["last_state"] = state
+    return shard
@@ -31,15 +31,13 @@ def verify_location_ownership(user_id: str, location_id: str) -> bool:
             logger.info(f"Admin user {user_id} granted access to location {location_id}")
             return True
 
-        # Query locations table to check owner_id
-        result = db.client.table("locations").select("owner_id").eq("id", location_id).single().execute()
+        # Owner lookups are cached briefly (REF_CACHE_OWNER_TTL); missing locations are not
+        owner_id = db.get_location_owner(location_id)
 
-        if not result.data:
+        if owner_id is None:
             logger.warning(f"Location {location_id} not found")
             return False
 
-        owner_id = result.data.get("owner_id")
-
         if owner_id == user_id:
             return True
 
@@ -68,15 +66,13 @@ def verify_run_ownership(user_id: str, run_id: str) -> bool:
             logger.info(f"Admin user {user_id} granted access to run {run_id}")
             return True
 
-        # Query runs table to get location_id
-        run_result = db.client.table("runs").select("location_id").eq("id", run_id).single().execute()
-
-        if not run_result.data:
+        # A run's location never changes, so this lookup is cached
+        try:
+            location_id = db.get_location_from_run(run_id)
+        except IndexError:
             logger.warning(f"Run {run_id} not found")
             return False
 
-        location_id = run_result.data.get("location_id")
-
         if not location_id:
             logger.error(f"Run {run_id} has no location_id")
             return False
@@ -0,0 +1,238 @@
+# Offline Step-2 grading through the OpenAI Batch API
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from config import Settings
+from utils.helpers import json_or_none, calculate_gpt_price_batch
+from services import grader
+from utils.llm_dispatch import pool_size
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def job_key(transactions: List[Dict], location_id: str, testing: bool) -> str:
+    """Same transactions + location + model → same job, so a restarted worker finds its batch"""
+    ids = sorted(str(tx.get("id")) for tx in transactions)
+    raw = json.dumps([location_id, Settings.STEP2_MODEL, bool(testing), ids])
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+class BatchJobState:
+    """Progress of one batch job persisted as JSON, rewritten atomically after every step"""
+
+    def __init__(self, key: str, state_dir: str = None):
+        self.state_dir = state_dir or Settings.STEP2_BATCH_STATE_DIR
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.path = os.path.join(self.state_dir, f"step2_batch_{key}.json")
+        self.data: Dict[str, Any] = {"key": key, "ingested": []}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+
+    def __getitem__(self, name):
+        return self.data.get(name)
+
+    def update(self, **fields) -> None:
+        self.data.update(fields)
+        fd, tmp = tempfile.mkstemp(dir=self.state_dir, prefix=".step2_batch_")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _output_text(body: Dict[str, Any]) -> str:
+    """Text of the assistant message in a Responses API body (skips reasoning items)"""
+    for item in body.get("output") or []:
+        if item.get("type") == "message":
+            for part in item.get("content") or []:
+                if part.get("text") is not None:
+                    return part["text"]
+    return "{}"
+
+
+def _usage_price(body: Dict[str, Any]) -> float:
+    usage = body.get("usage") or {}
+    resp = SimpleNamespace(usage=SimpleNamespace(input_tokens=usage.get("input_tokens", 0),
+                                                 output_tokens=usage.get("output_tokens", 0)))
+    return calculate_gpt_price_batch(resp)
+
+
+def write_batch_input(transactions: List[Dict], step2_prompt: str, testing: bool, path: str,
+                      location_id: str = None) -> int:
+    """One /v1/responses request per transaction, custom_id = transaction id"""
+    count = 0
+    with open(path, "w") as f:
+        for tx in transactions:
+            transcript = (tx.get("meta") or {}).get("text", "")
+            if location_id is not None:
+                step2_for_tx = grader.step2_prompt_for(location_id, transcript, step2_prompt)
+            else:
+                step2_for_tx = step2_prompt
+            prompt = step2_for_tx + "\n\nProcess this transcript:\n" + transcript
+            f.write(json.dumps({
+                "custom_id": str(tx["id"]),
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": grader.step2_request_body(prompt, testing),
+            }) + "\n")
+            count += 1
+    return count
+
+
+def submit_batch(transactions: List[Dict], location_id: str, testing: bool, state: BatchJobState) -> str:
+    """Upload the JSONL and create the batch, recording each id as soon as we have it"""
+    if state["batch_id"]:
+        return state["batch_id"]
+
+    if not state["input_file_id"]:
+        step2_prompt = grader.build_step2_prompt(location_id)
+        fd, path = tempfile.mkstemp(suffix=".jsonl", prefix="step2_batch_")
+        os.close(fd)
+        try:
+            count = write_batch_input(transactions, step2_prompt, testing, path, location_id)
+            with open(path, "rb") as f:
+                uploaded = grader.client.files.create(file=f, purpose="batch")
+        finally:
+            os.remove(path)
+        state.update(input_file_id=uploaded.id, requests=count)
+        print(f"📤 Uploaded {count} Step-2 requests for batch grading ({uploaded.id})")
+
+    batch = grader.client.batches.create(
+        input_file_id=state["input_file_id"],
+        endpoint="/v1/responses",
+        completion_window=Settings.STEP2_BATCH_COMPLETION_WINDOW,
+        metadata={"location_id": str(location_id), "job": state["key"]},
+    )
+    state.update(batch_id=batch.id, submitted_at=time.time())
+    print(f"🚀 Submitted Step-2 batch {batch.id}")
+    return batch.id
+
+
+def poll_batch(batch_id: str, base_delay: float = None, max_delay: float = None, timeout: float = None):
+    """Wait for the batch to reach a terminal status, backing off exponentially between polls"""
+    base_delay = Settings.STEP2_BATCH_POLL_BASE_SECONDS if base_delay is None else base_delay
+    max_delay = Settings.STEP2_BATCH_POLL_MAX_SECONDS if max_delay is None else max_delay
+    timeout = Settings.STEP2_BATCH_TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.time()
+    attempt = 0
+    while True:
+        batch = grader.client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        progress = f" ({counts.completed}/{counts.total} done, {counts.failed} failed)" if counts else ""
+        print(f"⏳ Batch {batch_id}: {batch.status}{progress}")
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        if time.time() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout:.0f}s")
+        time.sleep(min(max_delay, base_delay * (2 ** attempt)))
+        attempt += 1
+
+
+def iter_result_lines(file_id: str) -> Iterator[Dict[str, Any]]:
+    """Stream the result file line by line instead of loading it into memory"""
+    with grader.client.files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def ingest_results(batch, tx_by_id: Dict[str, Dict], state: BatchJobState,
+                   flush_every: int = None) -> List[Dict]:
+    """
+    Turn result lines into grade rows and upsert them in small groups while the file streams.
+
+    Lines for transactions already recorded as ingested (from an earlier, interrupted run) are
+    skipped. Returns the grade rows ingested by this call.
+    """
+    flush_every = max(1, flush_every or Settings.STEP2_BATCH_UPSERT_EVERY)
+    ingested = set(state["ingested"] or [])
+    pending: List[Dict] = []
+    graded: List[Dict] = []
+
+    def flush():
+        if not pending:
+            return
+        grader.db.upsert_grades(pending)
+        ingested.update(str(g["transaction_id"]) for g in pending)
+        state.update(ingested=sorted(ingested))
+        graded.extend(pending)
+        pending.clear()
+
+    if batch.output_file_id:
+        for line in iter_result_lines(batch.output_file_id):
+            tx_id = line.get("custom_id")
+            tx = tx_by_id.get(tx_id)
+            response = line.get("response") or {}
+            if tx is None or tx_id in ingested or line.get("error") or response.get("status_code") != 200:
+                continue
+            body = response.get("body") or {}
+            parsed = json_or_none(_output_text(body)) or {}
+            pending.append({
+                "transaction_id":  tx.get("id"),
+                "details":         grader.map_step2_to_grade_cols(parsed, tx.get("meta") or {}),
+                "transcript":      (tx.get("meta") or {}).get("text", ""),
+                "gpt_price":       _usage_price(body),
+            })
+            if len(pending) >= flush_every:
+                flush()
+    flush()
+    return graded
+
+
+def grade_transactions_batch(transactions: List[Dict], location_id: str, testing: bool = True,
+                             state_dir: str = None) -> List[Dict]:
+    """
+    Grade through the Batch API: write JSONL → upload → create batch → poll → stream results.
+
+    Grades are upserted as they're ingested, and progress is kept in a state file, so calling
+    this again with the same transactions after a restart picks up the same batch rather than
+    paying for a new one. Anything the batch didn't answer (errors, expiry, empty transcripts,
+    missing ids) is graded online one transaction at a time.
+    """
+    with_ids = [tx for tx in transactions if tx.get("id") and ((tx.get("meta") or {}).get("text") or "").strip()]
+    batched = {id(tx) for tx in with_ids}
+    leftovers = [tx for tx in transactions if id(tx) not in batched]
+    tx_by_id = {str(tx["id"]): tx for tx in with_ids}
+    graded: List[Dict] = []
+
+    if with_ids:
+        state = BatchJobState(job_key(with_ids, location_id, testing), state_dir)
+        if state["batch_id"]:
+            print(f"🔁 Resuming Step-2 batch {state['batch_id']} ({len(state['ingested'] or [])} already ingested)")
+        batch_id = submit_batch(with_ids, location_id, testing, state)
+        batch = poll_batch(batch_id)
+        state.update(status=batch.status)
+        graded = ingest_results(batch, tx_by_id, state)
+        done = set(state["ingested"] or [])
+        missing = [tx for tx_id, tx in tx_by_id.items() if tx_id not in done]
+        print(f"📥 Ingested {len(graded)} batch grades (batch {batch.status}), {len(missing)} to grade online")
+        leftovers.extend(missing)
+        if not missing:
+            state.clear()
+    else:
+        state = None
+
+    if leftovers:
+        step2_prompt = grader.build_step2_prompt(location_id)
+        with ThreadPoolExecutor(max_workers=pool_size(Settings.STEP2_MODEL)) as executor:
+            online = [g for g in executor.map(
+                lambda tx: grader._grade_transaction(tx, location_id, step2_prompt, testing), leftovers)
+                if g is not None]
+        if online:
+            grader.db.upsert_grades(online)
+        graded.extend(online)
+        if state is not None:
+            state.clear()
+
+    print(f"✅ Batch grading finished: {len(graded)} grades written this run")
+    return graded
@@ -0,0 +1,99 @@
+# Chunked, parallel bulk writes to PostgREST
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+from config import Settings
+
+
+def row_bytes(row: Dict) -> int:
+    return len(json.dumps(row, default=str).encode("utf-8")) + 1  # +1 for the separating comma
+
+
+def chunk_rows(rows: List[Dict], max_rows: int, max_bytes: int) -> List[List[Dict]]:
+    """
+    Split rows into request bodies of at most max_rows rows and about max_bytes of JSON. A row
+    larger than max_bytes on its own still goes out, alone in its chunk.
+    """
+    chunks, current, size = [], [], 2  # 2 for the enclosing brackets
+    for row in rows:
+        n = row_bytes(row)
+        if current and (len(current) >= max_rows or size + n > max_bytes):
+            chunks.append(current)
+            current, size = [], 2
+        current.append(row)
+        size += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BulkWriter:
+    """
+    Writes a large batch of rows as several upserts running side by side.
+
+    write_fn(chunk) sends one chunk and returns the rows PostgREST gave back. Up to `parallelism`
+    chunks are in flight at once; a chunk that fails is retried on its own (with backoff) while
+    the ones that succeeded stay written. Rows must be safe to upsert twice (carry their primary
+    key or an on_conflict column), since a timed-out chunk may have landed before it's retried.
+    """
+
+    def __init__(self, write_fn: Callable[[List[Dict]], Optional[List[Dict]]], name: str = "rows",
+                 max_rows: int = None, max_bytes: int = None, parallelism: int = None,
+                 retries: int = None, backoff: float = 0.5):
+        self.write_fn = write_fn
+        self.name = name
+        self.max_rows = max(1, max_rows or Settings.BULK_WRITE_MAX_ROWS)
+        self.max_bytes = max(1, max_bytes or Settings.BULK_WRITE_MAX_BYTES)
+        self.parallelism = max(1, parallelism or Settings.BULK_WRITE_PARALLELISM)
+        self.retries = Settings.BULK_WRITE_RETRIES if retries is None else retries
+        self.backoff = backoff
+        self.last_stats: Dict = {}
+
+    def write(self, rows: List[Dict]) -> List[Dict]:
+        """Write all rows; returns what PostgREST returned, in input order. Raises if a chunk never succeeds."""
+        if not rows:
+            return []
+        start = time.monotonic()
+        chunks = chunk_rows(rows, self.max_rows, self.max_bytes)
+        results: List[Optional[List[Dict]]] = [None] * len(chunks)
+        pending = list(range(len(chunks)))
+        errors: Dict[int, Exception] = {}
+        attempts = 0
+
+        for attempt in range(self.retries + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+                print(f"🔁 Retrying {len(pending)} failed {self.name} chunk(s) (attempt {attempt + 1})")
+            attempts += len(pending)
+            failed = []
+            with ThreadPoolExecutor(max_workers=min(self.parallelism, len(pending))) as executor:
+                futures = {executor.submit(self.write_fn, chunks[i]): i for i in pending}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result() or []
+                        errors.pop(i, None)
+                    except Exception as e:
+                        errors[i] = e
+                        failed.append(i)
+                        print(f"⚠️ {self.name} chunk {i + 1}/{len(chunks)} ({len(chunks[i])} rows) failed: {e}")
+            pending = sorted(failed)
+
+        seconds = time.monotonic() - start
+        written = sum(len(chunks[i]) for i in range(len(chunks)) if results[i] is not None)
+        self.last_stats = {
+            "rows": len(rows), "written": written, "chunks": len(chunks), "requests": attempts,
+            "failed_chunks": len(pending), "seconds": seconds,
+            "rows_per_second": written / seconds if seconds else float(written),
+        }
+        print(f"📤 Wrote {written}/{len(rows)} {self.name} in {len(chunks)} chunks "
+              f"({attempts} requests, {self.parallelism} parallel) in {seconds:.2f}s "
+              f"- {self.last_stats['rows_per_second']:,.0f} rows/s")
+        if pending:
+            raise RuntimeError(f"{len(pending)} of {len(chunks)} {self.name} chunks failed after "
+                               f"{self.retries + 1} attempts: {errors[pending[0]]}")
+        return [row for chunk in results for row in chunk]
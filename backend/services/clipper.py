@@ -2,10 +2,12 @@ import os
 import subprocess
 import wave
 import tempfile
+import numpy as np
 from datetime import datetime, timezone, timedelta
 from dateutil import parser as dtparser
 from services.database import Supa
 from services.gdrive import GoogleDriveClient
+from services.pcm_cache import CachedPCM
 
 db = Supa()
 gdrive = GoogleDriveClient()
@@ -40,6 +42,18 @@ def parse_hms(s: str) -> int:
     return int(h) * 3600 + int(m) * 60 + int(sec)
 
 
+# Encoding of archived clips; ffmpeg_cut and pcm_cut both produce exactly this
+CLIP_ENCODE_ARGS = [
+    "-acodec", "libmp3lame",  # MP3 encoding
+    "-b:a", "192k",  # 192kbps bitrate
+    "-ar", "44100",  # 44.1kHz sample rate
+    "-ac", "2",  # stereo
+]
+
+# ffmpeg raw input formats for the PCM cache dtypes
+PCM_INPUT_FORMATS = {"float32": "f32le", "int16": "s16le"}
+
+
 def ffmpeg_cut(audio_path: str, out_path: str, start_sec: float, end_sec: float) -> None:
     duration = max(0.0, end_sec - start_sec)
     if duration <= 0.0:
@@ -50,15 +64,30 @@ def ffmpeg_cut(audio_path: str, out_path: str, start_sec: float, end_sec: float)
         "-ss", f"{start_sec:.3f}",
         "-i", audio_path,
         "-t", f"{duration:.3f}",
-        "-acodec", "libmp3lame",  # MP3 encoding
-        "-b:a", "192k",  # 192kbps bitrate
-        "-ar", "44100",  # 44.1kHz sample rate
-        "-ac", "2",  # stereo
+        *CLIP_ENCODE_ARGS,
         out_path,
     ]
     subprocess.run(cmd, check=True)
 
 
+def pcm_cut(pcm: CachedPCM, out_path: str, start_sec: float, end_sec: float) -> None:
+    """Encode [start_sec, end_sec) of the cached PCM to out_path; ffmpeg only encodes, it never decodes the source"""
+    if end_sec - start_sec <= 0.0:
+        return
+    samples = np.ascontiguousarray(pcm.view(start_sec, end_sec), dtype=np.dtype(pcm.dtype).newbyteorder("<"))
+    cmd = [
+        "ffmpeg", "-y",
+        "-hide_banner", "-loglevel", "error",
+        "-f", PCM_INPUT_FORMATS[pcm.dtype],
+        "-ar", str(pcm.samplerate),
+        "-ac", str(pcm.channels),
+        "-i", "pipe:0",
+        *CLIP_ENCODE_ARGS,
+        out_path,
+    ]
+    subprocess.run(cmd, input=samples.tobytes(), check=True)
+
+
 def upload_to_gdrive_and_get_link(local_path: str, folder_name: str, filename: str) -> str:
     """Upload file to Google Drive and return shareable link"""
     try:
@@ -77,7 +106,7 @@ def get_downloads_path():
     downloads = os.path.join(home, "Downloads")
     return downloads
 
-def clip_transactions(run_id: str, audio_path: str, date: str, anchor_audio: str = "00:00:00",  time_of_day_started_at: str = "10:00:00Z", limit: int = 0):
+def clip_transactions(run_id: str, audio_path: str, date: str, anchor_audio: str = "00:00:00",  time_of_day_started_at: str = "10:00:00Z", limit: int = 0, pcm: CachedPCM = None):
 
     print(f"📁 Found audio file: {audio_path}")
 
@@ -90,7 +119,7 @@ def clip_transactions(run_id: str, audio_path: str, date: str, anchor_audio: str
     print(f"🕐 Computed T0: {T0.isoformat()}")
 
     # Determine audio duration (for clamping)
-    audio_duration = get_audio_duration_seconds(audio_path)
+    audio_duration = pcm.duration if pcm is not None else get_audio_duration_seconds(audio_path)
     print(f"⏱️ Audio duration: {audio_duration:.1f} seconds")
 
     # Derive a single Google Drive folder name for all clips using run date and anchor time
@@ -161,8 +190,11 @@ def clip_transactions(run_id: str, audio_path: str, date: str, anchor_audio: str
             out_path = os.path.join(temp_dir, out_name)
 
             try:
-                # Cut the clip
-                ffmpeg_cut(audio_path, out_path, start_sec, end_sec)
+                # Cut the clip (from the decoded cache when we have it)
+                if pcm is not None:
+                    pcm_cut(pcm, out_path, start_sec, end_sec)
+                else:
+                    ffmpeg_cut(audio_path, out_path, start_sec, end_sec)
                 print(f"✂️ Cut clip {tx_id} (start={start_sec:.3f}s, end={end_sec:.3f}s, dur={end_sec - start_sec:.3f}s)")
                 
                 # Upload clip to Google Drive
@@ -1,13 +1,30 @@
 # supabase client 
-from supabase import create_client, Client
+from supabase import Client
 from typing import Any, Optional
 from config import Settings
 from datetime import datetime, timedelta
+from services.supabase_pool import get_client
+from services import ref_cache
+from services.ref_cache import cached
+from services.bulk_writer import BulkWriter
+from services.grade_writer import flatten_grades
+from postgrest import ReturnMethod
+import uuid
+
 
 class Supa:
 
-    def __init__(self):
-        self.client: Client = create_client(Settings.SUPABASE_URL, Settings.SUPABASE_SERVICE_KEY)
+    def __init__(self, client: Client = None):
+        # Without an explicit client, every Supa() shares the process's pooled one
+        self._client = client
+
+    @property
+    def client(self) -> Client:
+        return self._client or get_client()
+
+    @client.setter
+    def client(self, client: Client):
+        self._client = client
 
     # ------- runs -------
     def insert_run(self, location_id: str, run_date: str) -> str:
@@ -60,23 +77,25 @@ class Supa:
         
         return res.data[0]["id"], res.data[0]["status"]
 
+    @cached("location_name", "REF_CACHE_LOCATION_TTL")
     def get_location_name(self, location_id: str):
         res = self.client.table("locations").select("name").eq("id", location_id).execute()
         return res.data[0]["name"]
 
+    @cached("org_name", "REF_CACHE_LOCATION_TTL")
     def get_org_name(self, location_id: str):
-        """Get organization name from location_id"""
+        """Get organization name from location_id, None if the location or org doesn't exist"""
         # First get org_id from location
         location_res = self.client.table("locations").select("org_id").eq("id", location_id).execute()
         if not location_res.data:
-            return "Unknown Org"
+            return None
 
         org_id = location_res.data[0]["org_id"]
 
         # Then get org name from orgs table
         org_res = self.client.table("orgs").select("name").eq("id", org_id).execute()
         if not org_res.data:
-            return "Unknown Org"
+            return None
 
         return org_res.data[0]["name"]
 
@@ -162,25 +181,36 @@ class Supa:
         """Insert analytics into database"""
         self.client.table("analytics").insert(analytics).execute()
 
-    def upsert_grades(self, grades: list[dict]):
-        """Upsert grades into database"""
-        self.client.table("grades").upsert(grades, on_conflict="transaction_id").execute()
-        if not grades:
+    def upsert_grades(self, grades: list[dict], max_rows: int = None, parallelism: int = None):
+        """
+        Upsert grades into database, each row written once as flattened columns.
+
+        Rows are grouped by the columns they carry, so a conflict only updates those columns and
+        never nulls out ones a row didn't include. Nothing is sent back (return=minimal).
+        """
+        rows = flatten_grades(grades)
+        if not rows:
             return
-        
-        # Flatten the nested structure
-        flattened_grades = []
-        for grade in grades:
-            flattened = {
-                "transaction_id": grade.get("transaction_id"),
-                "transcript": grade.get("transcript"),
-                "gpt_price": grade.get("gpt_price"),
-                **grade.get("details", {})  # Spread the details into the main object
-            }
-            flattened_grades.append(flattened)
-        
-        self.client.table("grades").upsert(flattened_grades, on_conflict="transaction_id").execute()
+
+        groups: dict[tuple, list[dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        for group in groups.values():
+            writer = BulkWriter(
+                lambda chunk: self.client.table("grades").upsert(
+                    chunk, on_conflict="transaction_id", returning=ReturnMethod.minimal).execute().data,
+                name="grades", max_rows=max_rows, parallelism=parallelism)
+            writer.write(group)
     
+    def get_graded_transaction_ids(self, transaction_ids: list[str], chunk_size: int = 200) -> set[str]:
+        """Which of these transactions already have a grades row"""
+        graded = set()
+        ids = [str(t) for t in transaction_ids if t]
+        for i in range(0, len(ids), chunk_size):
+            res = self.client.table("grades").select("transaction_id").in_("transaction_id", ids[i:i + chunk_size]).execute()
+            graded.update(str(row["transaction_id"]) for row in (res.data or []))
+        return graded
+
     def get_audio_record(self, audio_id: str) -> Optional[dict]:
         """Get audio record by ID"""
         res = self.client.table("audios").select("*").eq("id", audio_id).single().execute()
@@ -191,15 +221,31 @@ class Supa:
         res = self.client.table("audios").select("*").eq("run_id", run_id).execute()
         return res.data if res.data else []
 
-    def upsert_transactions(self, transactions: list[dict]):
-        """Insert transactions into database and return them with IDs"""
+    def _upsert_returning(self, table: str, rows: list[dict], columns: str, **kwargs) -> list[dict]:
+        """Upsert rows, asking PostgREST to send back only `columns` of each"""
+        query = self.client.table(table).upsert(rows, **kwargs)
+        query.request.params = query.request.params.set("select", columns)
+        return query.execute().data or []
+
+    def upsert_transactions(self, transactions: list[dict], columns: str = "id",
+                            max_rows: int = None, parallelism: int = None):
+        """
+        Insert transactions in parallel chunks and return them with IDs.
+
+        Ids are assigned here, so a retried chunk overwrites itself instead of inserting twice and
+        the rows don't need to come back over the wire: PostgREST returns only `columns` (just the
+        id by default), which are merged into the rows that were sent.
+        """
         if not transactions:
             return []
 
-        result = self.client.table("transactions").upsert(transactions).execute()
-        print(f"Inserted {len(result.data)} transactions")
-        print(f"Transactions: {result.data}")
-        return result.data
+        rows = [tx if tx.get("id") else {**tx, "id": str(uuid.uuid4())} for tx in transactions]
+        writer = BulkWriter(lambda chunk: self._upsert_returning("transactions", chunk, columns),
+                            name="transactions", max_rows=max_rows, parallelism=parallelism)
+        returned = {str(r["id"]): r for r in writer.write(rows) if r.get("id")}
+        inserted = [{**tx, **returned[str(tx["id"])]} for tx in rows if str(tx["id"]) in returned]
+        print(f"Inserted {len(inserted)} transactions")
+        return inserted
 
     def get_meals(self, location_id: str):
         result = self.client.table("meals").select("*").eq("location_id", location_id).execute()
@@ -227,10 +273,34 @@ class Supa:
         result = self.client.table("add_ons").select("*").eq("location_id", location_id).execute()
         return result.data if result.data else []
 
+    def get_menu_stamp(self, location_id: str) -> str:
+        """Cheap change marker for a location's menu: row count and latest updated_at per table"""
+        parts = []
+        for table in ("items", "meals", "add_ons"):
+            result = (self.client.table(table).select("updated_at", count="exact")
+                      .eq("location_id", location_id).order("updated_at", desc=True).limit(1).execute())
+            latest = result.data[0]["updated_at"] if result.data else None
+            parts.append(f"{table}:{result.count}:{latest}")
+        return "|".join(parts)
+
+    def get_run_summary(self, run_id: str, worker_id: str = None) -> Optional[dict]:
+        """Scalar grade metrics for a run (or one worker in it) from run_grade_summary, None if unavailable"""
+        try:
+            result = self.client.rpc("run_grade_summary", {"p_run_id": run_id, "p_worker_id": worker_id}).execute()
+        except Exception as e:
+            print(f"⚠️ run_grade_summary unavailable: {e}")
+            return None
+        row = (result.data or [None])[0] if isinstance(result.data, list) else result.data
+        if not row:
+            return None
+        return {k: float(v or 0) if k.startswith("avg_") else int(v or 0) for k, v in row.items()}
+
+    @cached("run_location", "REF_CACHE_RUN_TTL")
     def get_location_from_run(self, run_id: str):
         result = self.client.table("runs").select("location_id").eq("id", run_id).execute()
         return result.data[0]["location_id"]
 
+    @cached("items_prices", "REF_CACHE_MENU_TTL")
     def get_items_prices(self, location_id: str):
         """Get item prices as a dict mapping item_id_size to price"""
         result = self.client.table("items").select("item_id, price").eq("location_id", location_id).execute()
@@ -241,6 +311,7 @@ class Supa:
             prices[item_id] = price
         return prices
 
+    @cached("meals_prices", "REF_CACHE_MENU_TTL")
     def get_meals_prices(self, location_id: str):
         """Get meal prices as a dict mapping item_id_size to price"""
         result = self.client.table("meals").select("item_id, price").eq("location_id", location_id).execute()
@@ -251,6 +322,7 @@ class Supa:
             prices[meal_id] = price
         return prices
 
+    @cached("addons_prices", "REF_CACHE_MENU_TTL")
     def get_addons_prices(self, location_id: str):
         """Get addon prices as a dict mapping item_id to price"""
         result = self.client.table("add_ons").select("item_id, price").execute()
@@ -261,6 +333,24 @@ class Supa:
             prices[addon_id] = price
         return prices
 
+    @cached("location_owner", "REF_CACHE_OWNER_TTL")
+    def get_location_owner(self, location_id: str) -> Optional[str]:
+        """owner_id of a location, None if it doesn't exist"""
+        res = self.client.table("locations").select("owner_id").eq("id", location_id).limit(1).execute()
+        return res.data[0].get("owner_id") if res.data else None
+
+    # ------- reference cache hooks (call after writing menus / locations) -------
+    def invalidate_menu(self, location_id: str = None):
+        """Forget cached prices for a location (every location when None) after its menu changes"""
+        for name in ("items_prices", "meals_prices"):
+            ref_cache.invalidate(name, *([location_id] if location_id else []))
+        ref_cache.invalidate("addons_prices")  # add-on prices aren't filtered by location
+
+    def invalidate_location(self, location_id: str = None):
+        """Forget a location's cached name, org and owner (every location when None)"""
+        for name in ("location_name", "org_name", "location_owner"):
+            ref_cache.invalidate(name, *([location_id] if location_id else []))
+
     def get_operator_feedback_raw(self, operator_id: str, run_id: str = None, days: int = 30, limit: int = 50) -> list[dict]:
         """Get operator feedback from the database"""
         time_filter = (datetime.now() - timedelta(days=days)).isoformat()
@@ -158,7 +158,7 @@ class GoogleDriveClient:
             while True:
                 results = self.service.files().list(
                     q=query,
-                    fields='nextPageToken,files(id,name,size,mimeType,createdTime,modifiedTime)',
+                    fields='nextPageToken,files(id,name,size,mimeType,createdTime,modifiedTime,md5Checksum)',
                     pageSize=1000,
                     pageToken=page_token,
                     corpora='user'
@@ -193,6 +193,15 @@ class GoogleDriveClient:
             logger.error(f"Error listing media files in 'Shared with Me': {e}")
             return []
 
+    def get_file_checksum(self, file_id: str) -> Optional[str]:
+        """Return the MD5 checksum Drive stores for a file, or None if unavailable"""
+        try:
+            metadata = self.service.files().get(fileId=file_id, fields="md5Checksum").execute()
+            return metadata.get("md5Checksum")
+        except Exception as e:
+            logger.warning(f"Could not get checksum for file {file_id}: {e}")
+            return None
+
     def download_file(self, file_id: str, local_path: str, max_retries: int = 5) -> bool:
         """Download a file from Google Drive to local path with retry logic"""
         import time
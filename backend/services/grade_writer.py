@@ -0,0 +1,112 @@
+# Write-behind persistence for grades while grading is still running
+
+import time
+import queue
+import threading
+from typing import Callable, Dict, List
+from config import Settings
+
+_CLOSE = object()
+
+
+def flatten_grades(grades: List[Dict]) -> List[Dict]:
+    """
+    Grade dicts as grades-table rows, in one pass: details spread into top-level columns, the
+    nested details blob itself dropped. A transaction graded twice in the same batch keeps only
+    its last grade (Postgres rejects an upsert that touches the same row twice).
+    """
+    rows: Dict[str, Dict] = {}
+    for grade in grades:
+        row = {"transaction_id": grade.get("transaction_id"), "transcript": grade.get("transcript"),
+               "gpt_price": grade.get("gpt_price")}
+        row.update(grade.get("details") or {})
+        key = str(row["transaction_id"])
+        rows.pop(key, None)
+        rows[key] = row
+    return list(rows.values())
+
+
+class GradeWriter:
+    """
+    Buffers finished grades and upserts them in small batches on a background thread.
+
+    Graders call add() as each transaction completes; a flush happens every `flush_every` rows
+    or `flush_seconds`, whichever comes first. The buffer holds at most `max_buffer` rows, so if
+    the database falls behind, add() blocks instead of piling grades up in memory. A failed flush
+    is retried with backoff; close() flushes what's left and raises if any rows never made it.
+    """
+
+    def __init__(self, upsert_fn: Callable[[List[Dict]], None], flush_every: int = None,
+                 flush_seconds: float = None, max_buffer: int = None, retries: int = None):
+        self.upsert_fn = upsert_fn
+        self.flush_every = max(1, flush_every or Settings.GRADE_FLUSH_EVERY)
+        self.flush_seconds = Settings.GRADE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.retries = Settings.GRADE_FLUSH_RETRIES if retries is None else retries
+        self._queue: queue.Queue = queue.Queue(maxsize=max(self.flush_every, max_buffer or Settings.GRADE_WRITE_BUFFER))
+        self.written = 0
+        self.flushes = 0
+        self.write_seconds = 0.0
+        self.failed: List[Dict] = []
+        self._thread = threading.Thread(target=self._run, name="grade-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, grade: Dict) -> None:
+        if grade is not None:
+            self._queue.put(grade)
+
+    def _flush(self, rows: List[Dict]) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                start = time.monotonic()
+                self.upsert_fn(rows)
+                self.write_seconds += time.monotonic() - start
+                self.written += len(rows)
+                self.flushes += 1
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"❌ Could not write {len(rows)} grades after {attempt + 1} attempts: {e}")
+                    self.failed.extend(rows)
+                    return
+                print(f"⚠️ Grade flush failed ({e}), retrying")
+                time.sleep(min(10.0, 0.5 * 2 ** attempt))
+
+    def _run(self) -> None:
+        pending: List[Dict] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                break
+            if item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if pending and (len(pending) >= self.flush_every or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending, deadline = [], None
+        if pending:
+            self._flush(pending)
+
+    def close(self) -> None:
+        """Flush everything still buffered and stop the writer thread"""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        if self.failed:
+            # One last synchronous attempt, so a transient outage at the end doesn't lose grades
+            rows, self.failed = self.failed, []
+            self._flush(rows)
+        rate = f", {self.written / self.write_seconds:,.0f} rows/s while writing" if self.write_seconds else ""
+        print(f"💾 Wrote {self.written} grades in {self.flushes} flushes{rate}")
+        if self.failed:
+            raise RuntimeError(f"{len(self.failed)} grades could not be written")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -4,10 +4,16 @@ from config import Prompts, Settings
 from openai import OpenAI
 import json
 import os
+import time
 from typing import Dict, Any, List
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.helpers import ii, parse_json_field, json_or_none, read_json_or_empty, calculate_gpt_price, calculate_gpt_price_batch
 from services.database import Supa
+from services.prompt_cache import Step2PromptCache
+from services.grade_writer import GradeWriter
+from services.tiered_grading import TierStats, check_invariants
+from services.pregrade import skip_reason
+from utils.llm_dispatch import llm_call_with_retry, pool_size
 
 
 settings = Settings()
@@ -16,32 +22,150 @@ client = OpenAI(api_key=settings.OPENAI_API_KEY)
 prompts = Prompts()
 db = Supa() 
 
-def grade_transactions(transactions: List[Dict], location_id: str, testing=True) -> List[Dict]:
+# Compiled prompt per location, rebuilt only when the location's menu changes
+step2_prompts = Step2PromptCache(
+    load_fn=lambda location_id: get_menu_data_from_db(location_id),
+    stamp_fn=lambda location_id: db.get_menu_stamp(location_id),
+    on_menu_change=lambda location_id: db.invalidate_menu(location_id),
+)
+
+def grade_transactions(transactions: List[Dict], location_id: str, testing=True, packed: bool = None,
+                       mode: str = "online", persist: bool = False, force: bool = False) -> List[Dict]:
+    """
+    Grade transactions with the Step-2 prompt. With packed=True (STEP2_PACKED by default) short
+    transcripts are graded several per request, so the menu-heavy prompt is sent once per pack.
+
+    With persist=True grades are upserted in small batches as they complete (GradeWriter), and
+    transactions that already have a grades row are skipped, so a re-run after a crash only pays
+    for what's missing. A transaction whose Step-2 call failed gets no row (and counts as failed),
+    so the next run retries it. force=True regrades (and overwrites) every transaction anyway.
+    Returns the grades produced by this call.
+
+    mode="batch" submits the requests through the Batch API instead and upserts grades as the
+    results are ingested (see services/batch_grading.py); it resumes from its own job state.
+
+    With STEP2_TIERED each transcript is graded at low reasoning effort first and only regraded
+    at high effort when the answer breaks one of the template's hard rules (check_invariants).
+
+    With STEP2_PRECLASSIFY transcripts where nothing was ordered (wait-only, mobile pickup,
+    fragments) get the default row, marked complete_order=0, without a Step-2 call.
+    """
+    if mode == "batch":
+        from services.batch_grading import grade_transactions_batch
+        return grade_transactions_batch(transactions, location_id, testing=testing)
+    if mode != "online":
+        raise ValueError(f"Unknown grading mode '{mode}', expected 'online' or 'batch'")
+
+    if persist and not force:
+        transactions = skip_graded(transactions)
+        if not transactions:
+            print("✅ Every transaction already has a grade, nothing to do")
+            return []
+
     # Build prompt once (shared across all transactions)
     step2_prompt = build_step2_prompt(location_id)
+    packed = settings.STEP2_PACKED if packed is None else packed
+
+    skipped: List[Dict] = []
+    if settings.STEP2_PRECLASSIFY:
+        transactions, skipped = preclassify(transactions, location_id)
     
     print(f"🎯 Starting to grade {len(transactions)} transactions")
     
-    # Parallelize transaction grading
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        graded = list(executor.map(
-            lambda tx: _grade_transaction(tx, location_id, step2_prompt, testing),
-            transactions
-        ))
+    if packed:
+        # Only transactions with an id and a transcript can be answered by id in a packed response
+        packable = [i for i, tx in enumerate(transactions)
+                    if tx.get("id") and ((tx.get("meta") or {}).get("text") or "").strip()]
+        singles = sorted(set(range(len(transactions))) - set(packable))
+        index_of = {id(transactions[i]): i for i in packable}
+        packs = [[index_of[id(tx)] for tx in pack]
+                 for pack in pack_transactions([transactions[i] for i in packable])]
+        packs += [[i] for i in singles]
+        print(f"📦 Packed {len(packable)} transcripts into {len(packs) - len(singles)} Step-2 requests")
+    else:
+        packs = None
+
+    graded = [None] * len(transactions)
+    writer = GradeWriter(db.upsert_grades) if persist else None
+    tiers = TierStats() if settings.STEP2_TIERED else None
+    if writer is not None:
+        for row in skipped:
+            writer.add(row)
+    try:
+        # Parallelize grading; the shared Step-2 controller decides how many run at once
+        with ThreadPoolExecutor(max_workers=pool_size(settings.STEP2_MODEL)) as executor:
+            if packs is not None:
+                futures = {executor.submit(_grade_pack, [transactions[i] for i in pack], location_id,
+                                           step2_prompt, testing, tiers): pack for pack in packs}
+            else:
+                futures = {executor.submit(_grade_transaction, tx, location_id, step2_prompt, testing, tiers): [i]
+                           for i, tx in enumerate(transactions)}
+            for future in as_completed(futures):
+                results = future.result() if packs is not None else [future.result()]
+                for i, result in zip(futures[future], results):
+                    graded[i] = result
+                    if writer is not None:
+                        writer.add(result)
+    finally:
+        if writer is not None:
+            writer.close()
     
     # Filter out any None results and log issues
     valid_grades = [g for g in graded if g is not None]
     failed_count = len(graded) - len(valid_grades)
+    valid_grades += skipped
     
     if failed_count > 0:
         print(f"⚠️  WARNING: {failed_count} transactions failed to grade!")
     
-    print(f"✅ Successfully graded {len(valid_grades)}/{len(transactions)} transactions")
+    print(f"✅ Successfully graded {len(valid_grades)}/{len(transactions) + len(skipped)} transactions")
+    if tiers is not None:
+        tiers.report()
     
     return valid_grades
 
-def _grade_transaction(tx: Dict, location_id: str, step2_prompt: str, testing: bool) -> Dict:
-    """Grade a single transaction"""
+def preclassify(transactions: List[Dict], location_id: str):
+    """Split off transactions nothing was ordered in → (to grade, default rows for the rest)"""
+    try:
+        index, _ = step2_prompts.menu_index(location_id)
+        menu_tokens = set(index.postings)
+    except Exception:
+        menu_tokens = None
+    to_grade, skipped, reasons = [], [], {}
+    for tx in transactions:
+        tx_meta = tx.get("meta") or {}
+        transcript = tx_meta.get("text", "")
+        reason = skip_reason(transcript, menu_tokens) if tx.get("id") else None
+        if reason is None:
+            to_grade.append(tx)
+            continue
+        reasons[reason] = reasons.get(reason, 0) + 1
+        # Step-1's complete_order is kept as is; the skip is only recorded in issues
+        details = map_step2_to_grade_cols({}, tx_meta)
+        details["issues"] = f"Not graded: {reason}"
+        skipped.append({
+            "transaction_id":  tx.get("id"),
+            "details":         details,
+            "transcript":      transcript,
+            "gpt_price":       0.0
+        })
+    if skipped:
+        print(f"⏩ Skipped Step-2 for {len(skipped)} non-gradable transcripts {reasons}")
+    return to_grade, skipped
+
+def skip_graded(transactions: List[Dict]) -> List[Dict]:
+    """Drop transactions that already have a grades row (from an earlier, interrupted run)"""
+    ids = [tx.get("id") for tx in transactions if tx.get("id")]
+    if not ids:
+        return transactions
+    done = db.get_graded_transaction_ids(ids)
+    if done:
+        print(f"⏭️ Skipping {len(done)} already-graded transactions")
+    return [tx for tx in transactions if not tx.get("id") or str(tx["id"]) not in done]
+
+def _grade_transaction(tx: Dict, location_id: str, step2_prompt: str, testing: bool,
+                       tiers: TierStats = None, effort: str = None) -> Dict:
+    """Grade a single transaction (tiered when given TierStats and no fixed effort)"""
     transcript = (tx.get("meta") or {}).get("text","")
     tx_meta = tx.get("meta") or {}
     
@@ -56,29 +180,43 @@ def _grade_transaction(tx: Dict, location_id: str, step2_prompt: str, testing: b
         }
 
     # Run Step‑2 with location-specific menu data
-    prompt = step2_prompt + "\n\nProcess this transcript:\n" + transcript
-    try:
-        if testing: 
-            resp = client.responses.create(
-                model=settings.STEP2_MODEL,
-                include=["reasoning.encrypted_content"],
-                input=[{"role":"user","content":[{"type":"input_text","text": prompt}]}],
-                store=False,
-                text={"format":{"type":"text"}},
-                reasoning={"effort":"high","summary":"detailed"},
-            )
-
-        else: 
-            resp = client.responses.create(
-                model=settings.STEP2_MODEL,
-                input=[{"role":"user","content":[{"type":"input_text","text": prompt}]}],
-                store=False,
-                text={"format":{"type":"text"}},
-                reasoning={"effort":"high","summary":"detailed"},
-            )
+    prompt = step2_prompt_for(location_id, transcript, step2_prompt) + "\n\nProcess this transcript:\n" + transcript
+    if tiers is not None and effort is None:
+        parsed, gpt_price = _run_tiered(tx, prompt, testing, location_id, tiers)
+    else:
+        parsed, gpt_price, seconds = _run_step2(tx, prompt, testing, effort or "high")
+        if tiers is not None:
+            tiers.record(effort, seconds, gpt_price)
+
+    if parsed is None:
+        # The call itself failed: no grade, so it's neither written nor skipped on a rerun
+        return None
+
+    details = map_step2_to_grade_cols(parsed, tx.get("meta") or {})
+    print(f"Mapped details: {details}")
+    print("=" * 50)
+
+    # Validate that we have a transaction ID
+    transaction_id = tx.get("id")
+    if not transaction_id:
+        print(f"⚠️  WARNING: Transaction missing ID: {tx}")
+        return None
 
+    return {
+        "transaction_id":  transaction_id,
+        "details":         details,
+        "transcript":      transcript,
+        "gpt_price":       gpt_price
+    }
+
+def _run_step2(tx: Dict, prompt: str, testing: bool, effort: str):
+    """One Step-2 call → (parsed answer, {} if unparseable or None if the call failed; price; seconds)"""
+    transcript = (tx.get("meta") or {}).get("text","")
+    start = time.time()
+    try:
+        resp = _step2_request(prompt, testing, effort)
         raw = resp.output[1].content[0].text if hasattr(resp,"output") else "{}"
-        print(f"\n=== STEP 2 (Grading) RAW OUTPUT ===")
+        print(f"\n=== STEP 2 (Grading, {effort} effort) RAW OUTPUT ===")
         print(f"Input transcript: {transcript[:200]}...")
         print(f"Raw LLM response: {raw}")
         print("=" * 50)
@@ -89,30 +227,173 @@ def _grade_transaction(tx: Dict, location_id: str, step2_prompt: str, testing: b
         print(f"Parsed JSON: {parsed}")
 
         gpt_price = calculate_gpt_price(resp)
-    
 
     except Exception as ex:
         print(f"❌ Step‑2 error for transaction {tx.get('id', 'unknown')}: {ex}")
         print(f"   Transcript: {transcript[:100]}...")
-        parsed = {}
+        parsed = None
         gpt_price = 0.0
-
-    details = map_step2_to_grade_cols(parsed, tx.get("meta") or {})
-    print(f"Mapped details: {details}")
-    print("=" * 50)
-
-    # Validate that we have a transaction ID
-    transaction_id = tx.get("id")
-    if not transaction_id:
-        print(f"⚠️  WARNING: Transaction missing ID: {tx}")
+    return parsed, gpt_price, time.time() - start
+
+def _run_tiered(tx: Dict, prompt: str, testing: bool, location_id: str, tiers: TierStats):
+    """Low effort first; regrade at high effort only when the answer breaks a hard rule"""
+    parsed, gpt_price, seconds = _run_step2(tx, prompt, testing, "low")
+    tiers.record("low", seconds, gpt_price)
+    problems = grade_problems(parsed, location_id)
+    tiers.outcome(problems)
+    if problems:
+        print(f"🪜 Escalating transaction {tx.get('id', 'unknown')} to high effort: {'; '.join(problems)}")
+        high, high_price, high_seconds = _run_step2(tx, prompt, testing, "high")
+        tiers.record("high", high_seconds, high_price)
+        gpt_price += high_price
+        if high:
+            parsed = high
+        elif high is None and not parsed:
+            parsed = None  # nothing usable and the retry failed: leave it for the next run
+    return parsed, gpt_price
+
+def grade_problems(parsed: Dict, location_id: str) -> List[str]:
+    """Why a Step-2 answer can't be trusted (empty list when it passes every local check)"""
+    if not parsed:
+        return ["no answer"]
+    return check_invariants(parsed, menu_item_ids(location_id))
+
+def menu_item_ids(location_id: str):
+    """Item IDs on the location's menu, from the cached Step-2 prompt entry (None if unavailable)"""
+    try:
+        menu = step2_prompts.get_entry(location_id)["menu"]
+        return {str(row.get("Item ID")) for kind in ("items", "meals", "addons") for row in menu[kind]}
+    except Exception:
         return None
 
-    return {
-        "transaction_id":  transaction_id,
-        "details":         details,
-        "transcript":      transcript,
-        "gpt_price":       gpt_price
+def step2_request_body(prompt: str, testing: bool, effort: str = "high") -> Dict[str, Any]:
+    """Responses API parameters for one Step-2 call (also used as the body of batch requests)"""
+    body = {
+        "model": settings.STEP2_MODEL,
+        "input": [{"role":"user","content":[{"type":"input_text","text": prompt}]}],
+        "store": False,
+        "text": {"format":{"type":"text"}},
+        "reasoning": {"effort":effort,"summary":"detailed"},
     }
+    if testing:
+        body["include"] = ["reasoning.encrypted_content"]
+    return body
+
+
+def _step2_request(prompt: str, testing: bool, effort: str = "high"):
+    """One Step-2 Responses API call"""
+    return llm_call_with_retry(settings.STEP2_MODEL, client.with_options(max_retries=0).responses.create, **step2_request_body(prompt, testing, effort))
+
+
+# ---------- Packed grading: several transcripts per Step-2 request ----------
+PACKED_INSTRUCTIONS = """
+
+        **Multiple Transcripts**:
+        Below are several independent transcripts, each introduced by a line of the form "### Transaction <id>". Grade each one on its own, exactly as if it were the only transcript you were given; never carry items, offers or context from one transcript into another.
+        Return a single JSON object and nothing else. Its keys must be the transaction ids exactly as written, and each value must be the complete JSON object you would return for that transcript alone.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (≈4 characters per token); only used to size packs"""
+    return len(text) // 4 + 1
+
+
+def pack_transactions(transactions: List[Dict], token_budget: int = None, max_per_pack: int = None) -> List[List[Dict]]:
+    """
+    Greedily group transactions so each pack's transcripts fit in token_budget.
+
+    Short transcripts pack up to max_per_pack per request; a transcript that is over budget on
+    its own gets a pack to itself (and is graded with the single-transaction prompt).
+    """
+    token_budget = token_budget or settings.STEP2_PACK_TOKEN_BUDGET
+    max_per_pack = max(1, max_per_pack or settings.STEP2_PACK_MAX_TX)
+    packs, current, used = [], [], 0
+    for tx in transactions:
+        # header line + transcript + room for that transaction's answer
+        cost = estimate_tokens((tx.get("meta") or {}).get("text", "")) + settings.STEP2_PACK_TOKENS_PER_TX
+        if current and (used + cost > token_budget or len(current) >= max_per_pack):
+            packs.append(current)
+            current, used = [], 0
+        current.append(tx)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def step2_prompt_for(location_id: str, transcript: str, step2_prompt: str) -> str:
+    """The full Step-2 prompt, or with STEP2_MENU_PRUNING one listing only the menu rows the transcript mentions"""
+    if not settings.STEP2_MENU_PRUNING:
+        return step2_prompt
+    try:
+        return step2_prompts.pruned(location_id, transcript) or step2_prompt
+    except Exception as e:
+        print(f"⚠️ Menu pruning failed for {location_id} ({e}), using the full menu")
+        return step2_prompt
+
+def _grade_pack(pack: List[Dict], location_id: str, step2_prompt: str, testing: bool,
+                tiers: TierStats = None) -> List[Dict]:
+    """
+    Grade a pack in one request; transactions whose answer is missing or unparseable are regraded
+    alone. Tiered, the pack runs at low effort and answers that break a hard rule are regraded
+    alone at high effort.
+    """
+    if len(pack) == 1:
+        return [_grade_transaction(pack[0], location_id, step2_prompt, testing, tiers)]
+
+    ids = [str(tx.get("id")) for tx in pack]
+    transcripts = "\n".join((tx.get("meta") or {}).get("text", "") for tx in pack)
+    prompt = step2_prompt_for(location_id, transcripts, step2_prompt) + PACKED_INSTRUCTIONS + "".join(
+        f"\n### Transaction {tx_id}\n{(tx.get('meta') or {}).get('text', '')}\n" for tx_id, tx in zip(ids, pack))
+
+    answers, gpt_price = {}, 0.0
+    effort = "low" if tiers is not None else "high"
+    start = time.time()
+    try:
+        resp = _step2_request(prompt, testing, effort)
+        raw = resp.output[1].content[0].text if hasattr(resp,"output") else "{}"
+        print(f"\n=== STEP 2 (Packed grading, {len(pack)} transactions) RAW OUTPUT ===")
+        print(f"Raw LLM response: {raw[:2000]}")
+        answers = json_or_none(raw) or {}
+        if not isinstance(answers, dict):
+            answers = {}
+        gpt_price = calculate_gpt_price(resp)
+    except Exception as ex:
+        print(f"❌ Packed Step‑2 error for transactions {ids}: {ex}")
+    if tiers is not None:
+        tiers.record("low", time.time() - start, gpt_price)
+
+    results: List[Dict] = [None] * len(pack)
+    answered = [i for i, tx_id in enumerate(ids) if isinstance(answers.get(tx_id), dict)]
+    escalated = set()
+    if tiers is not None:
+        for i in list(answered):
+            problems = grade_problems(answers[ids[i]], location_id)
+            tiers.outcome(problems)
+            if problems:
+                print(f"🪜 Escalating transaction {ids[i]} to high effort: {'; '.join(problems)}")
+                answered.remove(i)
+                escalated.add(i)
+    # Split the request's cost over the transactions it answered, by transcript length
+    weights = {i: len((pack[i].get("meta") or {}).get("text", "")) + 1 for i in answered}
+    for i in answered:
+        tx = pack[i]
+        results[i] = {
+            "transaction_id":  tx.get("id"),
+            "details":         map_step2_to_grade_cols(answers[ids[i]], tx.get("meta") or {}),
+            "transcript":      (tx.get("meta") or {}).get("text", ""),
+            "gpt_price":       gpt_price * weights[i] / sum(weights.values())
+        }
+
+    fallback = [i for i in range(len(pack)) if results[i] is None]
+    if fallback:
+        print(f"↩️ Regrading {len(fallback)}/{len(pack)} transactions individually (missing or unparseable in packed response)")
+        for i in fallback:
+            results[i] = _grade_transaction(pack[i], location_id, step2_prompt, testing, tiers,
+                                            effort="high" if i in escalated else None)
+    return results
+
 
 # ---------- 3) GRADE (Step‑2 prompt per transaction, return ALL columns) ----------
 def map_step2_to_grade_cols(step2_obj: Dict[str,Any], tx_meta: Dict[str,Any]) -> Dict[str,Any]:
@@ -184,20 +465,8 @@ def map_step2_to_grade_cols(step2_obj: Dict[str,Any], tx_meta: Dict[str,Any]) ->
 
 
 def build_step2_prompt(location_id: str) -> str:
-    """Build the step 2 prompt with menu data from database or JSON fallback"""
-    
-    upselling, upsizing, addons, items, meals = get_menu_data_from_db(location_id)
-
-    print(f"Menu data loaded: {len(upselling)} upselling scenarios, {len(upsizing)} upsizing scenarios, {len(addons)} add-ons, {len(items)} items, {len(meals)} meals")
-
-
-    template = Prompts.template
-    return (template
-            .replace("<<UPSELLING_JSON>>", json.dumps(upselling))
-            .replace("<<UPSIZING_JSON>>", json.dumps(upsizing))
-            .replace("<<ADDONS_JSON>>", json.dumps(addons))
-            .replace("<<ITEMS_JSON>>", json.dumps(items))
-            .replace("<<MEALS_JSON>>", json.dumps(meals)))
+    """Step 2 prompt with this location's menu, compiled once per menu version (see services/prompt_cache.py)"""
+    return step2_prompts.get(location_id)
 
 
 def get_menu_data_from_db(location_id: str) -> tuple[list, list, list, list, list]:
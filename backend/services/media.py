@@ -1,9 +1,10 @@
 from services.database import Supa
 from services.gdrive import GoogleDriveClient
+from services.pcm_cache import PCMCache, CachedPCM
 from config import Settings
-from supabase import create_client, Client
 from datetime import datetime
 import os
+import re
 import tempfile
 
 db = Supa()
@@ -144,10 +145,23 @@ def get_audio_from_gdrive(location_id: str, date: str):
         print(f"❌ Error downloading DQ Cary MP3: {e}")
         return None, None
 
-    
-
-
-
-    
 
+def get_cached_pcm(audio_path: str, gdrive_path: str) -> CachedPCM | None:
+    """
+    Decode the downloaded recording into the shared PCM cache (or reuse an earlier decode).
 
+    The cache key is the Drive file id plus Drive's MD5 checksum. Returns None when the cache
+    is disabled or anything goes wrong, in which case callers read audio_path directly.
+    """
+    if not Settings.PCM_CACHE_ENABLED or not audio_path or not gdrive_path:
+        return None
+    try:
+        match = re.search(r"/file/d/([^/]+)", gdrive_path)
+        if not match:
+            return None
+        file_id = match.group(1)
+        checksum = gdrive.get_file_checksum(file_id)
+        return PCMCache().get_or_decode(audio_path, file_id, checksum)
+    except Exception as e:
+        print(f"⚠️ PCM cache unavailable, decoding from file instead: {e}")
+        return None
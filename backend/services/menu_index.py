@@ -0,0 +1,159 @@
+# Local item-name index for shortlisting the menu rows a transcript actually talks about
+
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Words that say nothing about which item was ordered (sizes, counts, filler)
+STOPWORDS = {
+    "a", "an", "and", "or", "the", "of", "with", "for", "to", "in", "on", "no", "none", "size", "sizes",
+    "small", "medium", "large", "regular", "mini", "kid", "kids", "single", "double", "triple",
+    "piece", "pc", "includes", "style", "original", "orignal", "classic", "any", "valid", "item", "items",
+}
+
+# Spellings that mean the same item (ASR and the menu sheets don't agree with each other),
+# keyed by the singular form
+ALIASES = {
+    "chilli": "chili", "coke": "drink", "soda": "drink", "pop": "drink", "sprite": "drink",
+    "lemonade": "drink", "malt": "shake", "cheeseburger": "burger", "hamburger": "burger",
+    "tender": "strip", "barbecue": "bbq",
+}
+
+# Compound words ASR writes either way ("cheeseburger" / "cheese burger")
+COMPOUND_SUFFIXES = ("burger", "dog", "cake", "shake", "cone")
+
+# A token that appears in more than this share of rows ("chicken", "meal") can't pick rows alone
+MAX_TOKEN_SHARE = 0.25
+
+# Row fields that point at other rows an offer could be about
+NEIGHBOUR_FIELDS = ("Upselling Chance", "Upsizing Chance", "Add on Chance", "Inclusions",
+                    "Order Inclusions for Combo/Meal")
+
+KINDS = ("items", "meals", "addons")
+
+
+def normalize(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return ALIASES.get(word, word)
+
+
+def tokenize(text: Any) -> Set[str]:
+    """Normalized content words of a menu name or a transcript"""
+    text = re.sub(r"\[.*?\]", " ", str(text or "").lower())  # "[Sizes: Small, Medium]"
+    tokens = set()
+    for word in re.findall(r"[a-z][a-z0-9.']*", text):
+        word = word.strip(".'")
+        if not word or word in STOPWORDS:
+            continue
+        tokens.add(normalize(word))
+        for suffix in COMPOUND_SUFFIXES:
+            if word.endswith(suffix) and len(word) > len(suffix) + 2:
+                tokens.update({normalize(word[:-len(suffix)]), normalize(suffix)})
+    return {t for t in tokens if t and t not in STOPWORDS}
+
+
+class MenuIndex:
+    """
+    Inverted index from name tokens to menu rows (items / meals / add-ons) of one location.
+
+    shortlist(transcript) returns the rows whose names the transcript mentions, plus the rows
+    those rows can be upsold/upsized/topped with (one hop through their chance fields) and every
+    size variant of each matched Item ID.
+    """
+
+    def __init__(self, items: List[Dict], meals: List[Dict], addons: List[Dict]):
+        self.rows = {"items": items, "meals": meals, "addons": addons}
+        self.postings: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        self.by_item_id: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for kind in KINDS:
+            for i, row in enumerate(self.rows[kind]):
+                for token in tokenize(row.get("Item")):
+                    self.postings[token].append((kind, i))
+                self.by_item_id[(kind, str(row.get("Item ID")))].append(i)
+        total = sum(len(rows) for rows in self.rows.values()) or 1
+        self.generic = {t for t, rows in self.postings.items() if len(rows) / total > MAX_TOKEN_SHARE}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form kept next to the compiled prompt in the prompt cache"""
+        return {"postings": {t: [[k, i] for k, i in rows] for t, rows in self.postings.items()},
+                "generic": sorted(self.generic)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], items: List[Dict], meals: List[Dict], addons: List[Dict]) -> "MenuIndex":
+        index = cls.__new__(cls)
+        index.rows = {"items": items, "meals": meals, "addons": addons}
+        index.postings = defaultdict(list, {t: [(k, i) for k, i in rows] for t, rows in data["postings"].items()})
+        index.by_item_id = defaultdict(list)
+        for kind in KINDS:
+            for i, row in enumerate(index.rows[kind]):
+                index.by_item_id[(kind, str(row.get("Item ID")))].append(i)
+        index.generic = set(data["generic"])
+        return index
+
+    def _match(self, tokens: Set[str]) -> Set[Tuple[str, int]]:
+        hits = set()
+        for token in tokens - self.generic:
+            hits.update(self.postings.get(token, ()))
+        return hits
+
+    def shortlist(self, transcript: str) -> Optional[Dict[str, List[Dict]]]:
+        """Pruned items/meals/addons for one transcript, or None when nothing on the menu matched"""
+        matched = self._match(tokenize(transcript))
+        if not matched:
+            return None
+        expanded = set(matched)
+        for kind, i in matched:
+            row = self.rows[kind][i]
+            expanded |= self._match(set().union(*(tokenize(row.get(f)) for f in NEIGHBOUR_FIELDS)))
+        for kind, i in list(expanded):
+            item_id = str(self.rows[kind][i].get("Item ID"))
+            expanded.update((kind, j) for j in self.by_item_id[(kind, item_id)])
+        return {kind: [row for i, row in enumerate(self.rows[kind]) if (kind, i) in expanded] for kind in KINDS}
+
+
+def referenced_item_ids(grade: Dict[str, Any], fields: Iterable[str] = None) -> Set[str]:
+    """Item IDs a stored grade mentions, from its "[Item ID]_[Size ID]" values"""
+    fields = fields or [k for k in grade if k not in ("transcript", "feedback", "transaction_id")]
+    ids = set()
+    for field in fields:
+        for item_id, _size in re.findall(r"\b(\d+)_(\d+)\b", str(grade.get(field) or "")):
+            ids.add(item_id)
+    return ids
+
+
+def measure_recall(index: MenuIndex, samples: List[Tuple[str, Set[str]]]) -> Dict[str, float]:
+    """
+    Offline recall of the shortlist against item ids found in historical grades.
+
+    samples are (transcript, referenced Item IDs). A transcript with no match falls back to the
+    full menu, so it counts as fully covered but gets no size reduction.
+    """
+    total = len(index.rows["items"]) + len(index.rows["meals"]) + len(index.rows["addons"])
+    covered_tx = referenced = found = fallbacks = 0
+    kept = 0.0
+    for transcript, ids in samples:
+        rows = index.shortlist(transcript)
+        if rows is None:
+            fallbacks += 1
+            covered_tx += 1
+            found += len(ids)
+            referenced += len(ids)
+            kept += 1.0
+            continue
+        shortlisted = {str(r.get("Item ID")) for kind in KINDS for r in rows[kind]}
+        hit = ids & shortlisted
+        found += len(hit)
+        referenced += len(ids)
+        covered_tx += hit == ids
+        kept += sum(len(rows[k]) for k in KINDS) / max(total, 1)
+    n = max(len(samples), 1)
+    return {
+        "transactions": len(samples),
+        "item_recall": found / referenced if referenced else 1.0,
+        "transaction_recall": covered_tx / n,
+        "fallback_rate": fallbacks / n,
+        "avg_rows_kept": kept / n,
+    }
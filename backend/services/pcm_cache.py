@@ -0,0 +1,242 @@
+# Decoded-PCM cache for daily recordings
+
+import os
+import json
+import time
+import logging
+import numpy as np
+import soundfile as sf
+from typing import Dict, List, Optional
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+HEADER_SUFFIX = ".json"
+DATA_SUFFIX = ".pcm"
+DECODE_BLOCK_FRAMES = 1 << 20  # ~24s at 44.1kHz per read
+
+
+class CachedPCM:
+    """A decoded recording backed by a read-only memory map.
+
+    Every accessor returns a NumPy view into the map, so segmentation, clipping and
+    embedding code can slice the day's audio without copying or decoding it again.
+    """
+
+    def __init__(self, header_path: str):
+        with open(header_path, "r") as f:
+            header = json.load(f)
+        self.header_path = header_path
+        self.data_path = header_path[:-len(HEADER_SUFFIX)] + DATA_SUFFIX
+        self.key = header["key"]
+        self.samplerate = int(header["samplerate"])
+        self.channels = int(header["channels"])
+        self.frames = int(header["frames"])
+        self.dtype = header["dtype"]
+        self.header = header
+        self.data = np.memmap(self.data_path, dtype=self.dtype, mode="r", shape=(self.frames, self.channels))
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.samplerate
+
+    def frames_view(self, start_frame: int, end_frame: int) -> np.ndarray:
+        """Zero-copy (frames, channels) view of [start_frame, end_frame)"""
+        start_frame = max(0, min(int(start_frame), self.frames))
+        end_frame = max(start_frame, min(int(end_frame), self.frames))
+        return self.data[start_frame:end_frame]
+
+    def view(self, start_time: float, end_time: float) -> np.ndarray:
+        """Zero-copy (frames, channels) view of [start_time, end_time) in seconds"""
+        return self.frames_view(int(start_time * self.samplerate), int(end_time * self.samplerate))
+
+    def reader(self) -> "PCMReader":
+        """A SoundFile-like sequential reader over the map"""
+        return PCMReader(self)
+
+
+class PCMReader:
+    """Subset of the soundfile.SoundFile read API (samplerate/frames/channels/seek/read/blocks)
+    served from a CachedPCM, so code written against SoundFile can read cached audio unchanged.
+    """
+
+    def __init__(self, pcm: CachedPCM):
+        self.pcm = pcm
+        self.samplerate = pcm.samplerate
+        self.frames = pcm.frames
+        self.channels = pcm.channels
+        self._pos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def seek(self, frames: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self.frames}[whence]
+        self._pos = max(0, min(base + int(frames), self.frames))
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, frames: int = -1, always_2d: bool = False) -> np.ndarray:
+        end = self.frames if frames < 0 else self._pos + int(frames)
+        data = self.pcm.frames_view(self._pos, end)
+        self._pos += len(data)
+        # Same shape convention as SoundFile.read: mono comes back 1-D
+        if self.channels == 1 and not always_2d:
+            return data[:, 0]
+        return data
+
+    def blocks(self, blocksize: int, always_2d: bool = False):
+        while self._pos < self.frames:
+            yield self.read(blocksize, always_2d=always_2d)
+
+
+class PCMCache:
+    """Decode each source recording once into <key>.pcm (raw samples) + <key>.json (header).
+
+    Keys combine the Google Drive file id and its checksum, so a re-uploaded file with the same
+    id gets a fresh entry. Entries are evicted least-recently-used first once the directory
+    grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, dtype: str = None):
+        self.cache_dir = cache_dir or Settings.PCM_CACHE_DIR
+        self.max_bytes = int(max_bytes if max_bytes is not None else Settings.PCM_CACHE_MAX_GB * 1024 ** 3)
+        self.dtype = dtype or Settings.PCM_CACHE_DTYPE
+        if self.dtype not in ("float32", "int16"):
+            raise ValueError(f"Unsupported PCM cache dtype '{self.dtype}', expected float32 or int16")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_id: str, checksum: str) -> str:
+        return f"{file_id}_{checksum or 'nochecksum'}"
+
+    def _header_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + HEADER_SUFFIX)
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + DATA_SUFFIX)
+
+    def get(self, file_id: str, checksum: str) -> Optional[CachedPCM]:
+        """Return the cached entry (and mark it recently used), or None on a miss"""
+        header_path = self._header_path(self.make_key(file_id, checksum))
+        if not os.path.exists(header_path):
+            return None
+        try:
+            pcm = CachedPCM(header_path)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable PCM cache entry {header_path}: {e}")
+            self.remove(self.make_key(file_id, checksum))
+            return None
+        os.utime(header_path)
+        return pcm
+
+    def get_or_decode(self, source_path: str, file_id: str, checksum: str) -> CachedPCM:
+        """Return the decoded PCM for this Drive file, decoding source_path on a miss"""
+        pcm = self.get(file_id, checksum)
+        if pcm is not None:
+            print(f"♻️ PCM cache hit for {file_id} ({pcm.duration:.1f}s, {pcm.dtype})")
+            return pcm
+
+        key = self.make_key(file_id, checksum)
+        print(f"🎛️ PCM cache miss for {file_id}, decoding {source_path}")
+        start = time.time()
+        tmp_data = f"{self._data_path(key)}.partial-{os.getpid()}"
+        tmp_header = f"{self._header_path(key)}.partial-{os.getpid()}"
+        try:
+            with sf.SoundFile(source_path) as f:
+                samplerate, channels, frames = f.samplerate, f.channels, f.frames
+                out = np.memmap(tmp_data, dtype=self.dtype, mode="w+", shape=(max(frames, 1), channels))
+                written = 0
+                while written < frames:
+                    n = min(DECODE_BLOCK_FRAMES, frames - written)
+                    if self.dtype == "int16":
+                        # libsndfile doesn't rescale float sources when reading shorts, so scale here
+                        got = f.read(n, dtype="float32", always_2d=True)
+                        out[written:written + len(got)] = np.clip(np.rint(got * 32768.0), -32768, 32767)
+                    else:
+                        got = f.read(n, out=out[written:written + n])
+                    if len(got) == 0:
+                        break
+                    written += len(got)
+                out.flush()
+                del out
+
+            header = {
+                "key": key,
+                "file_id": file_id,
+                "checksum": checksum,
+                "source_name": os.path.basename(source_path),
+                "samplerate": samplerate,
+                "channels": channels,
+                "frames": written,
+                "dtype": self.dtype,
+                "created_at": time.time(),
+            }
+            with open(tmp_header, "w") as f:
+                json.dump(header, f)
+            # The header is the commit marker: data first, then header
+            os.replace(tmp_data, self._data_path(key))
+            os.replace(tmp_header, self._header_path(key))
+        finally:
+            for path in (tmp_data, tmp_header):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        print(f"✅ Decoded {written / samplerate:.1f}s of audio into PCM cache in {time.time() - start:.1f}s")
+        self.evict(keep=key)
+        return CachedPCM(self._header_path(key))
+
+    def entries(self) -> List[Dict]:
+        """All complete entries, most recently used first"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(HEADER_SUFFIX):
+                continue
+            header_path = os.path.join(self.cache_dir, name)
+            key = name[:-len(HEADER_SUFFIX)]
+            try:
+                with open(header_path, "r") as f:
+                    header = json.load(f)
+                size = os.path.getsize(self._data_path(key)) + os.path.getsize(header_path)
+            except (OSError, ValueError):
+                continue
+            entries.append({
+                **header,
+                "bytes": size,
+                "last_used": os.path.getmtime(header_path),
+                "duration": header["frames"] / header["samplerate"],
+            })
+        entries.sort(key=lambda e: e["last_used"], reverse=True)
+        return entries
+
+    def total_bytes(self) -> int:
+        return sum(e["bytes"] for e in self.entries())
+
+    def remove(self, key: str) -> None:
+        # Header first so readers never see a header without its data
+        for path in (self._header_path(key), self._data_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self, max_bytes: int = None, keep: str = None) -> List[str]:
+        """Drop least-recently-used entries until the cache fits in max_bytes; returns removed keys"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e["bytes"] for e in entries)
+        removed = []
+        for entry in reversed(entries):
+            if total <= max_bytes:
+                break
+            if entry["key"] == keep:
+                continue
+            self.remove(entry["key"])
+            total -= entry["bytes"]
+            removed.append(entry["key"])
+        if removed:
+            print(f"🧹 Evicted {len(removed)} PCM cache entries, {total / 1024 ** 2:.1f} MB remaining")
+        return removed
@@ -0,0 +1,95 @@
+# Cheap local check for transcripts that aren't worth a Step-2 call
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from services.menu_index import tokenize
+
+# Phrases that mean the operator is only asking the customer to wait or move up
+WAIT_PATTERNS = (
+    r"\bpull (?:up|forward|ahead|around)\b", r"\bone (?:moment|second|sec|minute)\b",
+    r"\bjust a (?:moment|second|sec|minute)\b", r"\bgive (?:me|us) a (?:moment|second|sec|minute)\b",
+    r"\bbe (?:right )?with you\b", r"\bhold on\b", r"\bplease wait\b", r"\bwait(?:ing)? a\b",
+    r"\bpark(?:ed)? (?:up|in|at)\b", r"\bbring it (?:out|to you)\b",
+)
+# Phrases of a customer collecting an order placed elsewhere
+PICKUP_PATTERNS = (
+    r"\bmobile order\b", r"\bonline order\b", r"\bapp order\b", r"\bordered (?:on|through|in) the app\b",
+    r"\bdoor ?dash\b", r"\buber ?eats\b", r"\bgrub ?hub\b", r"\bpick(?:ing)?[ -]?up\b", r"\bpickup\b",
+    r"\border (?:for|under) [a-z]+\b",
+)
+# Phrases of somebody actually ordering
+ORDER_PATTERNS = (
+    r"\bcan i (?:get|have|order|do)\b", r"\bcould i (?:get|have)\b", r"\bi(?:'ll| will) (?:have|take|get|do)\b",
+    r"\bi(?:'d| would) like\b", r"\blet me (?:get|have|do)\b", r"\bi want\b", r"\bgive me\b",
+    r"\bget (?:me )?(?:a|an|two|three|one)\b", r"\bwhat can i get\b", r"\badd (?:a|an|some)\b",
+)
+# Without a menu index, these still show that food came up
+FOOD_WORDS = {"burger", "fry", "drink", "blizzard", "cone", "sundae", "shake", "meal", "combo", "dog",
+              "chicken", "strip", "basket", "sandwich", "coke", "water", "ice", "cream"}
+
+MIN_WORDS = 8  # fewer words than this with no order in it is a fragment
+
+
+def _any(patterns: Iterable[str], text: str) -> bool:
+    return any(re.search(p, text) for p in patterns)
+
+
+def features(transcript: str, menu_tokens: Set[str] = None) -> Dict[str, int]:
+    text = (transcript or "").lower()
+    words = re.findall(r"[a-z']+", text)
+    tokens = tokenize(text)
+    return {
+        "words": len(words),
+        "lines": len([line for line in text.splitlines() if line.strip()]),
+        "menu_mentions": len(tokens & (menu_tokens or FOOD_WORDS)),
+        "order_phrases": sum(bool(re.search(p, text)) for p in ORDER_PATTERNS),
+        "wait": int(_any(WAIT_PATTERNS, text)),
+        "pickup": int(_any(PICKUP_PATTERNS, text)),
+    }
+
+
+def skip_reason(transcript: str, menu_tokens: Set[str] = None) -> Optional[str]:
+    """
+    Why this transcript can't be graded, or None if it should go to Step-2.
+
+    Only fires when nothing was ordered: no order phrasing and no menu item named. A wait-only
+    exchange, a pickup of a mobile/delivery order, or a short fragment is then skipped. Anything
+    that mentions food goes to the model, so a miss costs a call, never a grade.
+    """
+    if not (transcript or "").strip():
+        return "empty"
+    f = features(transcript, menu_tokens)
+    if f["order_phrases"] or f["menu_mentions"]:
+        return None
+    if f["pickup"]:
+        return "mobile_pickup"
+    if f["wait"]:
+        return "wait_only"
+    if f["words"] < MIN_WORDS:
+        return "fragment"
+    return None
+
+
+def evaluate(samples: List[Tuple[str, int]], menu_tokens: Set[str] = None) -> Dict[str, float]:
+    """
+    Precision/recall of skip_reason against Step-1's complete_order flag: a skip is correct when
+    Step-1 called the transcript incomplete (complete_order=0).
+    """
+    tp = fp = fn = 0
+    reasons: Dict[str, int] = {}
+    for transcript, complete_order in samples:
+        reason = skip_reason(transcript, menu_tokens)
+        incomplete = not int(complete_order or 0)
+        if reason:
+            reasons[reason] = reasons.get(reason, 0) + 1
+            tp += incomplete
+            fp += not incomplete
+        else:
+            fn += incomplete
+    return {
+        "samples": len(samples),
+        "skipped": tp + fp,
+        "precision": tp / (tp + fp) if tp + fp else 1.0,
+        "recall": tp / (tp + fn) if tp + fn else 1.0,
+        "reasons": reasons,
+    }
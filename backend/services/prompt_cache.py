@@ -0,0 +1,239 @@
+# Compiled Step-2 prompts, cached per location and menu version
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import Settings, Prompts
+from services.menu_index import MenuIndex
+
+logger = logging.getLogger(__name__)
+
+# Placeholders filled from the location's menu rows. The template keeps them all at the end so
+# everything before the first one is identical for every location and menu.
+LOCATION_PLACEHOLDERS = ("<<ITEMS_JSON>>", "<<MEALS_JSON>>", "<<ADDONS_JSON>>")
+
+
+def _digest(*parts: Any) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, separators=(",", ":"), default=str).encode())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _stable(rows: List[Dict]) -> List[Dict]:
+    """Rows in a fixed order, so the same menu always serializes to the same bytes"""
+    return sorted(rows, key=lambda r: json.dumps(r, sort_keys=True, default=str))
+
+
+def menu_version(items: List[Dict], meals: List[Dict], addons: List[Dict]) -> str:
+    """Content hash of a location's items / meals / add_ons as they appear in the prompt"""
+    return _digest(_stable(items), _stable(meals), _stable(addons))
+
+
+def static_version(upselling: Any, upsizing: Any, template: str = None) -> str:
+    """Hash of everything that is shared by all locations (template + upselling/upsizing scenarios)"""
+    return _digest(template if template is not None else Prompts.template, upselling, upsizing)
+
+
+def compile_step2_prompt(upselling: Any, upsizing: Any, addons: List[Dict], items: List[Dict],
+                         meals: List[Dict], template: str = None) -> str:
+    template = template if template is not None else Prompts.template
+    return (template
+            .replace("<<UPSELLING_JSON>>", json.dumps(upselling))
+            .replace("<<UPSIZING_JSON>>", json.dumps(upsizing))
+            .replace("<<ITEMS_JSON>>", json.dumps(_stable(items)))
+            .replace("<<MEALS_JSON>>", json.dumps(_stable(meals)))
+            .replace("<<ADDONS_JSON>>", json.dumps(_stable(addons))))
+
+
+def static_prefix_length(template: str = None) -> int:
+    """Characters of the compiled prompt before the first location-specific placeholder"""
+    template = template if template is not None else Prompts.template
+    return min(template.index(p) for p in LOCATION_PLACEHOLDERS)
+
+
+class Step2PromptCache:
+    """
+    Per-location compiled Step-2 prompts, shared by threads (in memory) and processes (on disk).
+
+    A lookup first trusts the in-memory entry for STEP2_PROMPT_CACHE_CHECK_SECONDS. After that it
+    asks `stamp_fn` for the location's cheap menu stamp (row counts + latest updated_at) and only
+    reloads the menu when the stamp moved or the entry is older than STEP2_PROMPT_CACHE_MAX_AGE.
+    A reload whose rows hash to the same menu version keeps the compiled prompt as-is.
+
+    Each entry also keeps the menu rows and their item-name index (services/menu_index.py), so
+    pruned() can build a prompt with just the rows one transcript mentions.
+    """
+
+    def __init__(self, load_fn: Callable[[str], Tuple], stamp_fn: Callable[[str], str] = None,
+                 cache_dir: str = None, check_seconds: float = None, max_age: float = None,
+                 on_menu_change: Callable[[str], None] = None):
+        self.load_fn = load_fn  # location_id -> (upselling, upsizing, addons, items, meals)
+        self.stamp_fn = stamp_fn
+        self.on_menu_change = on_menu_change  # told when a location's menu version moved
+        self.cache_dir = cache_dir if cache_dir is not None else Settings.STEP2_PROMPT_CACHE_DIR
+        self.check_seconds = Settings.STEP2_PROMPT_CACHE_CHECK_SECONDS if check_seconds is None else check_seconds
+        self.max_age = Settings.STEP2_PROMPT_CACHE_MAX_AGE if max_age is None else max_age
+        self._entries: Dict[str, Dict] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._location_locks: Dict[str, threading.Lock] = {}
+        self._indexes: Dict[str, Tuple[str, MenuIndex]] = {}
+        self.hits = 0
+        self.rebuilds = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, location_id: str) -> str:
+        return os.path.join(self.cache_dir, f"step2_{location_id}.json")
+
+    def _read_disk(self, location_id: str) -> Optional[Dict]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(location_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, location_id: str, entry: Dict) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f".step2_{location_id}.")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(location_id))
+        except OSError as e:
+            logger.warning(f"Could not persist Step-2 prompt for {location_id}: {e}")
+
+    def _stamp(self, location_id: str) -> Optional[str]:
+        if self.stamp_fn is None:
+            return None
+        try:
+            return self.stamp_fn(location_id)
+        except Exception as e:
+            print(f"⚠️ Menu stamp check failed for {location_id} ({e}), reloading menu")
+            return None
+
+    def _fresh(self, entry: Optional[Dict], stamp: Optional[str]) -> bool:
+        return (entry is not None and stamp is not None and entry.get("stamp") == stamp
+                and "menu_index" in entry and time.time() - entry.get("built_at", 0) < self.max_age)
+
+    def get(self, location_id: str) -> str:
+        return self.get_entry(location_id)["prompt"]
+
+    def get_entry(self, location_id: str) -> Dict:
+        with self._lock:
+            entry = self._entries.get(location_id)
+            if entry is not None and time.time() - self._checked.get(location_id, 0) < self.check_seconds:
+                self.hits += 1
+                return entry
+            location_lock = self._location_locks.setdefault(location_id, threading.Lock())
+
+        # One thread per location revalidates; the rest wait and then reuse its result
+        with location_lock:
+            with self._lock:
+                entry = self._entries.get(location_id)
+                if entry is not None and time.time() - self._checked.get(location_id, 0) < self.check_seconds:
+                    self.hits += 1
+                    return entry
+
+            stamp = self._stamp(location_id)
+            for candidate in (entry, self._read_disk(location_id)):
+                if self._fresh(candidate, stamp):
+                    self._remember(location_id, candidate)
+                    with self._lock:
+                        self.hits += 1
+                    return candidate
+
+            entry = self._rebuild(location_id, stamp, entry or self._read_disk(location_id))
+            self._remember(location_id, entry)
+            return entry
+
+    def _rebuild(self, location_id: str, stamp: Optional[str], previous: Optional[Dict]) -> Dict:
+        upselling, upsizing, addons, items, meals = self.load_fn(location_id)
+        version = menu_version(items, meals, addons)
+        shared = static_version(upselling, upsizing)
+        now = time.time()
+        if (previous and previous.get("menu_version") == version and previous.get("static_version") == shared
+                and "menu_index" in previous):
+            entry = {**previous, "stamp": stamp, "built_at": now}
+            print(f"♻️ Step-2 prompt for {location_id} unchanged (menu {version})")
+        else:
+            entry = {
+                "location_id": location_id,
+                "menu_version": version,
+                "static_version": shared,
+                "stamp": stamp,
+                "built_at": now,
+                "prompt": compile_step2_prompt(upselling, upsizing, addons, items, meals),
+                "menu": {"upselling": upselling, "upsizing": upsizing, "items": _stable(items),
+                         "meals": _stable(meals), "addons": _stable(addons)},
+            }
+            menu = entry["menu"]
+            entry["menu_index"] = MenuIndex(menu["items"], menu["meals"], menu["addons"]).to_dict()
+            with self._lock:
+                self.rebuilds += 1
+            if previous and self.on_menu_change is not None:
+                self.on_menu_change(location_id)
+            print(f"🧩 Compiled Step-2 prompt for {location_id}: menu {version}, {len(entry['prompt'])} chars")
+        self._write_disk(location_id, entry)
+        return entry
+
+    def _remember(self, location_id: str, entry: Dict) -> None:
+        with self._lock:
+            self._entries[location_id] = entry
+            self._checked[location_id] = time.time()
+
+    def menu_index(self, location_id: str) -> Tuple[MenuIndex, Dict]:
+        """The location's item-name index and menu rows, rebuilt from the entry only when its version moves"""
+        entry = self.get_entry(location_id)
+        with self._lock:
+            cached = self._indexes.get(location_id)
+            if cached is not None and cached[0] == entry["menu_version"]:
+                return cached[1], entry["menu"]
+        menu = entry["menu"]
+        index = MenuIndex.from_dict(entry["menu_index"], menu["items"], menu["meals"], menu["addons"])
+        with self._lock:
+            self._indexes[location_id] = (entry["menu_version"], index)
+        return index, menu
+
+    def pruned(self, location_id: str, transcript: str) -> Optional[str]:
+        """
+        Step-2 prompt with only the menu rows the transcript mentions (and their upsell/upsize/add-on
+        neighbours). None when nothing on the menu matched, in which case use the full prompt.
+        """
+        index, menu = self.menu_index(location_id)
+        rows = index.shortlist(transcript)
+        if rows is None:
+            return None
+        return compile_step2_prompt(menu["upselling"], menu["upsizing"], rows["addons"], rows["items"], rows["meals"])
+
+    def invalidate(self, location_id: str = None) -> None:
+        """Forget one location (or every location) here and on disk, e.g. after editing its menu"""
+        with self._lock:
+            locations = [location_id] if location_id else list(self._entries)
+            for loc in locations:
+                self._entries.pop(loc, None)
+                self._checked.pop(loc, None)
+                self._indexes.pop(loc, None)
+        if self.cache_dir:
+            names = [f"step2_{location_id}.json"] if location_id else [
+                n for n in os.listdir(self.cache_dir) if n.startswith("step2_") and n.endswith(".json")]
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def version(self, location_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(location_id)
+        return entry["menu_version"] if entry else None
@@ -0,0 +1,152 @@
+# Read-through TTL/LRU cache for small reference lookups (location names, menu prices, owners)
+
+import os
+import copy
+import time
+import threading
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from config import Settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU map whose entries expire `ttl` seconds after they were loaded.
+
+    get_or_load() returns the cached value or calls the loader and keeps its result. The loader
+    runs outside the lock, so a slow query doesn't block other keys; two threads missing the same
+    key at once may both load it, and the second result wins. Exceptions and None results are
+    never cached, so a lookup of something that doesn't exist yet is retried next time.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries or Settings.REF_CACHE_MAX_ENTRIES)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, value = item
+                if self.ttl <= 0 or time.monotonic() < expires:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return _MISSING
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        # Callers get their own copy of dicts/lists, so mutating a result can't poison the cache
+        return copy.copy(value) if isinstance(value, (dict, list)) else value
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        """Drop one key, or everything when no key is given"""
+        with self._lock:
+            if key is _MISSING:
+                self.invalidations += len(self._data)
+                self._data.clear()
+            elif self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _reset_lock(self) -> None:
+        self._lock = threading.Lock()
+
+
+_caches: Dict[str, TTLCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(name: str, ttl: float) -> TTLCache:
+    """The process-wide cache called `name`, shared by every Supa() instance"""
+    with _registry_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = TTLCache(name, ttl)
+        return cache
+
+
+def cached(name: str, ttl_setting: str):
+    """
+    Make a Supa method read-through: results are cached per positional arguments for the
+    Settings attribute `ttl_setting` seconds. REF_CACHE_ENABLED=false turns every cache off.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args):
+            if not Settings.REF_CACHE_ENABLED:
+                return fn(self, *args)
+            cache = get_cache(name, getattr(Settings, ttl_setting))
+            return cache.get_or_load(args, lambda: fn(self, *args))
+        return wrapper
+    return decorator
+
+
+def invalidate(name: str, *args) -> None:
+    """Forget one cached lookup (`args` as the method was called with), or all of `name`"""
+    with _registry_lock:
+        cache = _caches.get(name)
+    if cache is not None:
+        cache.invalidate(args) if args else cache.invalidate()
+
+
+def cache_metrics() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        caches = dict(_caches)
+    return {name: cache.stats() for name, cache in sorted(caches.items())}
+
+
+def reset_caches() -> None:
+    with _registry_lock:
+        _caches.clear()
+
+
+def _after_fork() -> None:
+    # Cached values stay valid in a forked worker, but a lock held mid-fork would never be released
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    for cache in _caches.values():
+        cache._reset_lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
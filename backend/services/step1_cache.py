@@ -0,0 +1,68 @@
+# Memoized Step-1 (transaction splitting) answers, so re-running an unchanged transcript is free
+
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+from config import Settings, Prompts
+from services.asr_cache import ASRCache, NullASRCache, SQLiteASRCache
+
+logger = logging.getLogger(__name__)
+
+# Anything that changes what Step-1 would answer for the same transcript
+STEP1_REASONING = {"effort": "high", "summary": "detailed"}
+
+
+def step1_prompt_version() -> str:
+    """Hash of the Step-1 prompt and request settings; editing the prompt retires old entries"""
+    raw = repr((Prompts.INITIAL_PROMPT, sorted(STEP1_REASONING.items())))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def step1_cache_key(transcript: str, model: str = None) -> str:
+    h = hashlib.sha256()
+    h.update(transcript.encode("utf-8"))
+    h.update(b"\0model:" + (model or Settings.STEP1_MODEL).encode())
+    h.update(b"\0prompt:" + step1_prompt_version().encode())
+    return h.hexdigest()
+
+
+_cache: Optional[ASRCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_step1_cache() -> ASRCache:
+    """Process-wide Step-1 cache: the same SQLite text store as the ASR cache, in its own file"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = Settings.STEP1_CACHE_BACKEND.lower()
+            if backend == "none":
+                _cache = NullASRCache()
+            elif backend == "sqlite":
+                try:
+                    _cache = SQLiteASRCache(path=Settings.STEP1_CACHE_PATH,
+                                            ttl_seconds=Settings.STEP1_CACHE_TTL_DAYS * 86400,
+                                            max_bytes=int(Settings.STEP1_CACHE_MAX_MB * 1024 ** 2))
+                except Exception as e:
+                    logger.warning(f"Step-1 cache unavailable ({e}), splitting without it")
+                    _cache = NullASRCache()
+            else:
+                raise ValueError(f"Unknown Step-1 cache backend '{backend}', expected sqlite or none")
+        return _cache
+
+
+def set_step1_cache(cache: Optional[ASRCache]) -> None:
+    """Swap the process-wide cache (None rebuilds it from settings on next use)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def log_step1_cache_stats(before: Dict[str, Any] = None) -> None:
+    """Print Step-1 cache hits/misses, for this run when given the counters from its start"""
+    stats = get_step1_cache().stats()
+    hits = stats["hits"] - (before or {}).get("hits", 0)
+    misses = stats["misses"] - (before or {}).get("misses", 0)
+    if hits + misses:
+        print(f"📊 Step-1 cache: {hits} hits, {misses} misses ({hits / (hits + misses):.0%} hit ratio)")
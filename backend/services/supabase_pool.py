@@ -0,0 +1,135 @@
+# One pooled Supabase client per process, shared by every Supa() instance
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+
+from config import Settings
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 (httpx needs it for HTTP/2)
+        return True
+    except ImportError:
+        return False
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """HTTP transport that counts requests, errors, in-flight and latency for /metrics"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.seconds = 0.0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.monotonic()
+        try:
+            response = super().handle_request(request)
+            if response.status_code >= 500:
+                with self._lock:
+                    self.errors += 1
+            return response
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.requests += 1
+                self.seconds += time.monotonic() - start
+
+    def stats(self) -> Dict[str, Any]:
+        connections = list(getattr(self._pool, "connections", []))
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "avg_ms": round(self.seconds / self.requests * 1000, 1) if self.requests else None,
+                "connections": len(connections),
+                "idle_connections": sum(1 for c in connections if c.is_idle()),
+                "http2_connections": sum(1 for c in connections if "HTTP/2" in repr(c)),
+            }
+
+
+_lock = threading.Lock()
+_pid: Optional[int] = None
+_client: Optional[Client] = None
+_transport: Optional[MeteredTransport] = None
+_created = 0
+
+
+def _build() -> None:
+    global _client, _transport, _pid, _created
+    http2 = Settings.SUPABASE_HTTP2 and _http2_available()
+    limits = httpx.Limits(max_connections=Settings.SUPABASE_MAX_CONNECTIONS,
+                          max_keepalive_connections=Settings.SUPABASE_MAX_KEEPALIVE,
+                          keepalive_expiry=Settings.SUPABASE_KEEPALIVE_SECONDS)
+    _transport = MeteredTransport(http2=http2, limits=limits, retries=1)
+    session = httpx.Client(transport=_transport, timeout=Settings.SUPABASE_TIMEOUT_SECONDS,
+                           follow_redirects=True)
+    _client = create_client(Settings.SUPABASE_URL, Settings.SUPABASE_SERVICE_KEY,
+                            options=SyncClientOptions(httpx_client=session))
+    _pid = os.getpid()
+    _created += 1
+
+
+def get_client() -> Client:
+    """
+    The process's Supabase client, created on first use.
+
+    A forked worker (gunicorn, multiprocessing) gets a fresh client instead of the parent's, so
+    two processes never share a keep-alive socket.
+    """
+    if _client is None or _pid != os.getpid():
+        with _lock:
+            if _client is None or _pid != os.getpid():
+                _build()
+    return _client
+
+
+def _forget_after_fork() -> None:
+    # The parent's lock may have been held mid-fork and its sockets belong to the parent
+    global _lock, _client, _transport, _pid
+    _lock = threading.Lock()
+    _client = _transport = _pid = None
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+
+def pool_metrics() -> Dict[str, Any]:
+    """Connection pool usage of this process's client"""
+    return {
+        "pid": os.getpid(),
+        "clients_created": _created,
+        "http2": bool(Settings.SUPABASE_HTTP2 and _http2_available()),
+        "max_connections": Settings.SUPABASE_MAX_CONNECTIONS,
+        "max_keepalive": Settings.SUPABASE_MAX_KEEPALIVE,
+        **(_transport.stats() if _transport is not None and _pid == os.getpid() else {}),
+    }
+
+
+def reset_client() -> None:
+    """Close the pooled client; the next get_client() builds a new one"""
+    global _client, _transport, _pid
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.postgrest.session.close()
+        _client = _transport = _pid = None
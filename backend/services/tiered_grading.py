@@ -0,0 +1,122 @@
+# Local checks on a Step-2 grade, used to decide when a low-effort answer needs a high-effort retry
+
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Field numbers of the counts in the Step-2 template's Response Guidelines (Prompts.template).
+# The checks read the raw answer, so they follow the template's numbering, not the grade columns
+TEMPLATE_FIELDS = {
+    "num_items_initial": "2",
+    "num_upsell_opportunities": "3", "num_upsell_offers": "5", "num_upsell_success": "9",
+    "num_upsize_opportunities": "11", "num_upsize_offers": "14", "num_upsize_success": "15",
+    "num_addon_opportunities": "18", "num_addon_offers": "21", "num_addon_success": "22",
+    "num_items_after": "26",
+}
+# (offers, opportunities) and (successes, offers) pairs that must never go the wrong way
+OFFER_CHECKS = (
+    ("num_upsell_offers", "num_upsell_opportunities"),
+    ("num_upsize_offers", "num_upsize_opportunities"),
+    ("num_addon_offers", "num_addon_opportunities"),
+)
+SUCCESS_CHECKS = (
+    ("num_upsell_success", "num_upsell_offers"),
+    ("num_upsize_success", "num_upsize_offers"),
+    ("num_addon_success", "num_addon_offers"),
+)
+# The template's hard rule: items after = items before + successful upselling chances. Upsizes
+# swap an item for a bigger one and add-ons don't count as items, so neither adds to the total
+ITEM_ADDING_SUCCESSES = ("num_upsell_success",)
+
+# Template fields holding "[Item ID]_[Size ID]" values, numbered and non-numbered
+ITEM_FIELDS = ("1", "4", "4_base", "6", "7", "8", "8_base_sold", "11_base", "12", "13", "14_base", "16",
+               "16_base_sold", "18_base", "19", "20", "21_base", "23", "23_base_sold", "25")
+
+
+def _total(details: Dict[str, Any], fields) -> int:
+    fields = (fields,) if isinstance(fields, str) else fields
+    total = 0
+    for field in fields:
+        try:
+            total += int(details.get(field) or 0)
+        except (TypeError, ValueError):
+            pass
+    return total
+
+
+def item_ids(details: Dict[str, Any], fields: Iterable[str] = ITEM_FIELDS) -> Set[str]:
+    """Item IDs in the grade's "[Item ID]_[Size ID]" values"""
+    ids = set()
+    for field in fields:
+        for item_id, _size in re.findall(r"\b(\d+)_(\d+)\b", str(details.get(field) or "")):
+            ids.add(item_id)
+    return ids
+
+
+def check_invariants(answer: Dict[str, Any], menu_item_ids: Optional[Set[str]] = None) -> List[str]:
+    """
+    The Step-2 template's hard rules, checked on the parsed answer (keyed by template field number).
+    Returns one message per violation; an empty list means the grade is consistent.
+    """
+    counts = {name: answer.get(field) for name, field in TEMPLATE_FIELDS.items()}
+    problems = []
+    for offers, chances in OFFER_CHECKS + SUCCESS_CHECKS:
+        if _total(counts, offers) > _total(counts, chances):
+            problems.append(f"{offers} > {chances}")
+    expected_after = _total(counts, "num_items_initial") + _total(counts, ITEM_ADDING_SUCCESSES)
+    if _total(counts, "num_items_after") != expected_after:
+        problems.append(f"num_items_after {_total(counts, 'num_items_after')} != {expected_after}")
+    if menu_item_ids:
+        unknown = item_ids(answer) - menu_item_ids
+        if unknown:
+            problems.append(f"unknown item ids {sorted(unknown)}")
+    return problems
+
+
+class TierStats:
+    """Per-run counts, latency and cost of the low- and high-effort tiers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tiers = {tier: {"calls": 0, "seconds": 0.0, "cost": 0.0} for tier in ("low", "high")}
+        self.graded = 0
+        self.escalated = 0
+        self.reasons: Dict[str, int] = {}
+
+    def record(self, tier: str, seconds: float, cost: float) -> None:
+        with self._lock:
+            stats = self.tiers[tier]
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["cost"] += cost
+
+    def outcome(self, problems: List[str]) -> None:
+        with self._lock:
+            self.graded += 1
+            if problems:
+                self.escalated += 1
+                for problem in problems:
+                    key = problem.split(" ")[0]
+                    self.reasons[key] = self.reasons.get(key, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "graded": self.graded,
+                "escalated": self.escalated,
+                "tiers": {tier: dict(stats) for tier, stats in self.tiers.items()},
+                "reasons": dict(self.reasons),
+            }
+
+    def report(self) -> None:
+        s = self.summary()
+        if not s["graded"]:
+            return
+        print(f"🪜 Tiered grading: {s['graded'] - s['escalated']}/{s['graded']} accepted at low effort, "
+              f"{s['escalated']} escalated to high")
+        for tier, stats in s["tiers"].items():
+            if stats["calls"]:
+                print(f"   {tier:<4} {stats['calls']:>5} calls  {stats['seconds']:>8.1f}s  "
+                      f"avg {stats['seconds'] / stats['calls']:.1f}s  ${stats['cost']:.4f}")
+        if s["reasons"]:
+            print(f"   escalation reasons: {s['reasons']}")
@@ -10,6 +10,9 @@ from utils.helpers import iso_from_start, iso_or_die
 from utils.helpers import json_or_none
 from concurrent.futures import ThreadPoolExecutor
 from services.database import Supa
+from services.asr_encoding import OffsetMap
+from utils.llm_dispatch import llm_call_with_retry, pool_size
+from services.step1_cache import STEP1_REASONING, get_step1_cache, step1_cache_key, log_step1_cache_stats
 settings = Settings()
 prompts = Prompts()
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -19,6 +22,8 @@ db = Supa()
 def split_into_transactions(transcript_segments: List[Dict], date: str, audio_id: str, run_id: str, audio_started_at_iso: str = "10:00:00Z", test_first_segment: bool = True) -> List[Dict]:
     # Anchor all transaction times strictly to the audio's database start time
     print(f"Using database timestamp: {date}T{audio_started_at_iso}")
+    cache_before = get_step1_cache().stats()
+    first_transactions = None
     
     # Test mode: process first segment only first
     if test_first_segment and transcript_segments:
@@ -31,65 +36,49 @@ def split_into_transactions(transcript_segments: List[Dict], date: str, audio_id
         print(f"✅ First segment processed: {len(first_transactions)} transactions")
         
         if len(transcript_segments) == 1:
+            log_step1_cache_stats(cache_before)
             return first_transactions
         
         # Ask user if they want to continue with parallel processing
         print(f"🔄 Proceeding with parallel processing of remaining {len(transcript_segments) - 1} segments...")
     
-    # Process segments in parallel with controlled concurrency
-    with ThreadPoolExecutor(max_workers=10) as executor:  # Reduced to avoid rate limits
+    # Process segments in parallel; the shared Step-1 controller adapts how many run at once
+    # The canary's result is reused rather than sending segment 0 again
+    remaining = transcript_segments[1:] if first_transactions is not None else transcript_segments
+    with ThreadPoolExecutor(max_workers=pool_size(settings.STEP1_MODEL)) as executor:
         futures = [
             executor.submit(_process_segment, seg, date, audio_id, run_id, audio_started_at_iso) 
-            for seg in transcript_segments
+            for seg in remaining
         ]
         
         # Collect all results and flatten
-        all_transactions = []
+        all_transactions = list(first_transactions or [])
         for future in futures:
             segment_transactions = future.result()
             if segment_transactions:  # Filter out None/empty results
                 all_transactions.extend(segment_transactions)
     
+    log_step1_cache_stats(cache_before)
     return all_transactions
 
 
-def upload_transactions_to_database(transactions: List[Dict], batch_size: int = 30) -> List[Dict]:
-    """Upload transactions to database in batches and return all uploaded transactions with IDs."""
+def upload_transactions_to_database(transactions: List[Dict], batch_size: int = None) -> List[Dict]:
+    """Upload transactions to database in parallel chunks and return all uploaded transactions with IDs."""
     if not transactions:
         return []
     
-    all_uploaded_transactions = []
-    total_batches = (len(transactions) + batch_size - 1) // batch_size
-    
-    print(f"📤 Uploading {len(transactions)} transactions in {total_batches} batches of {batch_size}")
-    
-    for i in range(0, len(transactions), batch_size):
-        batch = transactions[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        
-        print(f"📤 Uploading batch {batch_num}/{total_batches} ({len(batch)} transactions)")
-        
-        try:
-            # Upload batch to database
-            uploaded_batch = db.upsert_transactions(batch)
-            all_uploaded_transactions.extend(uploaded_batch)
-            print(f"✅ Successfully uploaded batch {batch_num}/{total_batches}")
-            
-        except Exception as e:
-            print(f"❌ Failed to upload batch {batch_num}/{total_batches}: {e}")
-            # Continue with next batch instead of failing completely
-            continue
-    
-    print(f"🎉 Completed uploading {len(all_uploaded_transactions)} transactions in {total_batches} batches")
-    return all_uploaded_transactions
+    print(f"📤 Uploading {len(transactions)} transactions")
+    return db.upsert_transactions(transactions, max_rows=batch_size)
 
-def _process_segment(seg: Dict, date: str, audio_id: str, run_id: str, audio_started_at_iso: str) -> List[Dict]:
-    """Process a single transcript segment and return all transactions from it."""
-    raw = seg.get("text","") or ""
-    if not raw.strip():
-        return []
-    
-    resp = client.responses.create(
+def _step1_output(raw: str) -> str:
+    """Step-1 answer for a transcript, from the memo cache when this exact transcript was split before"""
+    cache = get_step1_cache()
+    key = step1_cache_key(raw)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    resp = llm_call_with_retry(settings.STEP1_MODEL, client.with_options(max_retries=0).responses.create,
         model=settings.STEP1_MODEL,
         input=[{
             "role":"user",
@@ -100,9 +89,20 @@ def _process_segment(seg: Dict, date: str, audio_id: str, run_id: str, audio_sta
         }],
         store=False,
         text={"format":{"type":"text"}},
-        reasoning={"effort":"high","summary":"detailed"},
+        reasoning=dict(STEP1_REASONING),
     )
     text_out = resp.output[1].content[0].text if hasattr(resp, "output") else ""
+    if text_out.strip():
+        cache.set(key, text_out)
+    return text_out
+
+def _process_segment(seg: Dict, date: str, audio_id: str, run_id: str, audio_started_at_iso: str) -> List[Dict]:
+    """Process a single transcript segment and return all transactions from it."""
+    raw = seg.get("text","") or ""
+    if not raw.strip():
+        return []
+    
+    text_out = _step1_output(raw)
     print(f"\n=== STEP 1 (Transaction Splitting) RAW OUTPUT ===")
     print(f"Input transcript: {raw[:200]}...")
     print(f"Raw LLM response: {text_out}")
@@ -131,6 +131,14 @@ def _process_segment(seg: Dict, date: str, audio_id: str, run_id: str, audio_sta
     segment_transactions = []
     seg_dur = max(0.001, float(seg["end"]) - float(seg["start"]))
     slice_dur = seg_dur / max(1, len(normalized_parts))
+    bounds = [float(seg["start"]) + i*slice_dur for i in range(len(normalized_parts) + 1)]
+    if seg.get("offset_map") and len(normalized_parts) > 1:
+        # The model heard a silence-compacted clip: split evenly over what it heard, then map
+        # the inner boundaries back to source seconds so long pauses don't skew them
+        offsets = OffsetMap(seg["offset_map"], seg_dur)
+        compact_slice = offsets.duration / len(normalized_parts)
+        for i in range(1, len(normalized_parts)):
+            bounds[i] = float(seg["start"]) + offsets.to_source(i*compact_slice)
     
     for i, p in enumerate(normalized_parts):
         # Ensure we have a dict for downstream access
@@ -138,8 +146,8 @@ def _process_segment(seg: Dict, date: str, audio_id: str, run_id: str, audio_sta
             d = p
         else:
             d = json_or_none(p) or {"1": raw, "2": "0"}
-        s_rel = float(seg["start"]) + i*slice_dur
-        e_rel = float(seg["start"]) + (i+1)*slice_dur
+        s_rel = bounds[i]
+        e_rel = bounds[i + 1]
         segment_transactions.append({
             "audio_id": audio_id, 
             "run_id": run_id,
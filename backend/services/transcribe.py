@@ -1,34 +1,60 @@
 import os
+import time
 import soundfile as sf
 from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from config import Settings
+from utils.rate_limit import TokenBucket, is_retryable, backoff_delay
+from utils.llm_dispatch import llm_call
+from services.asr_cache import get_asr_cache, clip_cache_key
+from services.asr_encoding import encode_for_asr, asr_encoding_tag, trim_offset_map
 
 ASR_MODEL = Settings.ASR_MODEL
+ASR_PROMPT = "You are a performance reviewer assessing a Dairy Queen drive-thru operator's handling of an order. Create a transcript, noting whether the operator or the customer is speaking."
 
 client = OpenAI()
 
-def transcribe_segments(audio_clip_paths: List[str], begin_times: List[float], end_times: List[float]) -> List[Dict[str, Any]]:
-    transcript_segments = []
-    print(f"🔍 DEBUG: Transcribing {len(audio_clip_paths)} audio clips")
+# Shared by every thread in the process: requests/minute and audio-minutes/minute
+request_bucket = TokenBucket(Settings.ASR_REQUESTS_PER_MINUTE)
+audio_minutes_bucket = TokenBucket(Settings.ASR_AUDIO_MINUTES_PER_MINUTE)
+
+def transcribe_segments(audio_clip_paths: List[str], begin_times: List[float], end_times: List[float],
+                        max_in_flight: int = None) -> List[Dict[str, Any]]:
+    """
+    Transcribe clips concurrently (at most max_in_flight requests at once, ASR_MAX_IN_FLIGHT by
+    default) while the shared token buckets keep us under the ASR rate limits. Segments are
+    returned in input order, skipping empty clip paths and clips that failed to transcribe.
+    """
+    max_in_flight = max(1, max_in_flight or Settings.ASR_MAX_IN_FLIGHT)
+    print(f"🔍 DEBUG: Transcribing {len(audio_clip_paths)} audio clips ({max_in_flight} in flight)")
     print(f"🔍 DEBUG: Audio clip paths: {audio_clip_paths}")
     print(f"🔍 DEBUG: Begin times: {begin_times}")
     print(f"🔍 DEBUG: End times: {end_times}")
+
+    jobs = []
     for i, (audio_clip_path, begin_time, end_time) in enumerate(zip(audio_clip_paths, begin_times, end_times)):
         # Skip empty or failed clip paths
         if not audio_clip_path or audio_clip_path == "":
             print(f"⚠️ Skipping empty clip path for clip {i}")
             continue
-            
-        result = transcribe_audio_clip(audio_clip_path, begin_time, end_time, i)
+        jobs.append((i, audio_clip_path, begin_time, end_time))
+
+    started = time.time()
+    cache_before = get_asr_cache().stats()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = [executor.submit(transcribe_audio_clip, path, begin, end, i) for i, path, begin, end in jobs]
+        results = [future.result() for future in futures]
+
+    transcript_segments = []
+    for (i, _, begin_time, end_time), result in zip(jobs, results):
         if 'error' not in result:
-            transcript_segments.append({
-                'start': begin_time,
-                'end': end_time,
-                'text': result['transcript']
-            })
+            transcript_segments.append(segment_from_result(result, begin_time, end_time))
         else:
             print(f"❌ Failed to transcribe clip {i}: {result['error']}")
+    print(f"⏱️ Transcribed {len(transcript_segments)}/{len(jobs)} clips in {time.time() - started:.1f}s")
+    log_asr_cache_stats(cache_before)
+    log_billed_minutes(results)
     return transcript_segments
 
 def transcribe_audio_clip(audio_clip_path: str, begin_time: float, end_time: float,
@@ -52,29 +78,49 @@ def transcribe_audio_clip(audio_clip_path: str, begin_time: float, end_time: flo
             with sf.SoundFile(audio_clip_path) as f:
                 audio_duration = f.frames / f.samplerate
 
-            # Generate transcript using GPT-4o-Transcribe
-            with open(audio_clip_path, "rb") as audio_file_obj:
-                transcript = client.audio.transcriptions.create(
-                    model=ASR_MODEL,  # Use configured model
-                    file=audio_file_obj,
-                    response_format="text",
-                    temperature=0.001,
-                    prompt="You are a performance reviewer assessing a Dairy Queen drive-thru operator's handling of an order. Create a transcript, noting whether the operator or the customer is speaking."
-                )
+            # Same audio, model and prompt as an earlier run → reuse that transcript
+            cache = get_asr_cache()
+            cache_key = clip_cache_key(audio_clip_path, f"{ASR_MODEL}|{asr_encoding_tag()}", ASR_PROMPT)
+            transcript = cache.get(cache_key)
+            cached = transcript is not None
 
-            # Calculate audio transcription cost
-            audio_price = (audio_duration * 0.0012 / 60)  # $0.0012 per minute
-            print(f"💰 Audio transcription cost for clip {index}: ${audio_price:.6f}")
-            print(f"✅ Transcribed clip {index}: {len(str(transcript))} characters")
+            if cached:
+                audio_price = 0.0
+                billed_duration = 0.0
+                offset_map = trim_offset_map(audio_clip_path)
+                print(f"♻️ ASR cache hit for clip {index}: {len(transcript)} characters")
+            else:
+                # Upload a 16 kHz mono copy with silence compacted; the archive clip itself is untouched
+                upload_path, is_temp, offset_map = encode_for_asr(audio_clip_path)
+                billed_duration = offset_map.duration if offset_map is not None else audio_duration
+                try:
+                    # Generate transcript using GPT-4o-Transcribe, retrying 429/5xx with jittered backoff
+                    transcript = str(_create_transcription_with_retry(upload_path, billed_duration, index))
+                finally:
+                    if is_temp and os.path.exists(upload_path):
+                        os.remove(upload_path)
+                cache.set(cache_key, transcript)
+
+                # Calculate audio transcription cost
+                audio_price = (billed_duration * 0.0012 / 60)  # $0.0012 per minute
+                if offset_map is not None and offset_map.removed > 0:
+                    print(f"🔇 Trimmed {offset_map.removed:.1f}s of silence from clip {index} "
+                          f"({billed_duration:.1f}s of {audio_duration:.1f}s billed)")
+                print(f"💰 Audio transcription cost for clip {index}: ${audio_price:.6f}")
+                print(f"✅ Transcribed clip {index}: {len(transcript)} characters")
 
             return {
                 'index': index,
-                'transcript': str(transcript),
+                'transcript': transcript,
                 'audio_price': audio_price,
                 'started_at': begin_time,
                 'ended_at': end_time,
                 'audio_duration': audio_duration,
-                'clip_path': audio_clip_path
+                'billed_duration': billed_duration,
+                'trimmed_seconds': offset_map.removed if offset_map is not None and not cached else 0.0,
+                'offset_map': offset_map.segments if offset_map is not None else None,
+                'clip_path': audio_clip_path,
+                'cached': cached
             }
 
         except Exception as e:
@@ -86,4 +132,67 @@ def transcribe_audio_clip(audio_clip_path: str, begin_time: float, end_time: flo
                 'started_at': begin_time,
                 'end_time': end_time,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+
+
+def segment_from_result(result: Dict[str, Any], begin_time: float, end_time: float) -> Dict[str, Any]:
+    """Transcript segment for Step-1; carries the trim offset map when the upload was compacted"""
+    seg = {
+        'start': begin_time,
+        'end': end_time,
+        'text': result['transcript']
+    }
+    if result.get('offset_map'):
+        seg['offset_map'] = result['offset_map']
+    return seg
+
+
+def log_billed_minutes(results: List[Dict[str, Any]]) -> None:
+    """Print how many audio minutes were billed vs. how many silence trimming and the cache saved"""
+    done = [r for r in results if 'error' not in r]
+    source = sum(r.get('audio_duration', 0.0) for r in done) / 60
+    billed = sum(r.get('billed_duration', 0.0) for r in done) / 60
+    trimmed = sum(r.get('trimmed_seconds', 0.0) for r in done) / 60
+    cached = sum(r.get('audio_duration', 0.0) for r in done if r.get('cached')) / 60
+    if source:
+        print(f"📉 ASR billed {billed:.1f} of {source:.1f} audio minutes: saved {trimmed:.1f} min by trimming silence, "
+              f"{cached:.1f} min from the cache (${(source - billed) * 0.0012:.4f})")
+
+
+def log_asr_cache_stats(before: Dict[str, Any] = None) -> None:
+    """Print transcript-cache hits/misses, for this batch when given the counters from its start"""
+    stats = get_asr_cache().stats()
+    if before:
+        hits = stats['hits'] - before['hits']
+        misses = stats['misses'] - before['misses']
+    else:
+        hits, misses = stats['hits'], stats['misses']
+    if hits + misses:
+        print(f"📊 ASR cache: {hits} hits, {misses} misses ({hits / (hits + misses):.0%} hit ratio), "
+              f"{stats['evictions']} evictions this process")
+
+
+def _create_transcription_with_retry(audio_clip_path: str, audio_duration: float, index: int):
+    """Call the ASR endpoint, retrying throttling and server errors up to ASR_MAX_RETRIES times"""
+    attempt = 0
+    while True:
+        # Every attempt counts against the request and audio-minute budgets
+        request_bucket.acquire(1)
+        audio_minutes_bucket.acquire(audio_duration / 60)
+        try:
+            with open(audio_clip_path, "rb") as audio_file_obj:
+                # Retries are handled here so the SDK's own retry loop doesn't stack on top
+                return llm_call(ASR_MODEL, client.with_options(max_retries=0).audio.transcriptions.create,
+                    model=ASR_MODEL,  # Use configured model
+                    file=audio_file_obj,
+                    response_format="text",
+                    temperature=0.001,
+                    prompt=ASR_PROMPT
+                )
+        except Exception as e:
+            if attempt >= Settings.ASR_MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, Settings.ASR_RETRY_BASE_DELAY, Settings.ASR_RETRY_MAX_DELAY, e)
+            print(f"⏳ ASR retry {attempt + 1}/{Settings.ASR_MAX_RETRIES} for clip {index} in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            attempt += 1
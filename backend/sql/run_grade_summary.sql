@@ -0,0 +1,29 @@
+-- Scalar analytics for one run (optionally one worker) in a single call.
+-- Used by Analytics.get_summary() through PostgREST RPC; when the function is missing the
+-- backend falls back to per-metric queries on graded_rows_filtered.
+--
+-- items_initial / items_after are text, and the per-row Python path averages len() of them,
+-- so this averages length() to return the same numbers. Returns exactly the keys of
+-- Analytics._summary_from_queries(), so callers never see a different shape between the two paths.
+
+create or replace function public.run_grade_summary(p_run_id uuid, p_worker_id uuid default null)
+returns table (
+    total_transactions bigint,
+    complete_transactions bigint,
+    avg_items_initial numeric,
+    avg_items_after numeric
+)
+language sql
+stable
+as $$
+select
+    count(*) as total_transactions,
+    coalesce(sum(case when complete_order = 1 then 1 else 0 end), 0) as complete_transactions,
+    coalesce(avg(length(items_initial)), 0) as avg_items_initial,
+    coalesce(avg(length(items_after)), 0) as avg_items_after
+from graded_rows_filtered
+where run_id = p_run_id
+  and (p_worker_id is null or worker_id = p_worker_id)
+$$;
+
+grant execute on function public.run_grade_summary(uuid, uuid) to service_role;
@@ -0,0 +1,33 @@
+import os
+
+# Several services build their OpenAI / Supabase clients at import time. Give them
+# placeholder credentials so unit tests can import those modules without a network.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test")
+# Keep the on-disk caches out of /tmp during tests; cache tests build their own
+os.environ.setdefault("ASR_CACHE_BACKEND", "none")
+os.environ.setdefault("STEP1_CACHE_BACKEND", "none")
+os.environ.setdefault("STEP2_PROMPT_CACHE_DIR", "")
+
+import sys
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture(autouse=True)
+def fresh_llm_controllers():
+    """Concurrency controllers are process-wide; don't let one test's throttling slow the next"""
+    from utils.llm_dispatch import reset_controllers
+    reset_controllers()
+    yield
+    reset_controllers()
+
+
+@pytest.fixture(autouse=True)
+def fresh_reference_cache():
+    """Supa's reference-lookup cache is process-wide; each test starts empty"""
+    from services.ref_cache import reset_caches
+    reset_caches()
+    yield
+    reset_caches()
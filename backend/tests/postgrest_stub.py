@@ -0,0 +1,149 @@
+"""
+In-process stand-in for the subset of PostgREST the backend uses, for write-path tests and
+benchmarks: upserts (on_conflict / primary key, Prefer return=, select= projection) and
+selects with eq./in. filters, and RPC calls to handlers registered in `rpc`. Latency and
+failures can be injected per request.
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from unittest.mock import patch
+
+
+def _project(row, select):
+    if not select or select == "*":
+        return dict(row)
+    return {c: row.get(c) for c in select.split(",")}
+
+
+class PostgrestStub:
+
+    def __init__(self, latency: float = 0.0, per_row: float = 0.0):
+        self.latency = latency
+        self.per_row = per_row
+        self.fail_next = 0
+        self.tables = {}
+        self.rpc = {}  # function name -> callable(params) returning the response body
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=None):
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _parse(self):
+                url = urlparse(self.path)
+                return url.path.rstrip("/").split("/")[-1], {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+            def do_POST(self):
+                table, params = self._parse()
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if "/rpc/" in self.path:
+                    handler = stub.rpc.get(table)
+                    with stub._lock:
+                        stub.requests.append({"method": "RPC", "table": table})
+                    if handler is None:
+                        self._reply(404, {"code": "PGRST202", "message": f"Could not find the function public.{table}"})
+                    else:
+                        self._reply(200, handler(json.loads(raw or b"{}")))
+                    return
+                rows = json.loads(raw or b"[]")
+                rows = rows if isinstance(rows, list) else [rows]
+                status, body = stub._upsert(table, rows, params, self.headers.get("Prefer", ""), len(raw))
+                self._reply(status, body)
+
+            def do_GET(self):
+                table, params = self._parse()
+                self._reply(200, stub._select(table, params))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _upsert(self, table, rows, params, prefer, size):
+        with self._lock:
+            entry = {"method": "POST", "table": table, "rows": len(rows), "bytes": size,
+                     "select": params.get("select"), "response_bytes": 0}
+            self.requests.append(entry)
+            fail = self.fail_next > 0
+            self.fail_next -= fail
+        time.sleep(self.latency + self.per_row * len(rows))
+        if fail:
+            return 503, {"message": "injected failure"}
+        key = params.get("on_conflict") or "id"
+        with self._lock:
+            stored = self.tables.setdefault(table, {})
+            out = []
+            for row in rows:
+                pk = row.get(key)
+                if pk is None:
+                    pk = f"auto-{len(stored) + 1}"
+                    row = {**row, key: pk}
+                merged = {**stored.get(pk, {}), **row}
+                stored[pk] = merged
+                out.append(merged)
+        body = [_project(r, params.get("select")) for r in out] if "return=representation" in prefer else None
+        entry["response_bytes"] = len(json.dumps(body)) if body is not None else 0
+        return 201, body
+
+    def _select(self, table, params):
+        with self._lock:
+            self.requests.append({"method": "GET", "table": table, "select": params.get("select")})
+            rows = list(self.tables.get(table, {}).values())
+        for col, cond in params.items():
+            if col in ("select", "limit", "order", "offset"):
+                continue
+            op, _, value = cond.partition(".")
+            if op == "eq":
+                rows = [r for r in rows if str(r.get(col)) == value]
+            elif op == "in":
+                values = {v.strip('"') for v in value.strip("()").split(",")}
+                rows = [r for r in rows if str(r.get(col)) in values]
+        if "limit" in params:
+            rows = rows[:int(params["limit"])]
+        return [_project(r, params.get("select")) for r in rows]
+
+    def rows(self, table):
+        with self._lock:
+            return list(self.tables.get(table, {}).values())
+
+    def writes(self, table):
+        return [r for r in self.requests if r["method"] == "POST" and r["table"] == table]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@contextmanager
+def serving(latency: float = 0.0, per_row: float = 0.0):
+    """Run a stub and point the process's pooled Supabase client at it"""
+    from services import supabase_pool
+    stub = PostgrestStub(latency, per_row).start()
+    try:
+        with patch.object(supabase_pool.Settings, "SUPABASE_URL", stub.url), \
+             patch.object(supabase_pool.Settings, "SUPABASE_SERVICE_KEY", "stub-service-key"), \
+             patch.object(supabase_pool.Settings, "SUPABASE_HTTP2", False):
+            supabase_pool.reset_client()
+            yield stub
+    finally:
+        supabase_pool.reset_client()
+        stub.stop()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test suite for the content-addressed ASR transcript cache
+"""
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import soundfile as sf
+from unittest.mock import patch
+from services import transcribe
+from services.asr_cache import ASRCache, SQLiteASRCache, NullASRCache, clip_cache_key, set_asr_cache
+
+
+def write_clip(path, seed, seconds=1.0, sr=8000):
+    audio = np.random.default_rng(seed).uniform(-0.5, 0.5, int(seconds * sr))
+    sf.write(path, audio, sr, subtype="PCM_16")
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteASRCache(path=str(tmp_path / "asr.sqlite3"), ttl_seconds=3600, max_bytes=10 ** 6)
+    set_asr_cache(cache)
+    yield cache
+    set_asr_cache(None)
+
+
+class TestClipCacheKey:
+
+    def test_same_samples_in_different_files_share_a_key(self, tmp_path):
+        a = write_clip(str(tmp_path / "a.wav"), seed=1)
+        b = str(tmp_path / "b.flac")
+        sf.write(b, sf.read(a, dtype="int16")[0], 8000, subtype="PCM_16")
+        assert clip_cache_key(a, "m", "p") == clip_cache_key(b, "m", "p")
+
+    def test_key_changes_with_audio_model_and_prompt(self, tmp_path):
+        a = write_clip(str(tmp_path / "a.wav"), seed=1)
+        b = write_clip(str(tmp_path / "b.wav"), seed=2)
+        base = clip_cache_key(a, "m", "p")
+        assert clip_cache_key(b, "m", "p") != base
+        assert clip_cache_key(a, "other-model", "p") != base
+        assert clip_cache_key(a, "m", "other prompt") != base
+
+
+class TestSQLiteASRCache:
+
+    def test_round_trip_and_counters(self, cache):
+        assert cache.get("k") is None
+        cache.set("k", "Operator: hello")
+        assert cache.get("k") == "Operator: hello"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 1)
+
+    def test_expired_entries_are_misses(self, tmp_path):
+        cache = SQLiteASRCache(path=str(tmp_path / "ttl.sqlite3"), ttl_seconds=0.05, max_bytes=10 ** 6)
+        cache.set("k", "text")
+        time.sleep(0.1)
+        assert cache.get("k") is None
+        assert cache.entry_count() == 0
+
+    def test_size_limit_evicts_least_recently_used(self, tmp_path):
+        cache = SQLiteASRCache(path=str(tmp_path / "lru.sqlite3"), ttl_seconds=0, max_bytes=25)
+        cache.set("a", "x" * 10)
+        cache.set("b", "y" * 10)
+        assert cache.get("a") is not None  # a is now more recent than b
+        cache.set("c", "z" * 10)
+        assert cache.get("b") is None
+        assert cache.get("a") == "x" * 10
+        assert cache.get("c") == "z" * 10
+        assert cache.stats()["evictions"] == 1
+
+    def test_shared_between_instances(self, cache):
+        cache.set("k", "text")
+        assert SQLiteASRCache(path=cache.path).get("k") == "text"
+
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class GetOnly(ASRCache):
+            def _get(self, key):
+                return None
+
+        with pytest.raises(TypeError):
+            GetOnly()
+        with pytest.raises(TypeError):
+            ASRCache()
+
+
+class TestTranscribeUsesCache:
+
+    def test_second_run_skips_the_api(self, cache, tmp_path):
+        clip = write_clip(str(tmp_path / "clip.wav"), seed=3)
+        with patch.object(transcribe, "_create_transcription_with_retry", return_value="Customer: a blizzard") as api:
+            first = transcribe.transcribe_audio_clip(clip, 0.0, 1.0, 0)
+            second = transcribe.transcribe_audio_clip(clip, 0.0, 1.0, 0)
+        assert api.call_count == 1
+        assert first["transcript"] == second["transcript"] == "Customer: a blizzard"
+        assert (first["cached"], second["cached"]) == (False, True)
+        assert second["audio_price"] == 0.0
+
+    def test_failed_transcription_is_not_cached(self, cache, tmp_path):
+        clip = write_clip(str(tmp_path / "clip.wav"), seed=4)
+        with patch.object(transcribe, "_create_transcription_with_retry", side_effect=RuntimeError("down")):
+            assert "error" in transcribe.transcribe_audio_clip(clip, 0.0, 1.0, 0)
+        assert cache.entry_count() == 0
+
+    def test_null_backend_always_calls_the_api(self, tmp_path):
+        set_asr_cache(NullASRCache())
+        clip = write_clip(str(tmp_path / "clip.wav"), seed=5)
+        try:
+            with patch.object(transcribe, "_create_transcription_with_retry", return_value="text") as api:
+                transcribe.transcribe_audio_clip(clip, 0.0, 1.0, 0)
+                transcribe.transcribe_audio_clip(clip, 0.0, 1.0, 0)
+        finally:
+            set_asr_cache(None)
+        assert api.call_count == 2
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test suite for the 16 kHz mono upload encoding used for transcription
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import soundfile as sf
+from unittest.mock import patch
+from services import transcribe
+from services.asr_encoding import (encode_for_asr, downmix_resample, asr_encoding_tag, compact_silence,
+                                   OffsetMap, ASR_SAMPLE_RATE)
+
+
+@pytest.fixture
+def archive_clip(tmp_path):
+    """Stereo 44.1 kHz MP3, the way create_audio_subclips writes clips"""
+    sr = 44100
+    t = np.arange(sr * 5) / sr
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t)
+    path = str(tmp_path / "loc_2025_10_10_10_00_00.mp3")
+    sf.write(path, np.stack([tone, 0.5 * tone], axis=1), sr)
+    return path
+
+
+class TestEncodeForASR:
+
+    @pytest.mark.parametrize("fmt", ["mp3", "opus", "flac"])
+    def test_upload_copy_is_mono_16k_and_smaller(self, archive_clip, fmt):
+        before = open(archive_clip, "rb").read()
+        path, is_temp, _ = encode_for_asr(archive_clip, fmt)
+        try:
+            assert is_temp and path != archive_clip
+            info = sf.info(path)
+            assert (info.samplerate, info.channels) == (ASR_SAMPLE_RATE, 1)
+            assert abs(info.duration - 5.0) < 0.1
+            if fmt != "flac":
+                assert os.path.getsize(path) < len(before)
+        finally:
+            os.remove(path)
+        assert open(archive_clip, "rb").read() == before  # archive clip untouched
+
+    def test_source_uploads_the_archive_clip(self, archive_clip):
+        assert encode_for_asr(archive_clip, "source") == (archive_clip, False, None)
+
+    def test_unreadable_clip_falls_back_to_original(self, tmp_path):
+        bogus = str(tmp_path / "broken.mp3")
+        open(bogus, "wb").write(b"not audio")
+        assert encode_for_asr(bogus, "mp3") == (bogus, False, None)
+        assert os.listdir(tmp_path) == ["broken.mp3"]
+
+    def test_downmix_resample_preserves_tone(self):
+        sr = 48000
+        t = np.arange(sr) / sr
+        tone = np.sin(2 * np.pi * 1000 * t).astype(np.float32)
+        out = downmix_resample(np.stack([tone, tone], axis=1), sr)
+        assert out.dtype == np.float32 and len(out) == ASR_SAMPLE_RATE
+        peak_hz = np.argmax(np.abs(np.fft.rfft(out))) * ASR_SAMPLE_RATE / len(out)
+        assert abs(peak_hz - 1000) < 2
+
+    def test_encoding_is_part_of_the_cache_key(self):
+        assert asr_encoding_tag("mp3") != asr_encoding_tag("source")
+
+
+def speech_with_pauses(sr=ASR_SAMPLE_RATE):
+    """5s silence, 2s speech, 6s pause, 3s speech, 5s silence"""
+    rng = np.random.default_rng(0)
+    layout = [(5, 0), (2, 1), (6, 0), (3, 1), (5, 0)]
+    return np.concatenate([rng.uniform(-0.3, 0.3, s * sr) if voiced else np.zeros(s * sr)
+                           for s, voiced in layout]).astype(np.float32)
+
+
+class TestCompactSilence:
+
+    def test_trims_ends_and_shortens_pauses(self):
+        sr = ASR_SAMPLE_RATE
+        audio = speech_with_pauses()
+        out, offsets = compact_silence(audio, sr, threshold=0.002, pad=0.25, max_gap=1.0)
+        # 2s + 3s of speech, 0.25s padding either side of each burst, pause cut to 1s
+        assert abs(len(out) / sr - (2.5 + 1.0 + 3.5)) < 0.05
+        assert abs(offsets.removed - (21 - len(out) / sr)) < 1e-6
+        # Every kept sample is where the offset map says it came from
+        for start, source_start, length in offsets.segments:
+            lo, n = int(round(start * sr)), int(round(length * sr))
+            src = int(round(source_start * sr))
+            assert np.array_equal(out[lo:lo + n], audio[src:src + n])
+
+    def test_offset_map_points_back_to_source_seconds(self):
+        _, offsets = compact_silence(speech_with_pauses(), ASR_SAMPLE_RATE, threshold=0.002, pad=0.25, max_gap=1.0)
+        assert abs(offsets.to_source(0.25) - 5.0) < 0.03       # first word
+        assert abs(offsets.to_source(2.5 + 1.0 + 0.25) - 13.0) < 0.05  # second burst starts at 13s
+        assert offsets.to_source(offsets.duration) <= offsets.source_duration
+
+    def test_silent_clip_is_left_alone(self):
+        audio = np.zeros(ASR_SAMPLE_RATE * 3, dtype=np.float32)
+        out, offsets = compact_silence(audio, ASR_SAMPLE_RATE, threshold=0.002)
+        assert len(out) == len(audio) and offsets.removed == 0.0
+
+    def test_offset_map_identity_for_single_segment(self):
+        offsets = OffsetMap([(0.0, 0.0, 10.0)], 10.0)
+        assert offsets.to_source(4.2) == 4.2 and offsets.duration == 10.0
+
+
+class TestTranscribeUploadsEncodedClip:
+
+    def test_encoded_copy_uploaded_then_removed(self, archive_clip):
+        uploaded = {}
+
+        def fake_create(path, duration, index):
+            uploaded["info"] = sf.info(path)
+            uploaded["path"] = path
+            return "Operator: welcome to Dairy Queen"
+
+        with patch.object(transcribe, "_create_transcription_with_retry", side_effect=fake_create), \
+             patch.object(transcribe.Settings, "ASR_UPLOAD_FORMAT", "mp3"):
+            result = transcribe.transcribe_audio_clip(archive_clip, 0.0, 5.0, 0)
+
+        assert result["transcript"] == "Operator: welcome to Dairy Queen"
+        assert abs(result["audio_duration"] - 5.0) < 0.1
+        assert (uploaded["info"].samplerate, uploaded["info"].channels) == (ASR_SAMPLE_RATE, 1)
+        assert not os.path.exists(uploaded["path"])
+        assert os.listdir(os.path.dirname(archive_clip)) == [os.path.basename(archive_clip)]
+
+    def test_billing_uses_trimmed_duration(self, tmp_path):
+        clip = str(tmp_path / "padded.mp3")
+        sf.write(clip, speech_with_pauses(44100), 44100)
+
+        with patch.object(transcribe, "_create_transcription_with_retry", return_value="text"), \
+             patch.object(transcribe.Settings, "ASR_UPLOAD_FORMAT", "mp3"), \
+             patch.object(transcribe.Settings, "ASR_TRIM_SILENCE", True):
+            result = transcribe.transcribe_audio_clip(clip, 100.0, 121.0, 0)
+
+        assert result["billed_duration"] < 8 < 20 < result["audio_duration"]
+        assert abs(result["trimmed_seconds"] - (result["audio_duration"] - result["billed_duration"])) < 1e-6
+        assert abs(result["audio_price"] - result["billed_duration"] * 0.0012 / 60) < 1e-12
+        seg = transcribe.segment_from_result(result, 100.0, 121.0)
+        assert seg["offset_map"] == result["offset_map"]
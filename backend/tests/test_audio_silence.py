@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test suite for the vectorized silence detection in AudioTransactionProcessor
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import soundfile as sf
+from services.audio import AudioTransactionProcessor
+
+
+def reference_detect_silence(processor, chunk_data, chunk_start_time, sr, prev_state):
+    """The original per-window while loop, kept here as the ground truth"""
+    chunk_begin, chunk_end = [], []
+    interval_samples = int(processor.SILENCE_INTERVAL * sr)
+    if len(chunk_data) < interval_samples:
+        return chunk_begin, chunk_end, prev_state
+    index = 0
+    current_state = prev_state
+    while index + interval_samples < len(chunk_data):
+        interval_avg = float(np.average(chunk_data[index:index + interval_samples]))
+        current_time = chunk_start_time + (index / sr)
+        if interval_avg == 0.0:
+            if current_state == 1:
+                chunk_end.append(current_time)
+                current_state = 0
+        else:
+            if current_state == 0:
+                chunk_begin.append(current_time)
+                current_state = 1
+        index += interval_samples
+    return chunk_begin, chunk_end, current_state
+
+
+def make_signal(rng, sr, seconds, channels=1):
+    """Silence with randomly placed bursts of noise, like a drive-thru recording"""
+    n = int(sr * seconds)
+    shape = (n,) if channels == 1 else (n, channels)
+    data = np.zeros(shape)
+    for _ in range(rng.integers(1, 12)):
+        start = rng.integers(0, n)
+        length = rng.integers(1, sr * 20)
+        data[start:start + length] = rng.normal(0, 0.1, size=data[start:start + length].shape)
+    return data
+
+
+class TestVectorizedSilenceDetection:
+    """Vectorized engine must reproduce the original loop exactly"""
+
+    def setup_method(self):
+        self.processor = AudioTransactionProcessor(silence_mode="mean")
+        self.sr = 100  # small sample rate keeps the windows cheap
+
+    @pytest.mark.parametrize("seed", range(20))
+    @pytest.mark.parametrize("channels", [1, 2])
+    def test_matches_reference_loop(self, seed, channels):
+        rng = np.random.default_rng(seed)
+        seconds = float(rng.integers(1, 300)) + rng.random()
+        data = make_signal(rng, self.sr, seconds, channels)
+        start = float(rng.integers(0, 3600))
+        for prev_state in (0, 1):
+            expected = reference_detect_silence(self.processor, data, start, self.sr, prev_state)
+            actual = self.processor._detect_silence_in_chunk(data, start, self.sr, prev_state)
+            assert actual == expected
+
+    def test_state_carries_across_chunks(self):
+        rng = np.random.default_rng(7)
+        data = make_signal(rng, self.sr, 1500)
+        chunk = 300 * self.sr
+        expected_state = actual_state = 0
+        expected_all, actual_all = ([], []), ([], [])
+        for offset in range(0, len(data), chunk):
+            part = data[offset:offset + chunk]
+            eb, ee, expected_state = reference_detect_silence(self.processor, part, offset / self.sr, self.sr, expected_state)
+            ab, ae, actual_state = self.processor._detect_silence_in_chunk(part, offset / self.sr, self.sr, actual_state)
+            expected_all[0].extend(eb); expected_all[1].extend(ee)
+            actual_all[0].extend(ab); actual_all[1].extend(ae)
+        assert actual_all == expected_all
+        assert actual_state == expected_state
+
+    def test_short_and_exact_length_chunks(self):
+        interval = self.processor.SILENCE_INTERVAL * self.sr
+        for length in (interval - 1, interval, interval + 1):
+            data = np.ones(length)
+            for prev_state in (0, 1):
+                assert self.processor._detect_silence_in_chunk(data, 0.0, self.sr, prev_state) == \
+                    reference_detect_silence(self.processor, data, 0.0, self.sr, prev_state)
+
+    def test_rms_mode_treats_low_energy_as_silence(self):
+        processor = AudioTransactionProcessor(silence_mode="rms", rms_threshold=0.01)
+        interval = processor.SILENCE_INTERVAL * self.sr
+        hiss = np.full(interval, 0.001)
+        speech = np.full(interval, 0.5)
+        data = np.concatenate([hiss, speech, speech, hiss, hiss])
+        begin, end, state = processor._detect_silence_in_chunk(data, 0.0, self.sr, 0)
+        assert begin == [7.0]
+        assert end == [21.0]
+        assert state == 0
+
+        # the exact-zero test never sees the hiss as silence
+        begin, end, state = self.processor._detect_silence_in_chunk(data, 0.0, self.sr, 0)
+        assert begin == [0.0]
+        assert end == []
+        assert state == 1
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            AudioTransactionProcessor(silence_mode="peak")
+
+
+class TestStreamingClipExtraction:
+    """create_audio_subclips decodes once and must cut the same clips as seek-per-clip extraction"""
+
+    def setup_method(self):
+        self.processor = AudioTransactionProcessor(silence_mode="mean")
+        self.sr = 8000
+        # keep the clips lossless so their samples can be compared exactly
+        self.processor._generate_clip_filename = lambda location_id, audio_path, begin, index: f"{location_id}_{index:03d}.wav"
+
+    def _scan_boundaries(self, audio_path):
+        """Boundaries from the original two-pass approach (scan, then seek per clip)"""
+        trans_begin, trans_end, prev_state, current_time = [], [], 0, 0.0
+        with sf.SoundFile(audio_path) as f:
+            sr, total_frames = f.samplerate, f.frames
+            duration = total_frames / sr
+            while current_time < duration:
+                start = int(current_time * sr)
+                end = min(int((current_time + 300) * sr), total_frames)
+                if end - start <= 0:
+                    break
+                f.seek(start)
+                b, e, prev_state = self.processor._detect_silence_in_chunk(f.read(end - start), current_time, sr, prev_state)
+                trans_begin.extend(b)
+                trans_end.extend(e)
+                current_time += 300
+        if len(trans_begin) != len(trans_end):
+            trans_end.append(duration)
+        return trans_begin, trans_end
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_matches_seek_per_clip_extraction(self, tmp_path, seed):
+        rng = np.random.default_rng(seed)
+        data = make_signal(rng, self.sr, 900 + rng.integers(0, 100), channels=2)
+        # make sure one transaction straddles a chunk border and one runs to the end of the file
+        data[int(295 * self.sr):int(310 * self.sr)] = 0.25
+        data[-int(9 * self.sr):] = 0.25
+        audio_path = str(tmp_path / "audio_2025-10-10_10-00-02.wav")
+        sf.write(audio_path, data, self.sr)
+
+        paths, begin, end, reg_begin, reg_end = self.processor.create_audio_subclips(
+            audio_path, "loc", str(tmp_path / "clips"), "audio_2025-10-10_10-00-02.mp3"
+        )
+
+        expected_begin, expected_end = self._scan_boundaries(audio_path)
+        assert begin == expected_begin
+        assert end == expected_end
+        assert len(paths) == len(begin) == len(reg_begin) == len(reg_end)
+        assert reg_begin[0] == self.processor._convert_timestamp_to_hhmmss(begin[0], "audio_2025-10-10_10-00-02.mp3")
+
+        for i, path in enumerate(paths):
+            assert path
+            reference = str(tmp_path / f"reference_{i}.wav")
+            self.processor._extract_audio_segment_soundfile(audio_path, reference, begin[i], end[i], self.sr)
+            streamed, _ = sf.read(path)
+            expected, _ = sf.read(reference)
+            np.testing.assert_array_equal(streamed, expected)
+
+
+class TestParallelSilenceScan:
+    """Sharded process-pool scan must stitch back into exactly the serial result"""
+
+    def setup_method(self):
+        self.sr = 400
+        self.serial = AudioTransactionProcessor(silence_mode="mean", workers=1)
+        self.serial.CHUNK_DURATION = 30  # many small chunks so every shard edge gets exercised
+        self.serial._generate_clip_filename = lambda location_id, audio_path, begin, index: f"{location_id}_{index:03d}.wav"
+
+    def _parallel(self, workers):
+        processor = AudioTransactionProcessor(silence_mode="mean", workers=workers)
+        processor.CHUNK_DURATION = self.serial.CHUNK_DURATION
+        processor._generate_clip_filename = self.serial._generate_clip_filename
+        return processor
+
+    @pytest.mark.parametrize("seed", range(8))
+    def test_parallel_matches_serial(self, tmp_path, seed):
+        rng = np.random.default_rng(100 + seed)
+        data = make_signal(rng, self.sr, 200 + rng.integers(0, 400))
+        # force activity across some shard edges
+        for edge in rng.integers(1, 6, size=2) * self.serial.CHUNK_DURATION:
+            data[int((edge - 10) * self.sr):int((edge + 10) * self.sr)] = 0.5
+        audio_path = str(tmp_path / "audio_2025-10-10_10-00-02.wav")
+        sf.write(audio_path, data, self.sr)
+
+        serial = self.serial.create_audio_subclips(audio_path, "serial", str(tmp_path / "serial"))
+        for workers in (2, 3, 7):
+            parallel = self._parallel(workers).create_audio_subclips(audio_path, "serial", str(tmp_path / f"parallel{workers}"))
+            assert parallel[1:] == serial[1:]
+            assert [os.path.basename(p) for p in parallel[0]] == [os.path.basename(p) for p in serial[0]]
+
+    def test_stitch_adds_transition_only_when_state_changes(self):
+        shards = [
+            {"begin": [], "end": [7.0], "first_time": 0.0, "first_state": 1, "last_state": 0},
+            {"begin": [], "end": [], "first_time": None, "first_state": None, "last_state": None},
+            {"begin": [], "end": [], "first_time": 300.0, "first_state": 0, "last_state": 0},
+            {"begin": [], "end": [607.0], "first_time": 600.0, "first_state": 1, "last_state": 0},
+        ]
+        # first_state 1 from silence opens a transaction, first_state 0 from silence is a no-op
+        assert AudioTransactionProcessor._stitch_shards(shards) == ([0.0, 600.0], [7.0, 607.0])
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Test suite for Batch-API grading, end to end against a local fake batch server
+"""
+
+import sys
+import os
+import re
+import json
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+from openai import OpenAI
+from services import grader, batch_grading
+
+
+def answer_for(transcript):
+    n = transcript.count("burger")
+    return {"1": f"[{n}]", "2": n, "3": n, "33": f"feedback {n}"}
+
+
+class FakeBatchServer:
+    """Just enough of /v1/files and /v1/batches for the grading flow.
+
+    A batch moves validating → in_progress → completed over `polls_to_complete` retrieves;
+    ids in `error_ids` come back as per-request errors.
+    """
+
+    def __init__(self, polls_to_complete=2, error_ids=(), final_status="completed"):
+        self.polls_to_complete = polls_to_complete
+        self.error_ids = set(error_ids)
+        self.final_status = final_status
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, obj, status=200):
+                payload = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server.lock:
+                    if self.path == "/v1/files":
+                        lines = re.findall(rb'^\{"custom_id".*$', body, re.M)
+                        file_id = f"file-{len(server.files)}"
+                        server.files[file_id] = b"\n".join(lines) + b"\n"
+                        return self._json({"id": file_id, "object": "file", "bytes": len(body), "created_at": 0,
+                                           "filename": "input.jsonl", "purpose": "batch", "status": "processed"})
+                    if self.path == "/v1/batches":
+                        req = json.loads(body)
+                        batch_id = f"batch-{len(server.batches)}"
+                        server.batches[batch_id] = {"id": batch_id, "object": "batch", "endpoint": req["endpoint"],
+                                                    "input_file_id": req["input_file_id"], "completion_window": "24h",
+                                                    "status": "validating", "created_at": 0, "polls": 0,
+                                                    "output_file_id": None, "error_file_id": None}
+                        return self._json(server._public(batch_id))
+                self._json({"error": {"message": "not found"}}, 404)
+
+            def do_GET(self):
+                with server.lock:
+                    m = re.match(r"^/v1/batches/([^/]+)$", self.path)
+                    if m:
+                        return self._json(server._advance(m.group(1)))
+                    m = re.match(r"^/v1/files/([^/]+)/content$", self.path)
+                    if m:
+                        payload = server.files[m.group(1)]
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/octet-stream")
+                        self.send_header("Content-Length", str(len(payload)))
+                        self.end_headers()
+                        return self.wfile.write(payload)
+                self._json({"error": {"message": "not found"}}, 404)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _public(self, batch_id):
+        return {k: v for k, v in self.batches[batch_id].items() if k != "polls"}
+
+    def _advance(self, batch_id):
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        if batch["status"] not in batch_grading.TERMINAL_STATUSES:
+            batch["status"] = "in_progress"
+            if batch["polls"] >= self.polls_to_complete:
+                batch["status"] = self.final_status
+                batch["output_file_id"] = self._run(batch["input_file_id"])
+        return self._public(batch_id)
+
+    def _run(self, input_file_id):
+        out = []
+        for line in self.files[input_file_id].splitlines():
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            custom_id = req["custom_id"]
+            if custom_id in self.error_ids:
+                out.append({"id": f"r-{custom_id}", "custom_id": custom_id, "response": None,
+                            "error": {"code": "server_error", "message": "boom"}})
+                continue
+            prompt = req["body"]["input"][0]["content"][0]["text"]
+            transcript = prompt.split("Process this transcript:\n", 1)[1]
+            out.append({"id": f"r-{custom_id}", "custom_id": custom_id, "error": None, "response": {
+                "status_code": 200,
+                "body": {"output": [{"type": "reasoning", "summary": []},
+                                    {"type": "message", "content": [{"type": "output_text",
+                                                                     "text": json.dumps(answer_for(transcript))}]}],
+                         "usage": {"input_tokens": 20000, "output_tokens": 2000}}}})
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = ("\n".join(json.dumps(o) for o in out) + "\n").encode()
+        return file_id
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeDB:
+    def __init__(self, fail_after=None):
+        self.upserts = []
+        self.fail_after = fail_after
+
+    def upsert_grades(self, grades):
+        if self.fail_after is not None and len(self.upserts) >= self.fail_after:
+            raise ConnectionError("worker killed")
+        self.upserts.append([g["transaction_id"] for g in grades])
+
+    @property
+    def upserted_ids(self):
+        return [tx_id for batch in self.upserts for tx_id in batch]
+
+
+class Crash(Exception):
+    pass
+
+
+def make_transactions(n):
+    return [{"id": f"tx-{i}", "meta": {"text": f"Customer: {'burger ' * (i % 3)}please #{i}"}} for i in range(n)]
+
+
+def single_call(prompt, testing, effort="high"):
+    transcript = prompt.split("Process this transcript:\n", 1)[1]
+    text = SimpleNamespace(text=json.dumps(answer_for(transcript)))
+    return SimpleNamespace(output=[None, SimpleNamespace(content=[text])],
+                           usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+
+@pytest.fixture
+def env(tmp_path):
+    def run(server, db, transactions, sleep=None, **settings):
+        fake_client = OpenAI(base_url=server.url, api_key="test-key")
+        patches = [
+            patch.object(grader, "client", fake_client),
+            patch.object(grader, "db", db),
+            patch.object(grader, "build_step2_prompt", return_value="MENU PROMPT"),
+            patch.object(grader, "_step2_request", side_effect=single_call),
+            patch.object(batch_grading.Settings, "STEP2_BATCH_POLL_BASE_SECONDS", 0.0),
+            patch.object(batch_grading.Settings, "STEP2_BATCH_STATE_DIR", str(tmp_path)),
+            patch.object(batch_grading.time, "sleep", sleep or (lambda s: None)),
+            patch("builtins.print"),
+        ] + [patch.object(batch_grading.Settings, k, v) for k, v in settings.items()]
+        for p in patches:
+            p.start()
+        try:
+            return grader.grade_transactions(transactions, "loc-1", mode="batch")
+        finally:
+            for p in reversed(patches):
+                p.stop()
+    return run
+
+
+class TestBatchGrading:
+
+    def test_end_to_end_matches_online_grading(self, env, tmp_path):
+        txs = make_transactions(7)
+        db = FakeDB()
+        with FakeBatchServer(polls_to_complete=3) as server:
+            graded = env(server, db, txs, STEP2_BATCH_UPSERT_EVERY=3)
+        assert sorted(g["transaction_id"] for g in graded) == sorted(tx["id"] for tx in txs)
+        by_id = {g["transaction_id"]: g for g in graded}
+        for tx in txs:
+            assert by_id[tx["id"]]["details"] == grader.map_step2_to_grade_cols(answer_for(tx["meta"]["text"]), tx["meta"])
+        # streamed ingestion upserts in groups of 3, not one big write at the end
+        assert [len(u) for u in db.upserts] == [3, 3, 1]
+        assert len(server.files) == 2 and len(server.batches) == 1
+        assert os.listdir(tmp_path) == []  # state cleared once everything is ingested
+
+    def test_batch_price_is_used(self, env):
+        with FakeBatchServer() as server:
+            graded = env(server, FakeDB(), make_transactions(1))
+        expected = grader.calculate_gpt_price_batch(
+            SimpleNamespace(usage=SimpleNamespace(input_tokens=20000, output_tokens=2000)))
+        assert graded[0]["gpt_price"] == pytest.approx(expected)
+
+    def test_resumes_same_batch_after_restart_while_polling(self, env):
+        txs = make_transactions(5)
+        db = FakeDB()
+
+        def crash(_):
+            raise Crash()
+
+        with FakeBatchServer(polls_to_complete=3) as server:
+            with pytest.raises(Crash):
+                env(server, db, txs, sleep=crash)
+            assert len(server.batches) == 1
+            graded = env(server, db, txs)
+        assert len(server.batches) == 1 and len(server.files) == 2  # no second upload or batch
+        assert sorted(db.upserted_ids) == sorted(tx["id"] for tx in txs)
+        assert len(graded) == 5
+
+    def test_resumes_mid_ingest_without_rewriting_grades(self, env):
+        txs = make_transactions(6)
+        with FakeBatchServer() as server:
+            crashing_db = FakeDB(fail_after=1)
+            with pytest.raises(ConnectionError):
+                env(server, crashing_db, txs, STEP2_BATCH_UPSERT_EVERY=2)
+            db = FakeDB()
+            graded = env(server, db, txs, STEP2_BATCH_UPSERT_EVERY=2)
+        first = crashing_db.upserted_ids
+        assert len(first) == 2
+        assert sorted(first + db.upserted_ids) == sorted(tx["id"] for tx in txs)
+        assert not set(first) & set(db.upserted_ids)
+        assert len(graded) == 4
+
+    def test_failed_requests_fall_back_to_online(self, env):
+        txs = make_transactions(4) + [{"id": "tx-empty", "meta": {"text": ""}}]
+        db = FakeDB()
+        with FakeBatchServer(error_ids={"tx-1"}) as server, \
+             patch.object(grader, "_grade_transaction", wraps=grader._grade_transaction) as online:
+            graded = env(server, db, txs)
+        assert sorted(call.args[0]["id"] for call in online.call_args_list) == ["tx-1", "tx-empty"]
+        assert sorted(db.upserted_ids) == sorted(tx["id"] for tx in txs)
+        assert len(graded) == 5
+
+    def test_expired_batch_grades_everything_online(self, env):
+        txs = make_transactions(3)
+        db = FakeDB()
+        with FakeBatchServer(final_status="expired") as server:
+            server._run = lambda input_file_id: None  # expired before producing output
+            graded = env(server, db, txs)
+        assert sorted(g["transaction_id"] for g in graded) == sorted(tx["id"] for tx in txs)
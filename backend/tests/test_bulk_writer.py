@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test suite for chunked, parallel bulk writes (transactions go through a PostgREST stand-in)
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+import pytest
+from services.bulk_writer import BulkWriter, chunk_rows, row_bytes
+from services.database import Supa
+from postgrest_stub import serving
+
+
+def transactions(n):
+    return [{"run_id": "run-1", "started_at": f"2025-10-10T10:{i // 60 % 60:02d}:{i % 60:02d}Z",
+             "kind": "order", "meta": {"text": f"Operator: welcome {i}. Customer: a burger please.", "i": i}}
+            for i in range(n)]
+
+
+class TestChunking:
+
+    def test_chunks_respect_row_and_byte_limits(self):
+        rows = transactions(100)
+        by_rows = chunk_rows(rows, max_rows=30, max_bytes=10 ** 9)
+        assert [len(c) for c in by_rows] == [30, 30, 30, 10]
+        limit = row_bytes(rows[0]) * 5 + 2
+        by_bytes = chunk_rows(rows, max_rows=1000, max_bytes=limit)
+        assert all(sum(row_bytes(r) for r in c) + 2 <= limit for c in by_bytes)
+        assert [r for c in by_bytes for r in c] == rows
+
+    def test_oversized_row_goes_alone(self):
+        rows = [{"x": "a" * 100}, {"x": "b"}]
+        assert chunk_rows(rows, max_rows=10, max_bytes=50) == [[rows[0]], [rows[1]]]
+
+
+class TestBulkWriter:
+
+    def test_parallel_and_ordered(self):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def write(chunk):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return [{"i": r["i"]} for r in chunk]
+
+        out = BulkWriter(write, max_rows=10, parallelism=3).write([{"i": i} for i in range(95)])
+        assert [r["i"] for r in out] == list(range(95))
+        assert peak[0] == 3
+
+    def test_only_failed_chunks_are_retried(self):
+        calls = []
+
+        def write(chunk):
+            calls.append(chunk[0]["i"])
+            if chunk[0]["i"] == 20 and calls.count(20) == 1:
+                raise ConnectionError("reset")
+            return chunk
+
+        writer = BulkWriter(write, max_rows=10, parallelism=2, retries=2, backoff=0)
+        assert len(writer.write([{"i": i} for i in range(40)])) == 40
+        assert sorted(calls) == [0, 10, 20, 20, 30]
+        assert writer.last_stats["requests"] == 5
+
+    def test_raises_when_retries_run_out(self):
+        def write(chunk):
+            raise ConnectionError("down")
+
+        with pytest.raises(RuntimeError, match="1 of 1 rows chunks failed"):
+            BulkWriter(write, retries=1, backoff=0).write([{"i": 1}])
+
+
+class TestUpsertTransactions:
+
+    def test_returns_rows_with_ids_and_fetches_only_ids(self):
+        with serving() as stub:
+            inserted = Supa().upsert_transactions(transactions(250), max_rows=100)
+            assert len(inserted) == 250
+            assert [tx["meta"]["i"] for tx in inserted] == list(range(250))
+            assert {tx["id"] for tx in inserted} == {row["id"] for row in stub.rows("transactions")}
+            assert {w["select"] for w in stub.writes("transactions")} == {"id"}
+            assert sorted(w["rows"] for w in stub.writes("transactions")) == [50, 100, 100]
+            assert len(stub.rows("transactions")) == 250
+
+    def test_retried_chunk_does_not_duplicate_rows(self):
+        with serving() as stub:
+            stub.fail_next = 1
+            inserted = Supa().upsert_transactions(transactions(120), max_rows=50)
+            assert len(inserted) == 120
+            assert len(stub.rows("transactions")) == 120
+            assert len(stub.writes("transactions")) == 4
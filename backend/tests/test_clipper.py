@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test suite for transaction clip cutting: clips cut from the PCM cache must be encoded exactly
+like the ffmpeg path, since both end up archived in Google Drive
+"""
+
+import sys
+import os
+import json
+import shutil
+import subprocess
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import soundfile as sf
+from unittest.mock import patch
+from services.pcm_cache import PCMCache
+
+with patch("services.gdrive.GoogleDriveClient"):
+    from services import clipper
+
+needs_ffmpeg = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                  reason="ffmpeg/ffprobe not installed")
+
+
+def write_recording(path, sr=22050, seconds=20, channels=1):
+    t = np.arange(sr * seconds) / sr
+    data = np.repeat((0.3 * np.sin(2 * np.pi * 440 * t))[:, None], channels, axis=1).astype(np.float32)
+    sf.write(path, data, sr, subtype="PCM_16")
+
+
+def probe(path):
+    out = subprocess.check_output([
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate,channels,bit_rate:format=format_name",
+        "-of", "json", path,
+    ])
+    info = json.loads(out)
+    stream = info["streams"][0]
+    return {"codec": stream["codec_name"], "sample_rate": stream["sample_rate"], "channels": stream["channels"],
+            "bit_rate": stream.get("bit_rate"), "format": info["format"]["format_name"]}
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+def test_pcm_cut_uses_clip_encoding(tmp_path, dtype):
+    source = str(tmp_path / "day.wav")
+    write_recording(source)
+    pcm = PCMCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9, dtype=dtype).get_or_decode(source, "day", "x")
+
+    with patch.object(clipper.subprocess, "run") as run:
+        clipper.pcm_cut(pcm, str(tmp_path / "a.mp3"), 2.0, 5.0)
+        clipper.ffmpeg_cut(source, str(tmp_path / "b.mp3"), 2.0, 5.0)
+
+    (pcm_cmd,), pcm_kwargs = run.call_args_list[0]
+    (file_cmd,), _ = run.call_args_list[1]
+    encode = len(clipper.CLIP_ENCODE_ARGS) + 1
+    assert pcm_cmd[-encode:-1] == file_cmd[-encode:-1] == clipper.CLIP_ENCODE_ARGS
+    assert pcm_cmd[pcm_cmd.index("-f") + 1] == clipper.PCM_INPUT_FORMATS[dtype]
+    # The piped samples are exactly the requested window
+    assert len(pcm_kwargs["input"]) == 3 * 22050 * np.dtype(dtype).itemsize
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+def test_pcm_and_ffmpeg_clips_match_on_ffprobe(tmp_path, dtype):
+    source = str(tmp_path / "day.wav")
+    write_recording(source)
+    pcm = PCMCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9, dtype=dtype).get_or_decode(source, "day", "x")
+
+    from_pcm, from_file = str(tmp_path / "pcm.mp3"), str(tmp_path / "file.mp3")
+    clipper.pcm_cut(pcm, from_pcm, 2.0, 7.5)
+    clipper.ffmpeg_cut(source, from_file, 2.0, 7.5)
+
+    assert probe(from_pcm) == probe(from_file)
+    assert probe(from_pcm)["codec"] == "mp3"
+    assert clipper.get_audio_duration_seconds(from_pcm) == pytest.approx(clipper.get_audio_duration_seconds(from_file), abs=0.05)
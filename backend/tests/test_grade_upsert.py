@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test suite for the flattened, single-write grade upsert (against a PostgREST stand-in)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+from unittest.mock import patch
+from services.database import Supa
+from services.grade_writer import flatten_grades
+from postgrest_stub import serving
+
+
+def grades(n, **details):
+    return [{"transaction_id": f"tx-{i}", "transcript": f"customer orders burger {i}", "gpt_price": 0.001,
+             "details": {"num_items_initial": 1, "num_items_after": 1, "feedback": "ok", **details}}
+            for i in range(n)]
+
+
+class TestFlattenGrades:
+
+    def test_spreads_details_and_drops_blob(self):
+        row = flatten_grades(grades(1))[0]
+        assert "details" not in row
+        assert row["transaction_id"] == "tx-0" and row["num_items_initial"] == 1 and row["gpt_price"] == 0.001
+
+    def test_last_grade_per_transaction_wins(self):
+        rows = flatten_grades(grades(2) + grades(1, feedback="regraded"))
+        assert len(rows) == 2
+        assert {r["transaction_id"]: r["feedback"] for r in rows} == {"tx-0": "regraded", "tx-1": "ok"}
+
+
+class TestUpsertGrades:
+
+    def test_each_row_written_once_without_response_body(self):
+        with serving() as stub:
+            Supa().upsert_grades(grades(120), max_rows=50)
+            writes = stub.writes("grades")
+            assert sorted(w["rows"] for w in writes) == [20, 50, 50]
+            assert all(w["response_bytes"] == 0 for w in writes)
+            stored = stub.rows("grades")
+            assert len(stored) == 120
+            assert all("details" not in row for row in stored)
+
+    def test_conflict_only_touches_carried_columns(self):
+        with serving() as stub:
+            db = Supa()
+            db.upsert_grades(grades(3, score=7))
+            db.upsert_grades([{"transaction_id": "tx-1", "transcript": "fixed", "gpt_price": 0.002,
+                               "details": {"feedback": "regraded"}}] + grades(1))
+            rows = {r["transaction_id"]: r for r in stub.rows("grades")}
+            assert rows["tx-1"]["feedback"] == "regraded"
+            assert rows["tx-1"]["score"] == 7  # not nulled by the narrower row
+            assert rows["tx-0"]["score"] == 7
+            assert len(stub.writes("grades")) == 3  # one request per column set
+
+    def test_byte_bounded_chunks(self):
+        with serving() as stub:
+            big = grades(40, reasoning_summary="x" * 2000)
+            Supa().upsert_grades(big)
+            assert len(stub.rows("grades")) == 40
+        with serving() as stub:
+            with patch("services.bulk_writer.Settings.BULK_WRITE_MAX_BYTES", 20000):
+                Supa().upsert_grades(big)
+            assert all(w["bytes"] <= 20000 for w in stub.writes("grades"))
+            assert len(stub.writes("grades")) > 1
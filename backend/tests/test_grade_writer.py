@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test suite for write-behind grade persistence and skip-on-rerun grading
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from services import grader
+from services.grade_writer import GradeWriter
+
+
+class FakeGradesTable:
+    """Stands in for Supa's grades table: upsert by transaction_id, optional failures"""
+
+    def __init__(self, fail_times=0):
+        self.rows = {}
+        self.batches = []
+        self.fail_times = fail_times
+        self.lock = threading.Lock()
+
+    def upsert_grades(self, grades):
+        with self.lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError("db unavailable")
+            self.batches.append(len(grades))
+            for g in grades:
+                self.rows[str(g["transaction_id"])] = g
+
+    def get_graded_transaction_ids(self, ids):
+        with self.lock:
+            return {str(i) for i in ids if str(i) in self.rows}
+
+
+def transactions(n):
+    return [{"id": f"tx-{i}", "meta": {"text": f"customer orders burger {i}"}} for i in range(n)]
+
+
+def fake_response(text="{}"):
+    usage = SimpleNamespace(input_tokens=100, output_tokens=10)
+    return SimpleNamespace(output=[None, SimpleNamespace(content=[SimpleNamespace(text=text)])], usage=usage)
+
+
+class TestGradeWriter:
+
+    def test_flushes_in_batches_and_on_close(self):
+        table = FakeGradesTable()
+        with patch("builtins.print"):
+            with GradeWriter(table.upsert_grades, flush_every=4, flush_seconds=60) as writer:
+                for i in range(10):
+                    writer.add({"transaction_id": i})
+        assert table.batches == [4, 4, 2]
+        assert writer.written == 10
+
+    def test_time_based_flush(self):
+        table = FakeGradesTable()
+        with patch("builtins.print"):
+            writer = GradeWriter(table.upsert_grades, flush_every=100, flush_seconds=0.05)
+            writer.add({"transaction_id": 1})
+            time.sleep(0.3)
+            assert table.batches == [1]
+            writer.close()
+
+    def test_retries_failed_flush(self):
+        table = FakeGradesTable(fail_times=2)
+        with patch("builtins.print"), patch("services.grade_writer.time.sleep"):
+            with GradeWriter(table.upsert_grades, flush_every=3, retries=3) as writer:
+                for i in range(3):
+                    writer.add({"transaction_id": i})
+        assert len(table.rows) == 3
+
+    def test_raises_when_rows_cannot_be_written(self):
+        table = FakeGradesTable(fail_times=10 ** 6)
+        with patch("builtins.print"), patch("services.grade_writer.time.sleep"):
+            writer = GradeWriter(table.upsert_grades, flush_every=2, retries=1)
+            writer.add({"transaction_id": 1})
+            with pytest.raises(RuntimeError):
+                writer.close()
+
+    def test_bounded_buffer_applies_backpressure(self):
+        release = threading.Event()
+
+        def slow_upsert(rows):
+            release.wait()
+
+        with patch("builtins.print"):
+            writer = GradeWriter(slow_upsert, flush_every=1, max_buffer=2)
+            added = []
+            t = threading.Thread(target=lambda: [writer.add({"transaction_id": i}) or added.append(i) for i in range(10)])
+            t.start()
+            time.sleep(0.2)
+            assert len(added) < 10
+            release.set()
+            t.join()
+            writer.close()
+        assert len(added) == 10
+
+
+class TestPersistentGrading:
+
+    def run(self, table, txs, calls, crash_on=None, force=False):
+        def step2(prompt, testing, effort="high"):
+            with lock:
+                calls.append(prompt)
+            if crash_on and crash_on in prompt:
+                raise KeyboardInterrupt  # the worker dying mid-run
+            return fake_response('{"1": "[1]", "2": 1}')
+
+        lock = threading.Lock()
+        with patch.object(grader, "db", table), \
+             patch.object(grader, "build_step2_prompt", return_value="MENU"), \
+             patch.object(grader, "_step2_request", side_effect=step2), \
+             patch.object(grader.settings, "STEP2_PACKED", False), \
+             patch("services.grade_writer.Settings.GRADE_FLUSH_EVERY", 3), \
+             patch("builtins.print"):
+            return grader.grade_transactions(txs, "loc-1", persist=True, force=force)
+
+    def test_grades_are_written_as_they_complete(self):
+        table = FakeGradesTable()
+        grades = self.run(table, transactions(10), [])
+        assert len(grades) == 10
+        assert set(table.rows) == {f"tx-{i}" for i in range(10)}
+        assert max(table.batches) <= 3
+
+    def test_rerun_only_grades_missing_transactions(self):
+        table = FakeGradesTable()
+        txs = transactions(12)
+        for tx in txs[:8]:
+            table.rows[tx["id"]] = {"transaction_id": tx["id"]}
+        calls = []
+        grades = self.run(table, txs, calls)
+        assert len(calls) == 4
+        assert sorted(g["transaction_id"] for g in grades) == sorted(tx["id"] for tx in txs[8:])
+        assert len(table.rows) == 12
+
+    def test_crash_keeps_completed_grades(self):
+        table = FakeGradesTable()
+        txs = transactions(6)
+        with patch.object(grader, "pool_size", return_value=1):
+            with pytest.raises(KeyboardInterrupt):
+                self.run(table, txs, [], crash_on="burger 5")
+        assert len(table.rows) == 5
+        calls = []
+        self.run(table, txs, calls)
+        assert len(calls) == 1
+        assert len(table.rows) == 6
+
+    def test_forced_regrade_ignores_existing_rows(self):
+        table = FakeGradesTable()
+        txs = transactions(6)
+        for tx in txs:
+            table.rows[tx["id"]] = {"transaction_id": tx["id"], "stale": True}
+        calls = []
+        grades = self.run(table, txs, calls, force=True)
+        assert len(calls) == 6 and len(grades) == 6
+        assert not any(row.get("stale") for row in table.rows.values())
+
+    def test_failed_step2_call_is_retried_on_rerun(self):
+        table = FakeGradesTable()
+        txs = transactions(4)
+
+        def step2(prompt, testing, effort="high"):
+            if "burger 2" in prompt and not retried:
+                raise ConnectionError("api unavailable")
+            return fake_response('{"1": "[1]", "2": 1}')
+
+        def run():
+            with patch.object(grader, "db", table), \
+                 patch.object(grader, "build_step2_prompt", return_value="MENU"), \
+                 patch.object(grader, "_step2_request", side_effect=step2), \
+                 patch.object(grader.settings, "STEP2_PACKED", False), \
+                 patch("builtins.print"):
+                return grader.grade_transactions(txs, "loc-1", persist=True)
+
+        retried = False
+        first = run()
+        assert len(first) == 3
+        assert "tx-2" not in table.rows
+
+        retried = True
+        second = run()
+        assert [g["transaction_id"] for g in second] == ["tx-2"]
+        assert set(table.rows) == {f"tx-{i}" for i in range(4)}
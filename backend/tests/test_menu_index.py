@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test suite for the menu item-name index used to prune Step-2 prompts
+"""
+
+import sys
+import os
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from services.menu_index import MenuIndex, tokenize, referenced_item_ids, measure_recall
+from services.prompt_cache import Step2PromptCache
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'prompts')
+
+
+def load(name):
+    with open(os.path.join(PROMPTS_DIR, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def menu():
+    return load("items.json"), load("meals.json")
+
+
+@pytest.fixture(scope="module")
+def index(menu):
+    items, meals = menu
+    return MenuIndex(items, meals, [])
+
+
+def ids_of(rows):
+    return {str(r["Item ID"]) for kind in rows for r in rows[kind]}
+
+
+class TestTokenize:
+
+    def test_sizes_and_brackets_are_ignored(self):
+        assert tokenize("Blizzard [Sizes: Small, Medium, Large]") == {"blizzard"}
+
+    def test_plurals_spellings_and_compounds(self):
+        assert tokenize("two chilli dogs") >= {"chili", "dog"}
+        assert tokenize("cheeseburger") >= {"cheese", "burger"}
+        assert tokenize("Fries") == tokenize("fry")
+        assert "drink" in tokenize("a large coke")
+
+
+class TestMenuIndex:
+
+    def test_shortlists_mentioned_items(self, index):
+        rows = index.shortlist("can I get a medium oreo blizzard and a large fries")
+        names = [r["Item"] for r in rows["items"]]
+        assert any(n.startswith("Blizzard [") for n in names)
+        assert any(n.startswith("Fries") for n in names)
+        assert len(rows["items"]) + len(rows["meals"]) < 59 + 28
+
+    def test_includes_upsell_neighbours(self, index):
+        # Nobody said "drink", but the chili dog rows offer one in their upselling chance
+        rows = index.shortlist("two chili dogs please")
+        assert "5" in ids_of(rows)  # Drink
+
+    def test_all_size_variants_of_an_item_id(self, index, menu):
+        items, _ = menu
+        rows = index.shortlist("a sundae")
+        sundae_ids = {str(r["Item ID"]) for r in items if r["Item"].lower().startswith("sundae")}
+        assert sundae_ids <= ids_of(rows)
+
+    def test_no_match_falls_back(self, index):
+        assert index.shortlist("hello, welcome, please pull forward") is None
+
+    def test_round_trips_through_dict(self, index, menu):
+        items, meals = menu
+        restored = MenuIndex.from_dict(json.loads(json.dumps(index.to_dict())), items, meals, [])
+        transcript = "one flamethrower meal and a dilly bar"
+        assert restored.shortlist(transcript) == index.shortlist(transcript)
+
+
+class TestRecall:
+
+    def test_referenced_item_ids(self):
+        grade = {"items_initial": "['22_2', '24_1']", "upsize_offered": "['24_3']", "num_items_initial": 2}
+        assert referenced_item_ids(grade) == {"22", "24"}
+
+    def test_measure_recall(self, index):
+        samples = [
+            ("medium blizzard and fries", {"22", "25"}),
+            ("hello there", {"1"}),                     # no match → full menu
+            ("just a dilly bar", {"12", "22"}),        # blizzard never mentioned
+        ]
+        stats = measure_recall(index, samples)
+        assert stats["fallback_rate"] == pytest.approx(1 / 3)
+        assert stats["transaction_recall"] == pytest.approx(2 / 3)
+        assert 0 < stats["avg_rows_kept"] < 1
+
+
+class TestPrunedPrompt:
+
+    def test_pruned_prompt_lists_only_shortlisted_rows(self, menu, tmp_path):
+        items, meals = menu
+        cache = Step2PromptCache(lambda loc: ([], [], [], items, meals), lambda loc: "s1",
+                                 cache_dir=str(tmp_path), check_seconds=0)
+        full = cache.get("loc")
+        with patch("builtins.print"):
+            pruned = cache.pruned("loc", "a medium blizzard please")
+        assert len(pruned) < len(full)
+        assert "Blizzard [Sizes" in pruned
+        assert "Flamethrower" not in pruned
+        assert cache.pruned("loc", "hello") is None
+
+        # The index is persisted with the entry, so another process reuses it
+        other = Step2PromptCache(lambda loc: pytest.fail("menu reloaded"), lambda loc: "s1",
+                                 cache_dir=str(tmp_path), check_seconds=0)
+        assert other.pruned("loc", "a medium blizzard please") == pruned
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test suite for packed (multi-transaction) Step-2 grading
+"""
+
+import sys
+import os
+import re
+import json
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from services import grader
+
+
+def answer_for(transcript):
+    """Deterministic Step-2 answer derived from the transcript"""
+    n = transcript.count("burger")
+    return {"1": f"[{n}]", "2": n, "3": n, "6": min(n, 1), "33": f"feedback for {transcript[:12]}"}
+
+
+def fake_response(text):
+    usage = SimpleNamespace(input_tokens=10000, output_tokens=1000)
+    return SimpleNamespace(output=[None, SimpleNamespace(content=[SimpleNamespace(text=text)])], usage=usage)
+
+
+class FakeStep2:
+    """Answers single and packed prompts; can drop or corrupt packed answers"""
+
+    def __init__(self, drop_ids=(), corrupt_packed=False):
+        self.drop_ids = set(drop_ids)
+        self.corrupt_packed = corrupt_packed
+        self.single_calls = 0
+        self.packed_sizes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, testing, effort="high"):
+        if "### Transaction" in prompt:
+            blocks = re.findall(r"### Transaction (\S+)\n(.*?)\n(?=### Transaction|\Z)", prompt, re.S)
+            with self.lock:
+                self.packed_sizes.append(len(blocks))
+            if self.corrupt_packed:
+                return fake_response('{"oops": ')
+            return fake_response(json.dumps({tx_id: answer_for(text) for tx_id, text in blocks
+                                             if tx_id not in self.drop_ids}))
+        with self.lock:
+            self.single_calls += 1
+        transcript = prompt.split("Process this transcript:\n", 1)[1]
+        return fake_response(json.dumps(answer_for(transcript)))
+
+
+def make_transactions(n):
+    return [{"id": f"tx-{i}", "meta": {"text": f"Customer: {'burger ' * (i % 3)}and a drink #{i}", "complete_order": 1}}
+            for i in range(n)]
+
+
+def run(transactions, fake, **kwargs):
+    with patch.object(grader, "build_step2_prompt", return_value="MENU PROMPT"), \
+         patch.object(grader, "_step2_request", side_effect=fake), \
+         patch("builtins.print"):
+        return grader.grade_transactions(transactions, "loc-1", **kwargs)
+
+
+class TestPackTransactions:
+
+    def test_respects_max_per_pack(self):
+        packs = grader.pack_transactions(make_transactions(10), token_budget=10 ** 6, max_per_pack=4)
+        assert [len(p) for p in packs] == [4, 4, 2]
+
+    def test_k_shrinks_as_transcripts_grow(self):
+        short = [{"id": i, "meta": {"text": "x" * 400}} for i in range(8)]    # ~100 tokens each
+        long = [{"id": i, "meta": {"text": "x" * 8000}} for i in range(8)]   # ~2000 tokens each
+        with patch.object(grader.settings, "STEP2_PACK_TOKENS_PER_TX", 100):
+            assert len(grader.pack_transactions(short, token_budget=4000, max_per_pack=8)) == 1
+            assert max(len(p) for p in grader.pack_transactions(long, token_budget=4000, max_per_pack=8)) == 1
+
+    def test_oversized_transcript_gets_its_own_pack(self):
+        txs = [{"id": 1, "meta": {"text": "x" * 100000}}, {"id": 2, "meta": {"text": "hi"}}]
+        assert [len(p) for p in grader.pack_transactions(txs, token_budget=1000, max_per_pack=8)] == [1, 1]
+
+
+class TestPackedGrading:
+
+    def test_matches_single_transaction_grading(self):
+        txs = make_transactions(10)
+        single = run(txs, FakeStep2(), packed=False)
+        fake = FakeStep2()
+        packed = run(txs, fake, packed=True)
+        assert [g["transaction_id"] for g in packed] == [tx["id"] for tx in txs]
+        assert [g["details"] for g in packed] == [g["details"] for g in single]
+        assert fake.single_calls == 0 and sum(fake.packed_sizes) == 10 and len(fake.packed_sizes) < 10
+
+    def test_missing_answers_fall_back_individually(self):
+        fake = FakeStep2(drop_ids={"tx-3", "tx-7"})
+        graded = run(make_transactions(10), fake, packed=True)
+        assert fake.single_calls == 2
+        assert len(graded) == 10
+        assert graded[3]["details"]["num_items_initial"] == 0  # "burger " * 0
+        assert graded[7]["details"]["feedback"].startswith("feedback for")
+
+    def test_unparseable_pack_regrades_only_that_pack(self):
+        fake = FakeStep2(corrupt_packed=True)
+        graded = run(make_transactions(5), fake, packed=True)
+        assert fake.single_calls == 5
+        assert all(g["details"]["feedback"].startswith("feedback for") for g in graded)
+
+    def test_empty_transcripts_skip_the_model(self):
+        txs = make_transactions(4) + [{"id": "tx-empty", "meta": {"text": "  "}}]
+        fake = FakeStep2()
+        graded = run(txs, fake, packed=True)
+        assert graded[-1]["transaction_id"] == "tx-empty" and graded[-1]["gpt_price"] == 0.0
+        assert sum(fake.packed_sizes) == 4
+
+    def test_pack_cost_is_split_across_its_transactions(self):
+        fake = FakeStep2()
+        with patch.object(grader.settings, "STEP2_PACK_MAX_TX", 8):
+            graded = run(make_transactions(4), fake, packed=True)
+        assert fake.packed_sizes == [4]
+        one_request = grader.calculate_gpt_price(fake_response("{}"))
+        assert sum(g["gpt_price"] for g in graded) == pytest.approx(one_request)
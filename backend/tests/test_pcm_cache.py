@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test suite for the decoded-PCM memory-mapped cache
+"""
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import soundfile as sf
+from services.pcm_cache import PCMCache
+from services.audio import AudioTransactionProcessor
+
+
+def write_recording(path, sr=8000, seconds=60, channels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    data = np.zeros((sr * seconds, channels), dtype=np.float32)
+    for start in (5, 30):
+        data[start * sr:(start + 12) * sr] = rng.normal(0, 0.1, size=(12 * sr, channels))
+    sf.write(path, data, sr, subtype="FLOAT")
+    return data
+
+
+class TestPCMCache:
+
+    def test_decode_once_and_zero_copy_views(self, tmp_path):
+        source = str(tmp_path / "audio.wav")
+        data = write_recording(source)
+        cache = PCMCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9)
+
+        pcm = cache.get_or_decode(source, "file1", "md5a")
+        np.testing.assert_array_equal(np.asarray(pcm.data), data)
+        view = pcm.view(5.0, 6.0)
+        assert view.shape == (pcm.samplerate, 2)
+        assert np.shares_memory(view, pcm.data)
+
+        # second lookup is a hit and never touches the source
+        os.remove(source)
+        again = cache.get_or_decode(source, "file1", "md5a")
+        assert again.key == pcm.key
+
+        # a new checksum for the same Drive id is a different entry
+        assert cache.get("file1", "md5b") is None
+
+    def test_reader_matches_soundfile(self, tmp_path):
+        source = str(tmp_path / "audio.wav")
+        write_recording(source, channels=1)
+        pcm = PCMCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9).get_or_decode(source, "mono", "x")
+        with sf.SoundFile(source) as f, pcm.reader() as r:
+            assert (r.samplerate, r.frames, r.channels) == (f.samplerate, f.frames, f.channels)
+            f.seek(1234)
+            r.seek(1234)
+            expected = f.read(5000, dtype="float32")
+            actual = r.read(5000)
+            assert actual.shape == expected.shape
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_lru_eviction(self, tmp_path):
+        cache = PCMCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9)
+        for i in range(3):
+            source = str(tmp_path / f"audio{i}.wav")
+            write_recording(source, seconds=50, seed=i)
+            cache.get_or_decode(source, f"file{i}", "x")
+            time.sleep(0.01)
+        # touch file0 so file1 becomes least recently used
+        cache.get("file0", "x")
+        one_entry = max(e["bytes"] for e in cache.entries())
+        removed = cache.evict(max_bytes=2 * one_entry)
+        assert removed == ["file1_x"]
+        assert {e["key"] for e in cache.entries()} == {"file0_x", "file2_x"}
+
+    def test_segmentation_from_cache_matches_file(self, tmp_path):
+        source = str(tmp_path / "audio_2025-10-10_10-00-02.wav")
+        write_recording(source, seconds=700)
+        pcm = PCMCache(cache_dir=str(tmp_path / "cache"), max_bytes=10 ** 9).get_or_decode(source, "day", "x")
+
+        processor = AudioTransactionProcessor(silence_mode="mean")
+        processor._generate_clip_filename = lambda location_id, audio_path, begin, index: f"{location_id}_{index:03d}.wav"
+        from_file = processor.create_audio_subclips(source, "loc", str(tmp_path / "file"))
+        from_cache = processor.create_audio_subclips(source, "loc", str(tmp_path / "cache_clips"), pcm=pcm)
+        assert from_cache[1:] == from_file[1:]
+        for a, b in zip(from_file[0], from_cache[0]):
+            np.testing.assert_array_equal(sf.read(a)[0], sf.read(b)[0])
+
+    def test_rejects_unknown_dtype(self, tmp_path):
+        with pytest.raises(ValueError):
+            PCMCache(cache_dir=str(tmp_path), dtype="float16")
+
+    def test_int16_cache_scores_rms_like_float(self, tmp_path):
+        source = str(tmp_path / "day.wav")
+        data = write_recording(source, seconds=120)
+        data += np.float32(0.002)  # constant hum: silent under the RMS threshold, never exactly zero
+        sf.write(source, data, 8000, subtype="FLOAT")
+        processor = AudioTransactionProcessor(silence_mode="rms", rms_threshold=0.01)
+        interval = int(processor.SILENCE_INTERVAL * 8000)
+
+        results = []
+        for dtype in ("float32", "int16"):
+            pcm = PCMCache(cache_dir=str(tmp_path / dtype), max_bytes=10 ** 9, dtype=dtype).get_or_decode(source, "day", "x")
+            results.append(processor._silent_windows(pcm.data, interval))
+        np.testing.assert_array_equal(results[0], results[1])
+        assert results[1].any() and not results[1].all()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test suite for the resumable pipeline stage ledger
+"""
+
+import sys
+import os
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from pipeline.ledger import StageLedger, STAGES
+
+
+@pytest.fixture
+def ledger_dir(tmp_path):
+    return str(tmp_path)
+
+
+def finish(ledger, upto):
+    for stage in STAGES[:STAGES.index(upto) + 1]:
+        ledger.complete(stage)
+
+
+class TestStageLedger:
+
+    def test_fresh_ledger_starts_at_download(self, ledger_dir):
+        ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+        assert ledger.first_incomplete() == "download"
+
+    def test_progress_and_artifacts_survive_restart(self, ledger_dir):
+        with patch("builtins.print"):
+            ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+            ledger.complete("download", audio_path="/tmp/a.mp3", gdrive_path="https://drive/x")
+            ledger.complete("init", run_id="run-1", audio_id="audio-1")
+            path = ledger.save_artifact("transcripts", [{"start": 0.0, "end": 5.0, "text": "hi"}])
+            ledger.complete("transcribe", transcripts=path, segment_count=1)
+
+        resumed = StageLedger("loc", "2025-10-08", ledger_dir)
+        assert resumed.first_incomplete() == "split"
+        assert resumed.artifacts("init") == {"run_id": "run-1", "audio_id": "audio-1"}
+        assert resumed.load_artifact("transcripts")[0]["text"] == "hi"
+        assert resumed.artifacts("grade") == {}
+
+    def test_ledgers_are_per_location_and_date(self, ledger_dir):
+        with patch("builtins.print"):
+            StageLedger("loc", "2025-10-08", ledger_dir).complete("download")
+        assert not StageLedger("loc", "2025-10-09", ledger_dir).done("download")
+        assert not StageLedger("other", "2025-10-08", ledger_dir).done("download")
+
+    def test_from_stage_reruns_everything_after(self, ledger_dir):
+        ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+        with patch("builtins.print"):
+            finish(ledger, "complete")
+            ledger.apply_overrides(from_stage="grade")
+        assert ledger.first_incomplete() == "grade"
+        assert [s for s in STAGES if not ledger.done(s)] == ["grade", "analytics", "clip", "complete"]
+
+    def test_force_stage_reruns_only_that_stage(self, ledger_dir):
+        ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+        with patch("builtins.print"):
+            finish(ledger, "complete")
+            ledger.apply_overrides(force_stages=["analytics", "clip"])
+        assert [s for s in STAGES if not ledger.done(s)] == ["analytics", "clip"]
+        assert StageLedger("loc", "2025-10-08", ledger_dir).first_incomplete() == "analytics"
+
+    def test_forced_stages_are_remembered_for_this_invocation(self, ledger_dir):
+        ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+        with patch("builtins.print"):
+            finish(ledger, "complete")
+            ledger.apply_overrides(from_stage="grade")
+        assert "grade" in ledger.forced
+        other = StageLedger("loc", "2025-10-08", ledger_dir)
+        with patch("builtins.print"):
+            finish(other, "complete")
+            other.apply_overrides(force_stages=["analytics"])
+        assert "grade" not in other.forced
+        # A plain resume of a half-finished grade stage isn't a forced one
+        assert "grade" not in StageLedger("loc", "2025-10-08", ledger_dir).forced
+
+    def test_unknown_stage_is_rejected(self, ledger_dir):
+        ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+        with pytest.raises(ValueError):
+            ledger.apply_overrides(from_stage="upload")
+
+    def test_ledger_file_is_valid_json_after_each_write(self, ledger_dir):
+        ledger = StageLedger("loc", "2025-10-08", ledger_dir)
+        with patch("builtins.print"):
+            for stage in STAGES:
+                ledger.complete(stage, n=1)
+                with open(ledger.path) as f:
+                    assert stage in json.load(f)["stages"]
+        assert not [n for n in os.listdir(ledger.dir) if n.startswith(".tmp_")]
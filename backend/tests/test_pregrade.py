@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test suite for the local Step-2 pre-classifier
+"""
+
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from services import grader
+from services.pregrade import skip_reason, evaluate
+
+WAIT = "Operator: Hi, welcome to Dairy Queen, can you pull forward for me?\nCustomer: Sure."
+PICKUP = "Customer: Hi, I have a mobile order for Jessica.\nOperator: Okay, pull around to the window."
+FRAGMENT = "Operator: Thank you.\nCustomer: Yeah."
+ORDER = "Customer: Can I get a medium Oreo blizzard and a large fries?\nOperator: Sure, anything else?"
+PICKUP_PLUS = "Customer: I have a mobile order pickup, and can I also get a small cone?\nOperator: Sure."
+FOOD_ONLY = "Customer: Uh, just the chili dog basket with a coke, thanks.\nOperator: Your total is 8.50."
+
+
+class TestSkipReason:
+
+    @pytest.mark.parametrize("transcript,reason", [
+        ("", "empty"), ("   ", "empty"), (WAIT, "wait_only"), (PICKUP, "mobile_pickup"), (FRAGMENT, "fragment"),
+    ])
+    def test_non_gradable(self, transcript, reason):
+        assert skip_reason(transcript) == reason
+
+    @pytest.mark.parametrize("transcript", [ORDER, PICKUP_PLUS, FOOD_ONLY])
+    def test_orders_go_to_step2(self, transcript):
+        assert skip_reason(transcript) is None
+
+    def test_menu_tokens_count_as_orders(self):
+        transcript = "Customer: One dilly bar.\nOperator: Okay."
+        assert skip_reason(transcript) == "fragment"
+        assert skip_reason(transcript, menu_tokens={"dilly", "bar"}) is None
+
+    def test_evaluate_against_step1_flags(self):
+        samples = [(WAIT, 0), (PICKUP, 0), (ORDER, 1), (FRAGMENT, 1), ("Operator: Hello? Hello?", 0)]
+        stats = evaluate(samples)
+        assert stats["skipped"] == 4
+        assert stats["precision"] == pytest.approx(3 / 4)
+        assert stats["recall"] == pytest.approx(1.0)
+
+
+class TestPreclassifiedGrading:
+
+    def test_skipped_transactions_get_default_rows_without_calls(self):
+        calls = []
+        lock = threading.Lock()
+
+        def step2(prompt, testing, effort="high"):
+            with lock:
+                calls.append(prompt)
+            usage = SimpleNamespace(input_tokens=100, output_tokens=10)
+            return SimpleNamespace(output=[None, SimpleNamespace(content=[SimpleNamespace(text='{"2": 2}')])],
+                                   usage=usage)
+
+        txs = [{"id": f"tx-{i}", "meta": {"text": t, "complete_order": i % 2}}
+               for i, t in enumerate([WAIT, ORDER, PICKUP, FOOD_ONLY])]
+        txs[2]["meta"]["complete_order"] = 1
+        with patch.object(grader, "build_step2_prompt", return_value="MENU PROMPT"), \
+             patch.object(grader, "_step2_request", side_effect=step2), \
+             patch.object(grader, "menu_item_ids", return_value=None), \
+             patch.object(grader.step2_prompts, "menu_index", side_effect=RuntimeError("no db")), \
+             patch.object(grader.settings, "STEP2_PRECLASSIFY", True), \
+             patch("builtins.print"):
+            grades = grader.grade_transactions(txs, "loc-1")
+
+        assert len(calls) == 2
+        by_id = {g["transaction_id"]: g for g in grades}
+        assert set(by_id) == {"tx-0", "tx-1", "tx-2", "tx-3"}
+        for tx_id in ("tx-0", "tx-2"):
+            assert by_id[tx_id]["gpt_price"] == 0.0
+            assert by_id[tx_id]["details"]["issues"].startswith("Not graded")
+            assert by_id[tx_id]["details"]["num_items_initial"] == 0
+        assert by_id["tx-1"]["details"]["num_items_initial"] == 2
+        # Skipping doesn't override Step-1's completeness verdict
+        assert by_id["tx-0"]["details"]["complete_order"] == 0
+        assert by_id["tx-2"]["details"]["complete_order"] == 1
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test suite for the per-location compiled Step-2 prompt cache
+"""
+
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from services.prompt_cache import (Step2PromptCache, compile_step2_prompt, menu_version,
+                                   static_prefix_length)
+
+UPSELLING = [{"Item": "Burger", "Upsell": "Meal"}]
+UPSIZING = [{"Item": "Fries", "Upsize": "Large"}]
+
+
+class FakeMenuDB:
+    """Stands in for Supa: menu rows per location plus the cheap stamp query"""
+
+    def __init__(self):
+        self.menus = {
+            "loc-a": {"items": [{"Item": "Dilly Bar", "Item ID": 1}, {"Item": "Blizzard", "Item ID": 2}],
+                      "meals": [{"Item": "#1 Meal", "Item ID": 10}], "addons": [{"Item": "Oreo", "Item ID": 20}]},
+            "loc-b": {"items": [{"Item": "Cone", "Item ID": 3}],
+                      "meals": [], "addons": []},
+        }
+        self.stamps = {"loc-a": "a1", "loc-b": "b1"}
+        self.loads = 0
+        self.stamp_checks = 0
+
+    def load(self, location_id):
+        self.loads += 1
+        m = self.menus[location_id]
+        return UPSELLING, UPSIZING, list(m["addons"]), list(m["items"]), list(m["meals"])
+
+    def stamp(self, location_id):
+        self.stamp_checks += 1
+        return self.stamps[location_id]
+
+
+@pytest.fixture
+def db():
+    return FakeMenuDB()
+
+
+def make_cache(db, tmp_path, check_seconds=0, max_age=3600):
+    return Step2PromptCache(db.load, db.stamp, cache_dir=str(tmp_path), check_seconds=check_seconds, max_age=max_age)
+
+
+class TestStep2PromptCache:
+
+    def test_menu_loaded_once_while_stamp_is_unchanged(self, db, tmp_path):
+        cache = make_cache(db, tmp_path)
+        first = cache.get("loc-a")
+        for _ in range(5):
+            assert cache.get("loc-a") == first
+        assert db.loads == 1
+        assert cache.rebuilds == 1
+
+    def test_check_interval_skips_even_the_stamp_query(self, db, tmp_path):
+        cache = make_cache(db, tmp_path, check_seconds=60)
+        cache.get("loc-a")
+        cache.get("loc-a")
+        assert db.stamp_checks == 1
+
+    def test_menu_change_recompiles(self, db, tmp_path):
+        cache = make_cache(db, tmp_path)
+        before = cache.get("loc-a")
+        db.menus["loc-a"]["items"].append({"Item": "Choco Dipped Cone XL", "Item ID": 4})
+        db.stamps["loc-a"] = "a2"
+        after = cache.get("loc-a")
+        assert "Choco Dipped Cone XL" in after and "Choco Dipped Cone XL" not in before
+        assert cache.rebuilds == 2
+
+    def test_stamp_change_without_content_change_keeps_prompt(self, db, tmp_path):
+        cache = make_cache(db, tmp_path)
+        before = cache.get("loc-a")
+        db.menus["loc-a"]["items"].reverse()  # same rows, different query order
+        db.stamps["loc-a"] = "a2"
+        assert cache.get("loc-a") == before
+        assert (db.loads, cache.rebuilds) == (2, 1)
+
+    def test_shared_across_processes_through_disk(self, db, tmp_path):
+        make_cache(db, tmp_path).get("loc-a")
+        other = make_cache(db, tmp_path)  # e.g. another gunicorn worker
+        other.get("loc-a")
+        assert db.loads == 1 and other.rebuilds == 0
+
+    def test_invalidate_forces_reload(self, db, tmp_path):
+        cache = make_cache(db, tmp_path, check_seconds=60)
+        cache.get("loc-a")
+        cache.invalidate("loc-a")
+        cache.get("loc-a")
+        assert db.loads == 2
+
+    def test_concurrent_first_use_builds_once(self, db, tmp_path):
+        cache = make_cache(db, tmp_path, check_seconds=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("loc-a"))) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(set(results)) == 1 and db.loads == 1
+
+
+class TestCompiledPrompt:
+
+    def test_static_prefix_is_byte_identical_across_locations(self, db, tmp_path):
+        cache = make_cache(db, tmp_path)
+        a, b = cache.get("loc-a"), cache.get("loc-b")
+        n = static_prefix_length()
+        assert a[:n] == b[:n]
+        assert a[n:] != b[n:]
+        assert "Dilly Bar" not in a[:n]
+        # the shared scenarios are part of the cacheable prefix
+        assert '"Upsize": "Large"' in a[:n]
+
+    def test_row_order_does_not_change_bytes(self):
+        rows = [{"Item": "A", "Item ID": 1}, {"Item": "B", "Item ID": 2}]
+        assert compile_step2_prompt(UPSELLING, UPSIZING, [], rows, []) == \
+            compile_step2_prompt(UPSELLING, UPSIZING, [], rows[::-1], [])
+        assert menu_version(rows, [], []) == menu_version(rows[::-1], [], [])
+
+    def test_all_placeholders_filled(self, db):
+        prompt = compile_step2_prompt(*db.load("loc-a"))
+        assert "<<" not in prompt
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test suite for the read-through reference-lookup cache in Supa
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+import pytest
+from unittest.mock import patch
+from services import ref_cache
+from services.ref_cache import TTLCache
+from services.database import Supa
+from services.prompt_cache import Step2PromptCache
+from postgrest_stub import serving
+
+
+def reads(stub, table):
+    return sum(r["method"] == "GET" and r["table"] == table for r in stub.requests)
+
+
+@pytest.fixture
+def stub():
+    with serving() as stub:
+        stub.tables["locations"] = {"loc-1": {"id": "loc-1", "name": "Main St", "owner_id": "user-1", "org_id": "org-1"}}
+        stub.tables["orgs"] = {"org-1": {"id": "org-1", "name": "Acme"}}
+        stub.tables["runs"] = {"run-1": {"id": "run-1", "location_id": "loc-1"}}
+        stub.tables["items"] = {1: {"item_id": 1, "price": "3.50", "location_id": "loc-1"}}
+        stub.tables["meals"] = {}
+        stub.tables["add_ons"] = {}
+        yield stub
+
+
+class TestTTLCache:
+
+    def test_hits_misses_and_expiry(self):
+        cache = TTLCache("t", ttl=0.05, max_entries=10)
+        loads = []
+        load = lambda: loads.append(1) or "value"
+        assert cache.get_or_load("k", load) == "value"
+        assert cache.get_or_load("k", load) == "value"
+        assert len(loads) == 1
+        time.sleep(0.06)
+        cache.get_or_load("k", load)
+        assert len(loads) == 2
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+        assert stats["hit_ratio"] == pytest.approx(1 / 3, abs=1e-3)
+
+    def test_lru_eviction(self):
+        cache = TTLCache("t", ttl=60, max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, key)
+        cache.get("a")  # b is now least recently used
+        cache.set("c", "c")
+        assert cache.get("b") is ref_cache._MISSING
+        assert cache.get("a") == "a" and cache.get("c") == "c"
+        assert cache.stats()["evictions"] == 1
+
+    def test_none_and_errors_are_not_cached(self):
+        cache = TTLCache("t", ttl=60)
+        assert cache.get_or_load("k", lambda: None) is None
+        with pytest.raises(IndexError):
+            cache.get_or_load("k", lambda: [][0])
+        assert cache.get_or_load("k", lambda: 5) == 5
+        assert cache.stats()["entries"] == 1
+
+    def test_results_are_copies(self):
+        cache = TTLCache("t", ttl=60)
+        cache.get_or_load("k", lambda: {"1": 2.0})["1"] = 99
+        assert cache.get_or_load("k", lambda: None) == {"1": 2.0}
+
+
+class TestSupaCache:
+
+    def test_lookups_hit_the_database_once(self, stub):
+        db = Supa()
+        for _ in range(5):
+            assert db.get_location_name("loc-1") == "Main St"
+            assert db.get_location_from_run("run-1") == "loc-1"
+            assert db.get_org_name("loc-1") == "Acme"
+            assert db.get_items_prices("loc-1") == {"1": 3.5}
+            assert db.get_location_owner("loc-1") == "user-1"
+        assert reads(stub, "locations") == 3  # name, org_id, owner
+        assert reads(stub, "runs") == 1 and reads(stub, "orgs") == 1 and reads(stub, "items") == 1
+        metrics = ref_cache.cache_metrics()
+        assert metrics["items_prices"]["hit_ratio"] == pytest.approx(0.8)
+
+    def test_invalidation_hooks(self, stub):
+        db = Supa()
+        assert db.get_items_prices("loc-1") == {"1": 3.5}
+        stub.tables["items"][1]["price"] = "4.00"
+        assert db.get_items_prices("loc-1") == {"1": 3.5}
+        db.invalidate_menu("loc-1")
+        assert db.get_items_prices("loc-1") == {"1": 4.0}
+
+        assert db.get_location_name("loc-1") == "Main St"
+        stub.tables["locations"]["loc-1"]["name"] = "Elm St"
+        db.invalidate_location("loc-1")
+        assert db.get_location_name("loc-1") == "Elm St"
+
+    def test_missing_rows_are_looked_up_again(self, stub):
+        db = Supa()
+        assert db.get_location_owner("loc-2") is None
+        stub.tables["locations"]["loc-2"] = {"id": "loc-2", "owner_id": "user-2"}
+        assert db.get_location_owner("loc-2") == "user-2"
+
+        assert db.get_org_name("loc-2") is None  # no org_id yet
+        stub.tables["locations"]["loc-2"]["org_id"] = "org-1"
+        assert db.get_org_name("loc-2") == "Acme"
+
+    def test_disabled(self, stub):
+        with patch.object(ref_cache.Settings, "REF_CACHE_ENABLED", False):
+            db = Supa()
+            db.get_location_name("loc-1")
+            db.get_location_name("loc-1")
+        assert reads(stub, "locations") == 2
+
+    def test_concurrent_readers(self, stub):
+        db = Supa()
+        results, errors = [], []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    results.append(db.get_location_from_run("run-1"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors and set(results) == {"loc-1"} and len(results) == 160
+        stats = ref_cache.cache_metrics()["run_location"]
+        assert stats["hits"] + stats["misses"] == 160
+        assert reads(stub, "runs") == stats["misses"] <= 8
+
+
+def test_prompt_cache_reports_menu_changes(tmp_path):
+    menus = {"loc-1": [{"Item": "Cone", "Item ID": 1}]}
+    changed = []
+    cache = Step2PromptCache(lambda loc: ([], [], [], list(menus[loc]), []), lambda loc: str(len(menus[loc])),
+                             cache_dir=str(tmp_path), check_seconds=0, on_menu_change=changed.append)
+    cache.get("loc-1")
+    cache.get("loc-1")
+    assert changed == []
+    menus["loc-1"].append({"Item": "Dilly Bar", "Item ID": 2})
+    cache.get("loc-1")
+    assert changed == ["loc-1"]
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test suite for the server-side run summary (sql/run_grade_summary.sql) and its fallback.
+
+The function body is run on SQLite over the same rows the PostgREST stand-in serves to the
+per-metric queries, and the two must agree.
+"""
+
+import sys
+import os
+import re
+import json
+import sqlite3
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+import pytest
+from unittest.mock import patch
+from services import analytics as analytics_module
+from services.analytics import Analytics
+from postgrest_stub import serving
+
+SQL_PATH = os.path.join(os.path.dirname(__file__), "..", "sql", "run_grade_summary.sql")
+NUM_COLUMNS = [f"num_{kind}_{stat}" for kind in ("upsell", "upsize", "addon")
+               for stat in ("opportunities", "offers", "success")]
+
+
+def graded_rows():
+    rows = []
+    for i in range(23):
+        row = {"transaction_id": f"tx-{i}", "run_id": "run-1" if i < 20 else "run-2",
+               "worker_id": "w1" if i % 3 else "w2", "complete_order": int(i % 4 != 0),
+               "items_initial": "1_2" * (i % 3 + 1), "items_after": "1_2, 5_1" * (i % 2 + 1)}
+        row.update({col: (i * (n + 1)) % 5 for n, col in enumerate(NUM_COLUMNS)})
+        row.update({"upsell_opportunities": json.dumps({"1": ["6_0", "7_2"]}), "upsell_offers": json.dumps({"1": ["6_0"]}),
+                    "upsell_successes": json.dumps({"1": ["6_0"]} if i % 2 else {}), "feedback": "x" * 200})
+        rows.append(row)
+    return rows
+
+
+def sql_summary(rows, run_id, worker_id=None):
+    body = re.search(r"\$\$(.*)\$\$", open(SQL_PATH).read(), re.S).group(1)
+    body = body.replace("p_run_id", ":p_run_id").replace("p_worker_id", ":p_worker_id")
+    conn = sqlite3.connect(":memory:")
+    columns = list(rows[0])
+    conn.execute(f"create table graded_rows_filtered ({', '.join(columns)})")
+    conn.executemany(f"insert into graded_rows_filtered values ({', '.join('?' * len(columns))})",
+                     [[row[c] for c in columns] for row in rows])
+    cursor = conn.execute(body, {"p_run_id": run_id, "p_worker_id": worker_id})
+    return dict(zip([d[0] for d in cursor.description], cursor.fetchone()))
+
+
+@pytest.fixture
+def stub():
+    with serving() as stub:
+        stub.tables["runs"] = {"run-1": {"id": "run-1", "location_id": "loc-1"}}
+        stub.tables["graded_rows_filtered"] = {row["transaction_id"]: row for row in graded_rows()}
+        yield stub
+
+
+@pytest.mark.parametrize("worker_id", [None, "w1"])
+def test_sql_matches_per_metric_queries(stub, worker_id):
+    expected = sql_summary(graded_rows(), "run-1", worker_id)
+    analytics = Analytics("run-1", worker_id)
+    fallback = analytics._summary_from_queries()
+    assert fallback["total_transactions"] == expected["total_transactions"]
+    assert fallback["complete_transactions"] == expected["complete_transactions"]
+    assert fallback["avg_items_initial"] == pytest.approx(expected["avg_items_initial"])
+    assert fallback["avg_items_after"] == pytest.approx(expected["avg_items_after"])
+
+
+def test_rpc_and_fallback_return_same_keys(stub):
+    fallback = Analytics("run-1").get_summary()
+    stub.rpc["run_grade_summary"] = lambda p: [sql_summary(graded_rows(), p["p_run_id"], p["p_worker_id"])]
+    stub.requests.clear()
+    rpc = Analytics("run-1").get_summary()
+    assert [r["method"] for r in stub.requests] == ["RPC"]
+    assert set(rpc) == set(fallback)
+
+
+@pytest.mark.parametrize("worker_id", [None, "w2"])
+def test_analytics_json_same_with_and_without_rpc(stub, worker_id):
+    fallback_json = Analytics("run-1", worker_id).generate_analytics_json()
+    fallback_reads = sum(r["table"] == "graded_rows_filtered" for r in stub.requests)
+
+    stub.rpc["run_grade_summary"] = lambda p: [sql_summary(graded_rows(), p["p_run_id"], p["p_worker_id"])]
+    stub.requests.clear()
+    rpc_json = Analytics("run-1", worker_id).generate_analytics_json()
+    rpc_reads = sum(r["table"] == "graded_rows_filtered" for r in stub.requests)
+
+    assert rpc_json == fallback_json
+    assert rpc_reads == 1  # only the row fetch for item analytics
+    assert fallback_reads > rpc_reads
+
+
+def test_item_analytics_reads_only_the_map_columns(stub):
+    full = Analytics("run-1")
+    with patch.object(analytics_module, "ITEM_ANALYTICS_COLUMNS", ("*",)):
+        expected = full.get_item_analytics()
+    stub.requests.clear()
+    item_performance, revenue_map = Analytics("run-1").get_item_analytics()
+
+    selects = [r["select"] for r in stub.requests if r["table"] == "graded_rows_filtered"]
+    assert selects == [",".join(analytics_module.ITEM_ANALYTICS_COLUMNS)]
+    assert item_performance["1"]["upsell"]["conversions"] == 10
+    assert (item_performance, revenue_map) == expected
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test suite for the Step-1 memo cache and canary reuse in split_into_transactions
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from types import SimpleNamespace
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+from services import step1_cache, transactions
+from services.asr_cache import SQLiteASRCache
+
+STEP1_ANSWER = "1. Transcript: Operator: Hi. Customer: A burger please.\n2. Start Time: 0\n3. End Time: 1"
+
+
+def fake_response(**kwargs):
+    text = SimpleNamespace(text=STEP1_ANSWER)
+    return SimpleNamespace(output=[None, SimpleNamespace(content=[text])])
+
+
+@contextmanager
+def step1_api():
+    """Patch the OpenAI client; yields the responses.create mock behind with_options(max_retries=0)"""
+    client = MagicMock()
+    client.with_options.return_value.responses.create.side_effect = fake_response
+    with patch.object(transactions, "client", client):
+        yield client.with_options.return_value.responses.create
+    for call in client.with_options.call_args_list:
+        assert call.kwargs == {"max_retries": 0}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteASRCache(path=str(tmp_path / "step1.sqlite3"), ttl_seconds=3600, max_bytes=10 ** 6)
+    step1_cache.set_step1_cache(cache)
+    yield cache
+    step1_cache.set_step1_cache(None)
+
+
+def segments(n):
+    return [{"start": i * 60, "end": i * 60 + 60, "text": f"Operator: welcome {i}. Customer: burger."} for i in range(n)]
+
+
+def split(segs):
+    return transactions.split_into_transactions(segs, "2025-10-10", "audio", "run")
+
+
+class TestStep1Cache:
+
+    def test_key_changes_with_transcript_model_and_prompt(self):
+        key = step1_cache.step1_cache_key("hello")
+        assert key == step1_cache.step1_cache_key("hello")
+        assert key != step1_cache.step1_cache_key("hello!")
+        assert key != step1_cache.step1_cache_key("hello", model="other-model")
+        with patch.object(step1_cache.Prompts, "INITIAL_PROMPT", "edited prompt"):
+            assert key != step1_cache.step1_cache_key("hello")
+
+    def test_canary_is_not_sent_twice(self, cache):
+        with step1_api() as create:
+            result = split(segments(4))
+        assert create.call_count == 4
+        assert len(result) == 4
+        started = [tx["started_at"] for tx in result]
+        assert started == sorted(started) and len(set(started)) == 4
+
+    def test_rerun_is_served_from_cache(self, cache, capsys):
+        with step1_api() as create:
+            first = split(segments(3))
+            second = split(segments(3))
+        assert create.call_count == 3
+        assert [tx["started_at"] for tx in first] == [tx["started_at"] for tx in second]
+        assert cache.stats()["hits"] == 3
+        assert "3 hits, 0 misses" in capsys.readouterr().out
+
+    def test_prompt_change_misses(self, cache):
+        with step1_api() as create:
+            split(segments(2))
+            with patch.object(step1_cache.Prompts, "INITIAL_PROMPT", "edited prompt"):
+                split(segments(2))
+        assert create.call_count == 4
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test suite for the pipelined segmentation → ASR → Step-1 mode
+"""
+
+import sys
+import os
+import random
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from services.transcribe import transcribe_segments
+from services.transactions import split_into_transactions
+from pipeline import streaming
+from pipeline.streaming import stream_clips_to_transactions, MeteredQueue
+
+
+CLIPS = [(f"clip_{i}.mp3" if i != 3 else "", 10.0 * i, 10.0 * i + 7) for i in range(12)]
+
+
+class FakeProcessor:
+    """Stands in for AudioTransactionProcessor: emits clips with a small delay between them"""
+
+    def create_audio_subclips(self, audio_path, location_id, output_dir, original_filename=None, pcm=None, on_clip=None):
+        for i, (path, begin, end) in enumerate(CLIPS):
+            time.sleep(0.002)
+            if on_clip:
+                on_clip(i, path, begin, end)
+        paths, begins, ends = zip(*CLIPS)
+        return list(paths), list(begins), list(ends), [], []
+
+
+def fake_transcribe(path, begin, end, index):
+    time.sleep(random.random() * 0.01)
+    if index == 5:
+        return {'index': index, 'transcript': "", 'error': "boom"}
+    return {'index': index, 'transcript': f"text {index}"}
+
+
+def fake_process_segment(seg, date, audio_id, run_id, audio_started_at_iso):
+    time.sleep(random.random() * 0.01)
+    n = int(seg['start']) % 3 + 1  # some segments split into several transactions
+    return [{"run_id": run_id, "meta": {"text": seg['text'], "segment_index": k}} for k in range(n)]
+
+
+class TestStreamingPipeline:
+
+    @patch('services.transactions._process_segment', side_effect=fake_process_segment)
+    @patch('services.transcribe.transcribe_audio_clip', side_effect=fake_transcribe)
+    @patch('pipeline.streaming._process_segment', side_effect=fake_process_segment)
+    @patch('pipeline.streaming.transcribe_audio_clip', side_effect=fake_transcribe)
+    def test_same_output_and_order_as_phased_pipeline(self, *_):
+        paths, begins, ends = map(list, zip(*CLIPS))
+        expected_segments = transcribe_segments(paths, begins, ends)
+        expected_transactions = split_into_transactions(expected_segments, "2025-10-10", "audio", "run", test_first_segment=False)
+
+        with patch.object(streaming.Settings, 'PIPELINE_QUEUE_SIZE', 2), \
+             patch.object(streaming.Settings, 'PIPELINE_ASR_WORKERS', 3), \
+             patch.object(streaming.Settings, 'PIPELINE_STEP1_WORKERS', 4):
+            clips, segments, transactions = stream_clips_to_transactions(
+                FakeProcessor(), "audio.mp3", "loc", "2025-10-10", "audio", "run"
+            )
+
+        assert clips[0] == paths
+        assert segments == expected_segments
+        assert transactions == expected_transactions
+
+    @patch('pipeline.streaming.transcribe_audio_clip', side_effect=RuntimeError("asr down"))
+    def test_stage_errors_are_raised(self, _):
+        with pytest.raises(RuntimeError, match="asr down"):
+            stream_clips_to_transactions(FakeProcessor(), "audio.mp3", "loc", "2025-10-10", "audio", "run")
+
+    def test_asr_stage_defaults_to_asr_in_flight_budget(self):
+        with patch.object(streaming.Settings, 'ASR_MAX_IN_FLIGHT', 6):
+            with patch.object(streaming.Settings, 'PIPELINE_ASR_WORKERS', 0):
+                assert streaming.asr_workers() == 6
+            with patch.object(streaming.Settings, 'PIPELINE_ASR_WORKERS', 2):
+                assert streaming.asr_workers() == 2
+
+    def test_metered_queue_tracks_depth(self):
+        q = MeteredQueue("q", 4)
+        for i in range(3):
+            q.put(i)
+        q.get()
+        q.put(3)
+        stats = q.stats()
+        assert stats["items"] == 4
+        assert stats["max_depth"] == 3
+        assert stats["capacity"] == 4
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test suite for the per-process pooled Supabase client
+"""
+
+import sys
+import os
+import json
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from services import supabase_pool
+from services.database import Supa
+
+
+class PostgrestStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = json.dumps([{"id": "run-1"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PostgrestStub)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    with patch.object(supabase_pool.Settings, "SUPABASE_URL", url), \
+         patch.object(supabase_pool.Settings, "SUPABASE_HTTP2", False):
+        supabase_pool.reset_client()
+        yield url
+        supabase_pool.reset_client()
+    httpd.shutdown()
+
+
+class TestSupabasePool:
+
+    def test_supa_instances_share_one_client(self, server):
+        assert Supa().client is Supa().client
+        assert Supa().client is supabase_pool.get_client()
+
+    def test_explicit_client_overrides_pool(self, server):
+        marker = object()
+        assert Supa(client=marker).client is marker
+
+    def test_new_process_gets_new_client(self, server):
+        parent = supabase_pool.get_client()
+        with patch.object(supabase_pool.os, "getpid", return_value=-1):
+            child = supabase_pool.get_client()
+        assert child is not parent
+
+    def test_requests_reuse_pooled_connection(self, server):
+        db = Supa()
+        for _ in range(5):
+            assert db.client.table("runs").select("id").execute().data == [{"id": "run-1"}]
+        metrics = supabase_pool.pool_metrics()
+        assert metrics["requests"] == 5
+        assert metrics["errors"] == 0
+        assert metrics["in_flight"] == 0
+        assert metrics["connections"] == 1
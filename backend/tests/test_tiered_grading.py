@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test suite for tiered (low → high reasoning effort) Step-2 grading
+"""
+
+import sys
+import os
+import json
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from services import grader
+from services.tiered_grading import check_invariants, TierStats
+
+
+def consistent(n_items=2):
+    """A Step-2 answer in the template's numbering (fields 1-28) that satisfies every hard rule:
+    burger + small drink, fries upsold, drink not upsized, sundae topping not offered"""
+    return {"1": ["1_1", "5_2"], "2": n_items,
+            "3": 2, "4": ["6_0", "5_2"], "4_base": ["1_1"], "5": 1, "6": ["6_0"], "6_num_base_offered": 1,
+            "7": ["6_0"], "8": ["1_1"], "8_base_sold": ["1_1"], "9": 1, "10": 0,
+            "11": 1, "11_base": ["5_2"], "12": ["5_2"], "13": ["5_2"], "14": 0, "14_base": 0,
+            "14_num_base_offered": 0, "15": 0, "16": 0, "16_base_sold": 0,
+            "18": 0, "18_base": 0, "19": 0, "20": 0, "21": 0, "21_base": 0, "21_num_base_offered": 0,
+            "22": 0, "23": 0, "23_base_sold": 0,
+            "25": ["1_1", "5_2", "6_0"], "26": n_items + 1,
+            "27": "Offered fries with the burger.", "28": "Items table, burger row."}
+
+
+def broken():
+    answer = consistent()
+    answer["5"] = 5  # more upsell offers than opportunities
+    return answer
+
+
+def fake_response(answer, input_tokens=1000):
+    usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=100)
+    return SimpleNamespace(output=[None, SimpleNamespace(content=[SimpleNamespace(text=json.dumps(answer))])],
+                           usage=usage)
+
+
+def details(answer):
+    with patch("builtins.print"):
+        return grader.map_step2_to_grade_cols(answer, {})
+
+
+class TestInvariants:
+
+    def test_consistent_grade_passes(self):
+        assert check_invariants(consistent(), {"1", "5", "6"}) == []
+
+    def test_no_upsell_order_passes(self):
+        answer = consistent()
+        answer.update({"5": 0, "6": 0, "7": 0, "8": 0, "8_base_sold": 0, "9": 0,
+                       "25": ["1_1", "5_2"], "26": 2})
+        assert check_invariants(answer, {"1", "5", "6"}) == []
+
+    def test_offers_above_opportunities(self):
+        assert any("num_upsell_offers" in p for p in check_invariants(broken()))
+
+    def test_successes_above_offers(self):
+        answer = consistent()
+        answer["15"] = 2
+        assert any("num_upsize_success" in p for p in check_invariants(answer))
+
+    def test_items_after_must_add_up(self):
+        answer = consistent()
+        answer["26"] = 7
+        assert any("num_items_after" in p for p in check_invariants(answer))
+
+    def test_addon_success_does_not_change_item_count(self):
+        answer = consistent()
+        # a topping offered and taken on the sundae, items after unchanged
+        answer.update({"18": 1, "18_base": ["1_1"], "19": ["6_0"], "20": ["1_1"], "21": 1, "22": 1, "23": ["1_1"]})
+        assert check_invariants(answer, {"1", "5", "6"}) == []
+
+    def test_unknown_item_ids(self):
+        problems = check_invariants(consistent(), {"1", "5"})
+        assert problems == ["unknown item ids ['6']"]
+
+
+class FakeTieredStep2:
+    """Low effort gets transcripts containing "hard" wrong; high effort always answers correctly"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt, testing, effort="high"):
+        with self.lock:
+            self.calls.append(effort)
+        if "### Transaction" in prompt:
+            blocks = prompt.split("### Transaction ")[1:]
+            answers = {}
+            for block in blocks:
+                tx_id, text = block.split("\n", 1)
+                answers[tx_id] = broken() if effort == "low" and "hard" in text else consistent()
+            return fake_response(answers)
+        hard = "hard" in prompt.rsplit("Process this transcript:", 1)[-1]
+        return fake_response(broken() if effort == "low" and hard else consistent())
+
+
+def run(transactions, packed=False):
+    fake = FakeTieredStep2()
+    with patch.object(grader, "build_step2_prompt", return_value="MENU PROMPT"), \
+         patch.object(grader, "_step2_request", side_effect=fake), \
+         patch.object(grader, "menu_item_ids", return_value={"1", "5", "6"}), \
+         patch.object(grader.settings, "STEP2_TIERED", True), \
+         patch.object(TierStats, "report", lambda self: setattr(run, "summary", self.summary())), \
+         patch("builtins.print"):
+        grades = grader.grade_transactions(transactions, "loc-1", packed=packed)
+    return grades, fake, run.summary
+
+
+def txs():
+    texts = ["easy order one", "hard family order", "easy order two", "hard order with coupons"]
+    return [{"id": f"tx-{i}", "meta": {"text": t}} for i, t in enumerate(texts)]
+
+
+class TestTieredGrading:
+
+    def test_only_failing_transcripts_escalate(self):
+        grades, fake, summary = run(txs())
+        assert sorted(fake.calls) == ["high", "high", "low", "low", "low", "low"]
+        assert summary["escalated"] == 2 and summary["graded"] == 4
+        # every stored grade comes from a consistent answer, escalated ones from the high-effort retry
+        assert all(g["details"] == details(consistent()) for g in grades)
+
+    def test_cost_and_latency_split_by_tier(self):
+        grades, _, summary = run(txs())
+        low, high = summary["tiers"]["low"], summary["tiers"]["high"]
+        assert low["calls"] == 4 and high["calls"] == 2
+        assert low["cost"] > 0 and high["cost"] > 0
+        # escalated grades carry the cost of both attempts
+        by_id = {g["transaction_id"]: g["gpt_price"] for g in grades}
+        assert by_id["tx-1"] == pytest.approx(2 * by_id["tx-0"])
+
+    def test_packed_escalates_individual_answers(self):
+        with patch.object(grader.settings, "STEP2_PACK_TOKENS_PER_TX", 100):
+            grades, fake, summary = run(txs(), packed=True)
+        assert fake.calls.count("low") == 1
+        assert fake.calls.count("high") == 2
+        assert summary["escalated"] == 2
+        assert len(grades) == 4
+
+
+def test_addon_conversion_is_not_escalated():
+    answer = consistent()
+    answer.update({"18": 1, "18_base": ["1_1"], "19": ["6_0"], "20": ["1_1"], "21": 1, "22": 1, "23": ["1_1"]})
+    calls = []
+
+    def step2(prompt, testing, effort="high"):
+        calls.append(effort)
+        return fake_response(answer)
+
+    with patch.object(grader, "build_step2_prompt", return_value="MENU"), \
+         patch.object(grader, "_step2_request", side_effect=step2), \
+         patch.object(grader, "menu_item_ids", return_value={"1", "5", "6"}), \
+         patch.object(grader.settings, "STEP2_TIERED", True), \
+         patch.object(grader.settings, "STEP2_PACKED", False), \
+         patch.object(grader.settings, "STEP2_PRECLASSIFY", False), \
+         patch("builtins.print"):
+        grades = grader.grade_transactions([{"id": "tx-1", "meta": {"text": "burger with oreo"}}], "loc-1")
+    assert len(grades) == 1
+    assert calls == ["low"]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test suite for concurrent, rate-limited transcription against a local fake ASR server
+"""
+
+import sys
+import os
+import re
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import soundfile as sf
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from openai import OpenAI
+from services import transcribe
+from utils.rate_limit import TokenBucket
+
+
+class FakeASRServer:
+    """OpenAI-compatible /audio/transcriptions endpoint with injected latency and throttling.
+
+    Replies with the uploaded filename so the caller can check results line up with inputs.
+    """
+
+    def __init__(self, latency=0.05, throttle_first=0, fail_every=0):
+        self.latency = latency
+        self.throttle_first = throttle_first
+        self.fail_every = fail_every
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server.lock:
+                    server.requests += 1
+                    n = server.requests
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.latency)
+                    if n <= server.throttle_first:
+                        with server.lock:
+                            server.throttled += 1
+                        return self._reply(429, b'{"error": {"message": "slow down"}}', "application/json", {"Retry-After": "0"})
+                    if server.fail_every and n % server.fail_every == 0:
+                        with server.lock:
+                            server.failed += 1
+                        return self._reply(503, b'{"error": {"message": "overloaded"}}', "application/json")
+                    name = re.search(rb'filename="([^"]+)"', body).group(1)
+                    self._reply(200, name, "text/plain")
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def _reply(self, status, payload, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def clips(tmp_path):
+    paths = []
+    for i in range(12):
+        path = str(tmp_path / f"clip_{i:02d}.wav")
+        sf.write(path, np.zeros(800 * (i + 1)), 8000)
+        paths.append(path)
+    paths[4] = ""  # failed clip from segmentation
+    begins = [10.0 * i for i in range(12)]
+    ends = [10.0 * i + 5 for i in range(12)]
+    return paths, begins, ends
+
+
+def run_against(server, clips, max_in_flight):
+    fake_client = OpenAI(base_url=server.url, api_key="test-key")
+    with patch.object(transcribe, "client", fake_client), \
+         patch.object(transcribe, "request_bucket", TokenBucket(0)), \
+         patch.object(transcribe, "audio_minutes_bucket", TokenBucket(0)), \
+         patch.object(transcribe.Settings, "ASR_RETRY_BASE_DELAY", 0.01), \
+         patch.object(transcribe.Settings, "ASR_MAX_RETRIES", 6), \
+         patch.object(transcribe.Settings, "ASR_UPLOAD_FORMAT", "source"):
+        return transcribe.transcribe_segments(*clips, max_in_flight=max_in_flight)
+
+
+class TestConcurrentTranscription:
+
+    def test_results_in_input_order_with_bounded_concurrency(self, clips):
+        with FakeASRServer(latency=0.05) as server:
+            segments = run_against(server, clips, max_in_flight=4)
+        expected = [(b, e, os.path.basename(p)) for p, b, e in zip(*clips) if p]
+        assert [(s["start"], s["end"], s["text"]) for s in segments] == expected
+        assert 1 < server.max_in_flight <= 4
+
+    def test_retries_throttling_and_server_errors(self, clips):
+        with FakeASRServer(latency=0.01, throttle_first=5, fail_every=4) as server:
+            segments = run_against(server, clips, max_in_flight=3)
+        assert len(segments) == 11
+        assert [s["text"] for s in segments] == [os.path.basename(p) for p in clips[0] if p]
+        assert server.throttled == 5
+        assert server.failed > 0
+
+    def test_gives_up_after_max_retries(self, clips):
+        with FakeASRServer(latency=0.0, throttle_first=10 ** 6) as server:
+            with patch.object(transcribe.Settings, "ASR_MAX_RETRIES", 2):
+                fake_client = OpenAI(base_url=server.url, api_key="test-key")
+                with patch.object(transcribe, "client", fake_client), \
+                     patch.object(transcribe.Settings, "ASR_RETRY_BASE_DELAY", 0.0), \
+                     patch.object(transcribe.Settings, "ASR_UPLOAD_FORMAT", "source"):
+                    result = transcribe.transcribe_audio_clip(clips[0][0], 0.0, 5.0, 0)
+        assert "error" in result
+        assert server.requests == 3
+
+    def test_concurrency_beats_sequential_wall_clock(self, clips):
+        with FakeASRServer(latency=0.1) as server:
+            start = time.time()
+            run_against(server, clips, max_in_flight=1)
+            sequential = time.time() - start
+            start = time.time()
+            run_against(server, clips, max_in_flight=6)
+            concurrent = time.time() - start
+        assert concurrent < sequential / 2
+
+
+class TestTokenBucket:
+
+    def test_blocks_once_capacity_is_spent(self):
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)  # 10 tokens/s
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire(1)
+        assert time.monotonic() - start >= 0.25
+
+    def test_oversized_request_does_not_deadlock(self):
+        bucket = TokenBucket(rate_per_minute=6000, capacity=2)
+        bucket.acquire(50)  # clamped to the bucket size
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(0)
+        assert bucket.acquire(10 ** 9) == 0.0
@@ -0,0 +1,200 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+import openai
+
+from config import Settings
+from utils.rate_limit import is_retryable, backoff_delay
+
+
+def _is_throttle(exc: Exception) -> bool:
+    """Signals that we're sending too much: 429s and 503 overloads"""
+    if isinstance(exc, openai.RateLimitError):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code in (429, 503)
+
+
+class AIMDController:
+    """Adaptive in-flight limit for one model, shared by every thread in the process.
+
+    Each success raises the limit by `increase / limit` (about +increase per full window of
+    requests); a 429/503, or a latency more than `latency_factor` times the running average,
+    multiplies it by `decrease`. Cuts are at most one per `cooldown` seconds, so a burst of
+    throttled requests from the same window only counts once.
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, initial: float = None,
+                 increase: float = 1.0, decrease: float = 0.5, latency_factor: float = 3.0,
+                 cooldown: float = 2.0):
+        self.name = name
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(min(max(initial if initial is not None else self.min_limit, self.min_limit), self.max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self._cond = threading.Condition()
+        self._last_cut = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.successes = 0
+        self.throttles = 0
+        self.latency_spikes = 0
+        self.errors = 0
+        self.cuts = 0
+        self.wait_seconds = 0.0
+        self.latency_avg = None
+        self._latency_samples = 0
+
+    def acquire(self) -> None:
+        start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.wait_seconds += time.monotonic() - start
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _cut(self) -> None:
+        now = time.monotonic()
+        if now - self._last_cut < self.cooldown:
+            return
+        self._last_cut = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease)
+        self.cuts += 1
+
+    def on_success(self, latency: float) -> None:
+        with self._cond:
+            self.successes += 1
+            spike = (self.latency_avg is not None and self._latency_samples >= 10
+                     and latency > self.latency_factor * self.latency_avg)
+            # Running average ignores spikes so one slow call can't raise the bar for the next
+            if not spike:
+                self._latency_samples += 1
+                self.latency_avg = latency if self.latency_avg is None else 0.9 * self.latency_avg + 0.1 * latency
+            if spike:
+                self.latency_spikes += 1
+                self._cut()
+            else:
+                self.limit = min(float(self.max_limit), self.limit + self.increase / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def on_error(self, exc: Exception) -> None:
+        with self._cond:
+            if _is_throttle(exc):
+                self.throttles += 1
+                self._cut()
+            else:
+                self.errors += 1
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot for the duration of a request and feed its outcome back"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.on_error(e)
+            raise
+        else:
+            self.on_success(time.monotonic() - start)
+        finally:
+            self.release()
+
+    def call(self, fn: Callable, /, *args, **kwargs) -> Any:
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "model": self.name,
+                "limit": round(self.limit, 2),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "successes": self.successes,
+                "throttles": self.throttles,
+                "latency_spikes": self.latency_spikes,
+                "errors": self.errors,
+                "cuts": self.cuts,
+                "avg_latency_s": round(self.latency_avg, 3) if self.latency_avg is not None else None,
+                "wait_s": round(self.wait_seconds, 2),
+            }
+
+
+_controllers: Dict[str, AIMDController] = {}
+_controllers_lock = threading.Lock()
+
+
+def model_budgets() -> Dict[str, int]:
+    """Per-model max concurrency from LLM_CONCURRENCY_BUDGETS ("gpt-5-nano=24,gpt-4o-transcribe=8")"""
+    budgets = {}
+    for part in Settings.LLM_CONCURRENCY_BUDGETS.split(","):
+        if "=" in part:
+            model, limit = part.split("=", 1)
+            budgets[model.strip()] = int(limit)
+    return budgets
+
+
+def get_controller(model: str) -> AIMDController:
+    """The process-wide controller for a model, created on first use"""
+    with _controllers_lock:
+        controller = _controllers.get(model)
+        if controller is None:
+            max_limit = model_budgets().get(model, Settings.LLM_MAX_CONCURRENCY)
+            controller = AIMDController(
+                model, max_limit=max_limit, min_limit=Settings.LLM_MIN_CONCURRENCY,
+                initial=min(Settings.LLM_INITIAL_CONCURRENCY, max_limit),
+                latency_factor=Settings.LLM_LATENCY_SPIKE_FACTOR,
+            )
+            _controllers[model] = controller
+        return controller
+
+
+def llm_call(model: str, fn: Callable, /, *args, **kwargs) -> Any:
+    """Run one OpenAI request under the model's adaptive concurrency limit (kwargs may repeat model=)"""
+    return get_controller(model).call(fn, *args, **kwargs)
+
+
+def llm_call_with_retry(model: str, fn: Callable, /, *args, **kwargs) -> Any:
+    """llm_call with our own backoff, for clients built with max_retries=0.
+
+    The SDK's internal retries would swallow 429s before the controller sees them; here every
+    attempt goes through the controller, so each throttle shrinks the limit before we retry.
+    """
+    attempt = 0
+    while True:
+        try:
+            return llm_call(model, fn, *args, **kwargs)
+        except Exception as e:
+            if attempt >= Settings.LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt, Settings.LLM_RETRY_BASE_DELAY, Settings.LLM_RETRY_MAX_DELAY, e))
+            attempt += 1
+
+
+def pool_size(model: str) -> int:
+    """Thread-pool size for fanning out calls to a model; the controller does the real limiting"""
+    return get_controller(model).max_limit
+
+
+def dispatch_metrics() -> Dict[str, Dict[str, Any]]:
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {c.name: c.stats() for c in controllers}
+
+
+def reset_controllers() -> None:
+    with _controllers_lock:
+        _controllers.clear()
@@ -0,0 +1,76 @@
+import random
+import threading
+import time
+from typing import Optional
+
+import openai
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    Callers block in acquire() until enough tokens are available. A rate <= 0 disables the limit.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = float(rate_per_minute) / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_second <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens, sleeping as needed; returns the seconds spent waiting"""
+        if self.unlimited:
+            return 0.0
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                sleep_for = (amount - self._tokens) / self.rate_per_second
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+
+def is_retryable(exc: Exception) -> bool:
+    """429s, 5xx responses, timeouts and dropped connections are worth retrying"""
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Server-provided Retry-After hint, if the error carries one"""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0, exc: Exception = None) -> float:
+    """Exponential backoff with full jitter, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    hint = retry_after_seconds(exc) if exc is not None else None
+    if hint is not None:
+        delay = max(delay, min(hint, cap))
+    return delay
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming span detection and single-pass span export in worker/adapter.py.
+Run with: python -m pytest test_adapter_spans.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+# Add the current directory to Python path
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test")  # the adapter builds an OpenAI client at import
+
+from worker.adapter import _segment_active_spans, _stream_active_spans, _export_spans
+
+SR = 100        # small sample rate keeps the windows cheap
+WINDOW_S = 1.0  # 100-sample windows
+
+
+def make_recording(path, seed, channels):
+    """Silence with bursts of noise of random length, on the 16-bit grid so samples round-trip exactly"""
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(5, 40) * SR + rng.integers(0, SR))  # not always a whole number of windows
+    data = np.zeros((n, channels), dtype=np.float32)
+    for _ in range(rng.integers(1, 8)):
+        start = int(rng.integers(0, n))
+        length = int(rng.integers(1, 6 * SR))
+        data[start:start + length] = rng.normal(0, 0.1, size=data[start:start + length].shape)
+    data = np.round(data * 32768) / 32768
+    sf.write(path, data, SR, subtype="PCM_16")
+    return data
+
+
+@pytest.mark.parametrize("seed", range(15))
+@pytest.mark.parametrize("channels", [1, 2])
+@pytest.mark.parametrize("block_windows", [1, 2, 3, 7])
+def test_stream_spans_match_in_memory_spans(tmp_path, seed, channels, block_windows):
+    path = str(tmp_path / "day.wav")
+    data = make_recording(path, seed, channels)
+    mono = data.mean(axis=1, dtype=np.float64)  # same downmix as the streaming reader
+
+    expected = _segment_active_spans(mono, SR, window_s=WINDOW_S)
+    got = _stream_active_spans(path, window_s=WINDOW_S, block_windows=block_windows)
+    assert got == expected
+
+
+def test_span_crossing_block_boundaries(tmp_path):
+    # One burst spanning windows 2..8, read three windows per block: it opens in block 0 and closes in block 2
+    path = str(tmp_path / "day.wav")
+    data = np.zeros((12 * SR, 1), dtype=np.float32)
+    data[2 * SR + 50:8 * SR + 10] = 0.5
+    sf.write(path, data, SR, subtype="FLOAT")
+    assert _stream_active_spans(path, window_s=WINDOW_S, block_windows=3) == [(2.0, 9.0)]
+
+    # Still active at the end: the span closes at the last sample
+    data[10 * SR:] = 0.5
+    sf.write(path, data, SR, subtype="FLOAT")
+    assert _stream_active_spans(path, window_s=WINDOW_S, block_windows=3) == [(2.0, 9.0), (10.0, 12.0)]
+
+
+@pytest.mark.parametrize("block_s", [0.37, 1.0, 2.5, 60.0])
+def test_exported_clips_match_spans(tmp_path, block_s):
+    path = str(tmp_path / "day.wav")
+    n = 10 * SR + 7
+    # Every sample is distinct, so an off-by-one at either end of a clip shows up
+    data = ((np.arange(n * 2) - n) / 32768).astype(np.float32).reshape(n, 2)
+    sf.write(path, data, SR, subtype="PCM_16")
+
+    spans = [(0.0, 1.0), (1.0, 1.37), (2.5, 5.01), (6.99, 7.0), (9.5, n / SR)]
+    out_paths = [str(tmp_path / f"clip_{i}.wav") for i in range(len(spans))]
+    _export_spans(path, spans, out_paths, block_s=block_s)
+
+    for (begin, end), out_path in zip(spans, out_paths):
+        clip, sr = sf.read(out_path, dtype="float32", always_2d=True)
+        expected = data[int(begin * SR):int(end * SR)]
+        assert sr == SR
+        assert len(clip) == len(expected)
+        np.testing.assert_array_equal(clip[0], expected[0])
+        np.testing.assert_array_equal(clip[-1], expected[-1])
+        np.testing.assert_array_equal(clip, expected)
+
+
+def test_exported_clips_match_detected_spans(tmp_path):
+    path = str(tmp_path / "day.wav")
+    data = make_recording(path, seed=3, channels=2)
+    spans = _stream_active_spans(path, window_s=WINDOW_S, block_windows=2)
+    assert spans
+
+    out_paths = [str(tmp_path / f"clip_{i}.wav") for i in range(len(spans))]
+    _export_spans(path, spans, out_paths, block_s=0.75)
+    for (begin, end), out_path in zip(spans, out_paths):
+        clip, _ = sf.read(out_path, dtype="float32", always_2d=True)
+        np.testing.assert_array_equal(clip, data[int(begin * SR):int(end * SR)])
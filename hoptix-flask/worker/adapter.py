@@ -4,7 +4,7 @@ from typing import List, Dict, Any
 from datetime import datetime, timedelta
 
 import numpy as np
-import librosa
+import soundfile as sf
 from moviepy.editor import VideoFileClip
 from openai import OpenAI
 from dateutil import parser as dateparse
@@ -306,29 +306,84 @@ def _tmp_audio_from_video(video_path: str):
         # Don't delete the audio file - keep it saved
         print(f"💾 Audio file preserved: {out}")
 
+def _spans_from_activity(active: np.ndarray, interval: int, sr: int, prev_active: int, offset: int):
+    # Turn per-window activity flags into begin/end times; offset is the sample index of window 0.
+    states = np.concatenate(([prev_active], active.astype(np.int8)))
+    transitions = np.diff(states)
+    positions = offset + np.arange(active.size) * interval
+    begins = (positions[transitions == 1] / sr).tolist()
+    ends = (positions[transitions == -1] / sr).tolist()
+    return begins, ends, int(states[-1])
+
+def _window_activity(y: np.ndarray, interval: int, n_windows: int) -> np.ndarray:
+    # One reduction over (n_windows, interval) blocks; a window is silent when its average is exactly 0.
+    windows = np.ascontiguousarray(y[:n_windows * interval], dtype=np.float64).reshape(n_windows, interval)
+    return windows.mean(axis=1) != 0.0
+
 def _segment_active_spans(y: np.ndarray, sr: int, window_s: float = 15.0) -> List[tuple[float,float]]:
     # Mirrors your simple "average==0 → silence" logic to carve spans.
+    # Windows sit at k*interval and a window is only scored when at least one sample follows it.
     interval = int(sr * window_s)
-    idx, removed, prev_active = 0, 0, 0
+    n_windows = (len(y) - 1) // interval if interval > 0 and len(y) > 0 else 0
+    if n_windows <= 0:
+        return []
+    begins, ends, _ = _spans_from_activity(_window_activity(y, interval, n_windows), interval, sr, 0, 0)
+    if len(begins) != len(ends):
+        ends.append(len(y)/sr)
+    return list(zip(begins, ends))
+
+def _stream_active_spans(audio_path: str, window_s: float = 15.0, block_windows: int = 64) -> List[tuple[float,float]]:
+    # Same spans as _segment_active_spans, but reads the file in fixed-size blocks so memory stays
+    # bounded (block_windows * window_s seconds) no matter how long the recording is.
     begins, ends = [], []
-    y_list = y.tolist()
-    while idx + interval < len(y_list) and idx >= 0:
-        chunk_avg = float(np.average(y_list[idx: idx + interval]))
-        if chunk_avg == 0.0:
-            if prev_active == 1:
-                ends.append((idx + removed)/sr)
-                prev_active = 0
-            del y_list[idx: idx+interval]
-            removed += interval
-        else:
-            if prev_active == 0:
-                begins.append((idx + removed)/sr)
-                prev_active = 1
-            idx += interval
+    prev_active = 0
+    with sf.SoundFile(audio_path) as f:
+        sr = f.samplerate
+        interval = int(sr * window_s)
+        buf = np.zeros(0, dtype=np.float64)
+        consumed = 0  # samples already scored, i.e. the position of buf[0]
+        for block in f.blocks(blocksize=interval * block_windows, dtype="float32", always_2d=True):
+            # Downmix like librosa.load(mono=True)
+            buf = np.concatenate((buf, block.mean(axis=1, dtype=np.float64)))
+            n_windows = (len(buf) - 1) // interval
+            if n_windows <= 0:
+                continue
+            b, e, prev_active = _spans_from_activity(_window_activity(buf, interval, n_windows), interval, sr, prev_active, consumed)
+            begins.extend(b)
+            ends.extend(e)
+            consumed += n_windows * interval
+            buf = buf[n_windows * interval:]
+        total = consumed + len(buf)
     if len(begins) != len(ends):
-        ends.append((len(y_list)+removed)/sr)
+        ends.append(total/sr)
     return list(zip(begins, ends))
 
+def _export_spans(audio_path: str, spans: List[tuple[float,float]], out_paths: List[str], block_s: float = 60.0) -> None:
+    # Decode audio_path once, front to back, writing each [start, end) span to its own file as it goes by.
+    # Spans must be sorted and non-overlapping; only one output file is open at a time.
+    with sf.SoundFile(audio_path) as f:
+        sr = f.samplerate
+        bounds = [(int(b * sr), int(e * sr)) for b, e in spans]
+        pos, i, out = 0, 0, None
+        for block in f.blocks(blocksize=int(sr * block_s), always_2d=True):
+            block_end = pos + len(block)
+            while i < len(bounds):
+                start, end = bounds[i]
+                if start >= block_end:
+                    break
+                if out is None:
+                    out = sf.SoundFile(out_paths[i], mode="w", samplerate=sr, channels=f.channels)
+                lo, hi = max(start, pos) - pos, min(end, block_end) - pos
+                if hi > lo:
+                    out.write(block[lo:hi])
+                if end > block_end:
+                    break
+                out.close()
+                out, i = None, i + 1
+            pos = block_end
+        if out is not None:
+            out.close()
+
 def _parse_dt_file_timestamp(s3_key: str) -> str:
     """
     Parse DT_File timestamp from S3 key.
@@ -384,23 +439,21 @@ def transcribe_video(local_path: str) -> List[Dict]:
     video_basename = os.path.splitext(os.path.basename(local_path))[0]
     
     with _tmp_audio_from_video(local_path) as (audio_path, duration):
-        y, sr = librosa.load(audio_path, sr=None)
-        spans = _segment_active_spans(y, sr, 15.0) or [(0.0, duration)]
+        spans = _stream_active_spans(audio_path, 15.0) or [(0.0, duration)]
         
         print(f"🎬 Processing {len(spans)} audio segments for {video_basename}")
         
-        for i, (b, e) in enumerate(spans):
-            # Create permanent segment audio file instead of temporary
-            segment_audio = os.path.join(audio_dir, f"{video_basename}_segment_{i+1:03d}_{int(b)}s-{int(e)}s.mp3")
-            
-            # Ensure end time doesn't exceed video duration
-            end_time = min(int(e+1), duration)
-            clip = VideoFileClip(local_path).subclip(int(b), end_time)
-            
-            print(f"🎵 Saving segment {i+1}/{len(spans)}: {segment_audio}")
-            clip.audio.write_audiofile(segment_audio, verbose=False, logger=None)
-            clip.close()
-
+        # Create permanent segment audio files instead of temporary, cut in one pass over the audio
+        segment_paths = [
+            os.path.join(audio_dir, f"{video_basename}_segment_{i+1:03d}_{int(b)}s-{int(e)}s.mp3")
+            for i, (b, e) in enumerate(spans)
+        ]
+        # Ensure end time doesn't exceed video duration
+        export_bounds = [(int(b), min(int(e+1), duration)) for b, e in spans]
+        print(f"🎵 Saving {len(segment_paths)} segments from {audio_path}")
+        _export_spans(audio_path, export_bounds, segment_paths)
+        
+        for i, ((b, e), segment_audio) in enumerate(zip(spans, segment_paths)):
             with open(segment_audio, "rb") as af:
                 try:
                     txt = client.audio.transcriptions.create(